@@ -0,0 +1,240 @@
+"""EXPLAIN-планы горячих запросов без новых индексов и с ними.
+
+Запуск против локальной БД из docker-compose (схема: python -m core.migrate):
+
+    python -m benchmarks.explain_indexes --seed 200000
+    python -m benchmarks.explain_indexes
+
+"До" снимается внутри транзакции, в которой новые индексы удалены, а
+удаленные миграциями исходные созданы заново, после чего транзакция
+откатывается - схема не меняется.
+"""
+import argparse
+import asyncio
+import sys
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy import text
+
+from core.database import dispose_engine, get_engine
+
+# Индексы из migrations/versions/0004_query_indexes.py и 0005_client_browser_indexes.py
+NEW_INDEXES = [
+    "ix_appointments_wash_time_active",
+    "ix_appointments_wash_status_completed",
+    "ix_appointments_user_time",
+    "ix_appointments_service_id",
+    "ix_transactions_pending",
+    "ix_users_wash_role_created",
+    "ix_users_wash_role_created_id",
+    "ix_users_full_name_trgm",
+    "ix_users_username_trgm",
+    "ix_users_phone_trgm",
+    "ix_subscriptions_user_active",
+]
+
+# Исходные индексы, удаленные в 0004 (для "до" создаются заново)
+OBSOLETE_INDEXES = {
+    "ix_users_telegram_id": "ON users (telegram_id)",
+    "ix_appointments_status": "ON appointments (status)",
+    "ix_transactions_status": "ON transactions (status)",
+}
+
+# Формы запросов из обработчиков
+QUERIES = {
+    "booking.date_chosen (свободные слоты)": """
+        SELECT appointment_time, end_time FROM appointments
+        WHERE car_wash_id = :wash AND appointment_time < :day_end AND end_time > :day_start
+          AND status IN ('confirmed', 'pending')
+    """,
+    "admin.show_today_appointments": """
+        SELECT a.id, a.appointment_time, u.full_name, s.name, s.price, s.duration, a.status
+        FROM appointments a
+        JOIN users u ON u.id = a.user_id
+        JOIN services s ON s.id = a.service_id
+        WHERE a.car_wash_id = :wash AND a.appointment_time >= :day_start
+          AND a.appointment_time <= :day_end AND a.status IN ('confirmed', 'pending')
+        ORDER BY a.appointment_time
+    """,
+    "profile.my_appointments": """
+        SELECT a.id, a.appointment_time, s.name, a.status
+        FROM appointments a JOIN services s ON s.id = a.service_id
+        WHERE a.user_id = :user
+        ORDER BY a.appointment_time DESC LIMIT 10
+    """,
+    "washer.my_stats": """
+        SELECT count(*) FROM appointments
+        WHERE car_wash_id = :wash AND status = 'completed' AND completed_at >= :week_ago
+    """,
+    "admin.show_payments": """
+        SELECT * FROM transactions
+        WHERE car_wash_id = :wash AND status = 'pending'
+        ORDER BY created_at DESC
+    """,
+    "clients.turn_clients_page (середина списка)": """
+        SELECT id, full_name, username, phone, balance, created_at FROM users
+        WHERE car_wash_id = :wash AND role = 'client'
+          AND (created_at, id) < (:cursor_created_at, :cursor_id)
+        ORDER BY created_at DESC, id DESC LIMIT 11
+    """,
+    "clients.search_clients": """
+        SELECT id, full_name, username, phone, balance, created_at FROM users
+        WHERE car_wash_id = :wash AND role = 'client'
+          AND (full_name ILIKE :pattern OR username ILIKE :pattern OR phone ILIKE :pattern)
+        ORDER BY created_at DESC, id DESC LIMIT 11
+    """,
+    "clients.client_balance": """
+        SELECT * FROM subscriptions WHERE user_id = :user AND is_active
+    """,
+}
+
+# Синтетические данные одним набором INSERT ... SELECT generate_series
+SEED_SQL = [
+    "SELECT setseed(0.42)",
+    """
+    INSERT INTO carwashes (name, working_hours, slot_duration)
+    SELECT 'Bench wash ' || g, '{}'::json, 60 FROM generate_series(1, CAST(:washes AS int)) g
+    """,
+    """
+    INSERT INTO services (car_wash_id, name, price, duration, is_active)
+    SELECT w.id, 'Service ' || g, 500 + g * 250, 30 + g * 15, true
+    FROM carwashes w, generate_series(1, 4) g
+    """,
+    """
+    INSERT INTO users (telegram_id, car_wash_id, role, full_name, balance, is_blocked, created_at)
+    SELECT 9000000000 + g, w0.id + g % CAST(:washes AS int),
+           CASE WHEN g % 200 = 0 THEN 'washer' ELSE 'client' END,
+           'Client ' || g, 0, false, now() - random() * interval '3 years'
+    FROM generate_series(1, CAST(:users AS int)) g,
+         (SELECT min(id) AS id FROM carwashes WHERE name LIKE 'Bench wash %') w0
+    """,
+    # Записи каждой мойки идут подряд по часу, поэтому не пересекаются;
+    # клиент выбирается арифметикой по id, без подзапроса на каждую строку
+    """
+    WITH base AS (
+        SELECT (SELECT min(id) FROM carwashes WHERE name LIKE 'Bench wash %') AS w0,
+               (SELECT min(id) FROM users WHERE telegram_id > 9000000000) AS u0
+    )
+    INSERT INTO appointments (user_id, service_id, car_wash_id, appointment_time, end_time,
+                              status, created_at, completed_at)
+    SELECT base.u0 - 1 + (w.id - base.w0) + CAST(:washes AS int) * (1 + (g * 7919) % (CAST(:users AS int) / CAST(:washes AS int) - 1)),
+           s.id, w.id, t.start, t.start + interval '1 hour',
+           CASE WHEN t.start < now() THEN
+                CASE WHEN random() < 0.9 THEN 'completed' ELSE 'cancelled' END
+                ELSE 'confirmed' END,
+           t.start - interval '2 days',
+           CASE WHEN t.start < now() THEN t.start + interval '1 hour' END
+    FROM base
+    JOIN carwashes w ON w.name LIKE 'Bench wash %'
+    CROSS JOIN LATERAL (SELECT min(id) AS id FROM services WHERE car_wash_id = w.id) s
+    CROSS JOIN LATERAL generate_series(1, CAST(:per_wash AS int)) g
+    CROSS JOIN LATERAL (
+        SELECT date_trunc('hour', now()) - (CAST(:per_wash AS int) - g - 48) * interval '1 hour' AS start
+    ) t
+    """,
+    """
+    INSERT INTO transactions (user_id, car_wash_id, amount, type, status, created_at)
+    SELECT u.id, u.car_wash_id, 2000,
+           CASE WHEN random() < 0.5 THEN 'subscription_purchase' ELSE 'replenishment' END,
+           CASE WHEN random() < 0.02 THEN 'pending' ELSE 'approved' END,
+           u.created_at + random() * interval '300 days'
+    FROM users u, generate_series(1, 3)
+    """,
+    """
+    INSERT INTO subscriptions (user_id, car_wash_id, name, total_washes, remaining_washes,
+                               purchase_price, valid_until, is_active)
+    SELECT u.id, u.car_wash_id, 'Абонемент', 10, 5, 3500, current_date + 30, random() < 0.1
+    FROM users u
+    """,
+    "ANALYZE",
+]
+
+
+async def seed(appointments: int, washes: int):
+    """Залить синтетический набор данных"""
+    params = {
+        "washes": washes,
+        "users": max(appointments // 10, washes * 100),
+        "per_wash": max(appointments // washes, 1),
+    }
+    async with get_engine().begin() as conn:
+        for sql in SEED_SQL:
+            await conn.execute(text(sql), params)
+    await dispose_engine()
+    print(f"Seeded ~{appointments} appointments across {washes} washes")
+
+
+async def sample_params(conn) -> dict:
+    """Параметры запросов: самая загруженная мойка и активный клиент"""
+    wash = (await conn.execute(text(
+        "SELECT car_wash_id FROM appointments GROUP BY 1 ORDER BY count(*) DESC LIMIT 1"
+    ))).scalar()
+    user = (await conn.execute(text(
+        "SELECT user_id FROM appointments WHERE car_wash_id = :wash "
+        "GROUP BY 1 ORDER BY count(*) DESC LIMIT 1"
+    ), {"wash": wash})).scalar()
+    # Клиент из середины списка мойки - курсор глубокой страницы
+    cursor = (await conn.execute(text(
+        "SELECT created_at, id FROM users WHERE car_wash_id = :wash AND role = 'client' "
+        "ORDER BY created_at DESC, id DESC "
+        "OFFSET (SELECT count(*) / 2 FROM users WHERE car_wash_id = :wash AND role = 'client') LIMIT 1"
+    ), {"wash": wash})).one()
+    today = date.today()
+    return {
+        "wash": wash,
+        "user": user,
+        "day_start": datetime.combine(today, datetime.min.time()),
+        "day_end": datetime.combine(today, datetime.max.time()),
+        "week_ago": datetime.now() - timedelta(days=7),
+        "cursor_created_at": cursor.created_at,
+        "cursor_id": cursor.id,
+        "pattern": "%nt 12%",
+    }
+
+
+async def explain(conn, sql: str, params: dict) -> str:
+    result = await conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {sql}"), params)
+    return "\n".join(row[0] for row in result)
+
+
+async def run():
+    async with get_engine().connect() as conn:
+        params = await sample_params(conn)
+        # Выборка параметров открыла транзакцию (autobegin) - закрываем ее
+        await conn.commit()
+
+        for title, sql in QUERIES.items():
+            print(f"\n=== {title}")
+
+            # Исходный набор индексов: меняем его в транзакции и откатываем
+            trans = await conn.begin()
+            for name in NEW_INDEXES:
+                await conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+            for name, definition in OBSOLETE_INDEXES.items():
+                await conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} {definition}"))
+            print("--- before\n" + await explain(conn, sql, params))
+            await trans.rollback()
+
+            async with conn.begin():
+                print("--- after\n" + await explain(conn, sql, params))
+
+    await dispose_engine()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seed", type=int, metavar="APPOINTMENTS", help="сначала залить синтетические данные")
+    parser.add_argument("--washes", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.seed:
+        asyncio.run(seed(args.seed, args.washes))
+    else:
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
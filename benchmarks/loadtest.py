@@ -0,0 +1,314 @@
+"""Нагрузочный тест: синтетические апдейты через диспетчеры всех трех ботов.
+
+Апдейты подаются в Dispatcher.feed_update, запросы к Telegram отвечает
+мок-сессия бота; БД и Redis настоящие (docker-compose, данные из
+python -m benchmarks.seed). Сценарии:
+
+    booking   /start -> Записаться -> услуга -> дата -> время -> подтвердить
+    payments  администраторы в сводке Платежей подтверждают страницу, затем все
+    dashboard владельцы открывают дашборд
+
+    python -m benchmarks.loadtest --clients 500 --concurrency 100
+"""
+import argparse
+import asyncio
+import itertools
+import random
+import sys
+import time
+from collections import Counter, defaultdict, deque
+from datetime import datetime
+from pathlib import Path
+from typing import Any, AsyncGenerator, Callable, Dict, List, Optional, get_args
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.methods import TelegramMethod
+from aiogram.types import CallbackQuery, Chat, InlineKeyboardMarkup, Message, Update, User
+from sqlalchemy import select
+
+from core.database import configure_engine, get_db_context
+from core.models import Transaction, User as DbUser
+from core.runtime import create_storage, shutdown
+from bot_client.callbacks import Booking, SERVICE, DATE, TIME, CONFIRM
+from bot_employee.callbacks import Review, SELECT_PAGE, APPROVE_SELECTED, APPROVE_ALL
+import bot_client.main as client_bot
+import bot_employee.main as employee_bot
+import bot_owner.main as owner_bot
+
+
+class MockSession(BaseSession):
+    """Сессия бота без сети: запоминает клавиатуры и отвечает заглушками"""
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self.calls: Counter = Counter()
+        self.markups: Dict[int, deque] = defaultdict(lambda: deque(maxlen=100))
+        self._message_ids = itertools.count(1_000_000)
+
+    async def make_request(self, bot: Bot, method: TelegramMethod, timeout: Optional[int] = None) -> Any:
+        self.calls[type(method).__name__] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        chat_id = getattr(method, "chat_id", None)
+        markup = getattr(method, "reply_markup", None)
+        if chat_id is not None and isinstance(markup, InlineKeyboardMarkup):
+            self.markups[chat_id].append(markup)
+
+        returning = method.__returning__
+        if Message in (get_args(returning) or (returning,)):
+            return Message(
+                message_id=next(self._message_ids),
+                date=datetime.now(),
+                chat=Chat(id=chat_id or 0, type="private"),
+                text=getattr(method, "text", None)
+            )
+        return True
+
+    async def close(self) -> None:
+        pass
+
+    async def stream_content(self, url: str, headers=None, timeout: int = 30,
+                             chunk_size: int = 65536, raise_for_status: bool = True) -> AsyncGenerator[bytes, None]:
+        yield b""
+
+    def buttons(self, chat_id: int, predicate: Callable[[str], bool]) -> List[str]:
+        """callback_data кнопок последней подходящей клавиатуры чата"""
+        for markup in reversed(self.markups[chat_id]):
+            found = [
+                button.callback_data
+                for row in markup.inline_keyboard
+                for button in row
+                if button.callback_data and predicate(button.callback_data)
+            ]
+            if found:
+                return found
+        return []
+
+
+_update_ids = itertools.count(1)
+_message_ids = itertools.count(1)
+
+
+def message_update(telegram_id: int, text: str) -> Update:
+    return Update(
+        update_id=next(_update_ids),
+        message=Message(
+            message_id=next(_message_ids),
+            date=datetime.now(),
+            chat=Chat(id=telegram_id, type="private"),
+            from_user=User(id=telegram_id, is_bot=False, first_name=f"Load {telegram_id}"),
+            text=text
+        )
+    )
+
+
+def callback_update(telegram_id: int, data: str, text: str = "") -> Update:
+    user = User(id=telegram_id, is_bot=False, first_name=f"Load {telegram_id}")
+    return Update(
+        update_id=next(_update_ids),
+        callback_query=CallbackQuery(
+            id=str(next(_update_ids)),
+            from_user=user,
+            chat_instance="load",
+            data=data,
+            message=Message(
+                message_id=next(_message_ids),
+                date=datetime.now(),
+                chat=Chat(id=telegram_id, type="private"),
+                from_user=user,
+                text=text
+            )
+        )
+    )
+
+
+class Harness:
+    """Один диспетчер и бот с мок-сессией на каждую роль, замеры по шагам"""
+
+    def __init__(self, storage, api_latency: float):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Counter = Counter()
+        self.bots: Dict[str, Any] = {}
+        for name, module in (("client", client_bot), ("employee", employee_bot), ("owner", owner_bot)):
+            bot = module.create_bot()
+            bot.session = MockSession(api_latency)
+            self.bots[name] = (bot, module.create_dispatcher(storage))
+
+    def session(self, name: str) -> MockSession:
+        return self.bots[name][0].session
+
+    async def feed(self, name: str, step: str, update: Update):
+        bot, dp = self.bots[name]
+        started = time.perf_counter()
+        try:
+            await dp.feed_update(bot, update)
+        except Exception as e:
+            self.errors[f"{step}: {type(e).__name__}"] += 1
+        finally:
+            self.latencies[step].append(time.perf_counter() - started)
+
+    async def startup(self):
+        for bot, dp in self.bots.values():
+            await dp.emit_startup(bot=bot)
+
+    async def shutdown(self):
+        for bot, dp in self.bots.values():
+            await dp.emit_shutdown(bot=bot)
+
+
+async def booking_flow(h: Harness, telegram_id: int):
+    """Полная запись клиента"""
+    session = h.session("client")
+    await h.feed("client", "client.start", message_update(telegram_id, "/start"))
+    await h.feed("client", "client.booking_start", message_update(telegram_id, "🚗 Записаться"))
+
+    for step, kind in (
+        ("client.service", SERVICE), ("client.date", DATE), ("client.time", TIME), ("client.confirm", CONFIRM)
+    ):
+        buttons = session.buttons(telegram_id, lambda data: data.startswith("b:") and Booking.unpack(data).step == kind)
+        if not buttons:
+            h.errors[f"{step}: no buttons"] += 1
+            return
+        await h.feed("client", step, callback_update(telegram_id, random.choice(buttons)))
+
+
+async def payments_storm(h: Harness, admin_telegram_id: int):
+    """Администратор в сводке выбирает страницу и подтверждает ее, затем все остальное
+    (каждое решение - с двойными нажатиями)"""
+    session = h.session("employee")
+    await h.feed("employee", "admin.payments", message_update(admin_telegram_id, "💰 Платежи"))
+
+    def review_button(act: str) -> Optional[str]:
+        found = session.buttons(admin_telegram_id, lambda data: data.startswith("pr:"))
+        return next((data for data in found if Review.unpack(data).act == act), None)
+
+    select_page = review_button(SELECT_PAGE)
+    if select_page is None:
+        return
+    await h.feed("employee", "admin.review_select", callback_update(admin_telegram_id, select_page, text="Платежи"))
+
+    for step, act in (("admin.approve_selected", APPROVE_SELECTED), ("admin.approve_all", APPROVE_ALL)):
+        data = review_button(act)
+        if data is None:
+            continue
+        await asyncio.gather(*[
+            h.feed("employee", step, callback_update(admin_telegram_id, data, text="Платежи"))
+            for _ in range(2)
+        ])
+
+
+async def dashboard_view(h: Harness, owner_telegram_id: int):
+    await h.feed("owner", "owner.dashboard", message_update(owner_telegram_id, "📊 Дашборд"))
+
+
+async def load_actors(clients: int, owners: int):
+    """Участники теста из засеянных данных"""
+    async with get_db_context() as db:
+        result = await db.execute(
+            select(DbUser.telegram_id).where(DbUser.role == "client").order_by(DbUser.id).limit(clients)
+        )
+        client_ids = list(result.scalars())
+
+        result = await db.execute(
+            select(DbUser.telegram_id)
+            .where(
+                DbUser.role == "admin",
+                DbUser.car_wash_id.in_(
+                    select(Transaction.car_wash_id).where(Transaction.status == "pending")
+                )
+            )
+        )
+        admin_ids = list(result.scalars())
+
+        result = await db.execute(
+            select(DbUser.telegram_id).where(DbUser.role == "owner").limit(owners)
+        )
+        owner_ids = list(result.scalars())
+    return client_ids, admin_ids, owner_ids
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def report(h: Harness, elapsed: float):
+    total = sum(len(v) for v in h.latencies.values())
+    print(f"\n{'step':<24}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for step, values in sorted(h.latencies.items()):
+        print(
+            f"{step:<24}{len(values):>8}"
+            f"{percentile(values, 0.50) * 1000:>10.1f}"
+            f"{percentile(values, 0.95) * 1000:>10.1f}"
+            f"{percentile(values, 0.99) * 1000:>10.1f}"
+        )
+    print(f"\n{total} updates in {elapsed:.2f} s: {total / elapsed:.1f} updates/s")
+
+    if h.errors:
+        print("\nErrors:")
+        for error, count in h.errors.most_common():
+            print(f"  {count:>6}  {error}")
+
+    calls = sum((bot.session.calls for bot, _ in h.bots.values()), Counter())
+    print("\nBot API calls: " + ", ".join(f"{name}={count}" for name, count in calls.most_common()))
+
+
+async def run(args):
+    configure_engine(pool_size=args.pool_size, max_overflow=0)
+    storage = MemoryStorage() if args.memory_storage else create_storage()
+    h = Harness(storage, args.api_latency / 1000)
+
+    client_ids, admin_ids, owner_ids = await load_actors(args.clients, args.owners)
+    print(f"Actors: {len(client_ids)} clients, {len(admin_ids)} admins, {len(owner_ids)} owners")
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def limited(coro):
+        async with semaphore:
+            await coro
+
+    jobs = []
+    if "booking" in args.scenarios:
+        jobs += [booking_flow(h, tid) for tid in client_ids]
+    if "payments" in args.scenarios:
+        jobs += [payments_storm(h, tid) for tid in admin_ids]
+    if "dashboard" in args.scenarios:
+        jobs += [dashboard_view(h, tid) for tid in owner_ids for _ in range(args.dashboard_repeats)]
+    random.shuffle(jobs)
+
+    await h.startup()
+    started = time.perf_counter()
+    await asyncio.gather(*[limited(job) for job in jobs])
+    elapsed = time.perf_counter() - started
+    await h.shutdown()
+
+    report(h, elapsed)
+    await shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=200, help="виртуальных клиентов в сценарии записи")
+    parser.add_argument("--owners", type=int, default=20)
+    parser.add_argument("--dashboard-repeats", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=50, help="одновременно выполняемых сценариев")
+    parser.add_argument("--pool-size", type=int, default=15, help="пул соединений БД, как у боевого процесса")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="задержка ответа Bot API, мс")
+    parser.add_argument("--memory-storage", action="store_true", help="FSM в памяти вместо Redis")
+    parser.add_argument(
+        "--scenarios", nargs="+", default=["booking", "payments", "dashboard"],
+        choices=["booking", "payments", "dashboard"]
+    )
+    args = parser.parse_args()
+    random.seed(42)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+"""Детерминированный синтетический набор данных в масштабе продакшена.
+
+Мойки, услуги, персонал, клиенты и годы истории записей, платежей и
+абонементов. Строки генерируются в Python из одного seed и пишутся через
+COPY (asyncpg copy_records_to_table) или пачками insert().values():
+
+    python -m core.migrate
+    python -m benchmarks.seed --washes 100 --clients-per-wash 3000 --years 3
+
+Один и тот же seed и --today на пустой БД дают побайтно те же данные.
+id назначаются явно от текущего максимума, сиквенсы сдвигаются в конце.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Tuple
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy import JSON, func, insert, select, text
+
+from core.availability import WEEKDAY_KEYS
+from core.database import dispose_engine, get_engine
+from core.models import (
+    Appointment, CarWash, DailyStats, Service, Subscription, SubscriptionPlan, Transaction, User
+)
+
+TELEGRAM_ID_BASE = 8_000_000_000
+INSERT_CHUNK = 1000
+
+# Колонки в порядке записи; таблицы - в порядке внешних ключей
+COLUMNS = {
+    CarWash: ("id", "name", "address", "phone", "working_hours", "slot_duration", "created_at"),
+    Service: ("id", "car_wash_id", "name", "description", "price", "duration", "is_active"),
+    SubscriptionPlan: ("id", "car_wash_id", "name", "washes", "price", "days", "is_active"),
+    User: ("id", "telegram_id", "car_wash_id", "role", "full_name", "username", "phone",
+           "balance", "is_blocked", "created_at"),
+    Appointment: ("id", "user_id", "service_id", "car_wash_id", "appointment_time", "end_time",
+                  "status", "payment_method", "created_at", "completed_at"),
+    Transaction: ("id", "user_id", "car_wash_id", "amount", "type", "status", "payment_method",
+                  "admin_id", "plan_id", "created_at", "approved_at"),
+    Subscription: ("id", "user_id", "car_wash_id", "name", "total_washes", "remaining_washes",
+                   "purchase_price", "valid_until", "is_active", "created_at"),
+    DailyStats: ("car_wash_id", "day", "revenue", "visits"),
+}
+
+SERVICES = [
+    ("Экспресс-мойка", 500, 30),
+    ("Комплексная мойка", 1200, 60),
+    ("Мойка двигателя", 1500, 60),
+    ("Химчистка салона", 5000, 180),
+    ("Полировка кузова", 7000, 240),
+    ("Чернение шин", 300, 30),
+]
+
+SUBSCRIPTIONS = [("Базовый", 5, 2000, 30), ("Стандарт", 10, 3500, 45), ("Премиум", 20, 6000, 60)]
+
+FIRST_NAMES = ["Иван", "Петр", "Анна", "Мария", "Олег", "Елена", "Сергей", "Ольга", "Дмитрий", "Наталья"]
+LAST_NAMES = ["Иванов", "Петров", "Смирнов", "Кузнецов", "Попов", "Соколов", "Лебедев", "Козлов"]
+
+
+class Options(NamedTuple):
+    washes: int
+    clients_per_wash: int
+    years: int
+    occupancy: float
+    horizon_days: int
+    today: date
+    seed: int
+
+
+class Ids:
+    """Явные id от текущего максимума в каждой таблице"""
+
+    def __init__(self, start: Dict[type, int]):
+        self.next = dict(start)
+
+    def take(self, model) -> int:
+        self.next[model] += 1
+        return self.next[model]
+
+
+Batch = Dict[type, List[Tuple]]
+
+LOCAL_TZ = datetime.now().astimezone().tzinfo
+
+
+def at(day: date, minutes: int) -> datetime:
+    """Момент дня в локальной зоне (timestamptz требует aware datetime)"""
+    return datetime.combine(day, datetime.min.time(), tzinfo=LOCAL_TZ) + timedelta(minutes=minutes)
+
+
+def person(rng: random.Random) -> str:
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def generate_wash(rng: random.Random, ids: Ids, opts: Options) -> Batch:
+    """Все строки одной мойки"""
+    batch: Batch = defaultdict(list)
+    history_start = opts.today - timedelta(days=365 * opts.years)
+
+    wash_id = ids.take(CarWash)
+    opens, closes = rng.choice([(8, 20), (9, 21), (10, 22)])
+    days_off = rng.sample(WEEKDAY_KEYS, k=rng.choice([0, 0, 1]))
+    working_hours = {key: f"{opens:02d}:00-{closes:02d}:00" for key in WEEKDAY_KEYS if key not in days_off}
+    slot = rng.choice([30, 60])
+    batch[CarWash].append((
+        wash_id, f"Мойка #{wash_id}", f"ул. Синтетическая, {wash_id}", f"+7900{wash_id:07d}",
+        working_hours, slot, at(history_start, 0)
+    ))
+
+    services = []
+    for name, price, duration in rng.sample(SERVICES, k=rng.randint(3, len(SERVICES))):
+        service_id = ids.take(Service)
+        services.append((service_id, Decimal(price), duration))
+        batch[Service].append((service_id, wash_id, name, None, Decimal(price), duration, True))
+
+    plans = []
+    for name, washes, price, days in SUBSCRIPTIONS:
+        plan_id = ids.take(SubscriptionPlan)
+        plans.append((plan_id, Decimal(price)))
+        batch[SubscriptionPlan].append((plan_id, wash_id, name, washes, Decimal(price), days, True))
+
+    def add_user(role: str, created: datetime) -> int:
+        user_id = ids.take(User)
+        batch[User].append((
+            user_id, TELEGRAM_ID_BASE + user_id, wash_id, role, person(rng), f"user{user_id}",
+            None, Decimal(rng.randrange(0, 5000, 100)) if role == "client" else Decimal(0),
+            role == "client" and rng.random() < 0.005, created
+        ))
+        return user_id
+
+    start = at(history_start, 0)
+    add_user("owner", start)
+    admins = [add_user("admin", start) for _ in range(2)]
+    for _ in range(3):
+        add_user("washer", start)
+
+    span = (opts.today - history_start).days
+    clients = []
+    for _ in range(opts.clients_per_wash):
+        created = at(history_start + timedelta(days=rng.randrange(span)), rng.randrange(24 * 60))
+        clients.append((add_user("client", created), created))
+    clients.sort(key=lambda c: c[1])
+
+    # Записи: день за днем, подряд без пересечений, клиент из уже зарегистрированных
+    stats: Dict[date, List] = defaultdict(lambda: [Decimal(0), 0])
+    registered = 0
+    day = history_start
+    last_day = opts.today + timedelta(days=opts.horizon_days)
+    while day <= last_day:
+        if WEEKDAY_KEYS[day.weekday()] not in days_off:
+            while registered < len(clients) and clients[registered][1].date() <= day:
+                registered += 1
+            minute = opens * 60
+            while registered and minute < closes * 60:
+                service_id, price, duration = rng.choice(services)
+                if minute + duration > closes * 60 or rng.random() > opts.occupancy:
+                    minute += slot
+                    continue
+                begin, end = at(day, minute), at(day, minute + duration)
+                if day < opts.today:
+                    status = "completed" if rng.random() < 0.88 else "cancelled"
+                else:
+                    status = "confirmed" if rng.random() < 0.95 else "pending"
+                completed_at = end if status == "completed" else None
+                if completed_at:
+                    stats[day][0] += price
+                    stats[day][1] += 1
+                batch[Appointment].append((
+                    ids.take(Appointment), clients[rng.randrange(registered)][0], service_id, wash_id,
+                    begin, end, status, rng.choice(["cash", "card", "subscription"]),
+                    begin - timedelta(days=rng.randint(0, 7), minutes=rng.randrange(600)), completed_at
+                ))
+                minute += -(-duration // slot) * slot
+        day += timedelta(days=1)
+
+    for day, (revenue, visits) in sorted(stats.items()):
+        batch[DailyStats].append((wash_id, day, revenue, visits))
+
+    # Платежи и абонементы клиентов
+    now = at(opts.today, 0)
+    for user_id, created in clients:
+        for _ in range(rng.randint(0, 4)):
+            moment = created + (now - created) * rng.random()
+            pending = now - moment < timedelta(days=3) and rng.random() < 0.5
+            kind = rng.choice(["replenishment", "subscription_purchase"])
+            if kind == "subscription_purchase":
+                plan_id, amount = rng.choice(plans)
+            else:
+                plan_id, amount = None, Decimal(rng.choice([1000, 2000, 3500, 5000]))
+            batch[Transaction].append((
+                ids.take(Transaction), user_id, wash_id, amount,
+                kind, "pending" if pending else "approved", "sbp",
+                None if pending else rng.choice(admins), plan_id, moment,
+                None if pending else moment + timedelta(minutes=rng.randint(1, 240))
+            ))
+
+        if rng.random() < 0.2:
+            name, washes, price, _ = rng.choice(SUBSCRIPTIONS)
+            bought = created + (now - created) * rng.random()
+            valid_until = bought.date() + timedelta(days=30 * rng.choice([1, 3, 12]))
+            remaining = rng.randint(0, washes)
+            batch[Subscription].append((
+                ids.take(Subscription), user_id, wash_id, name, washes, remaining, Decimal(price),
+                valid_until, remaining > 0 and valid_until >= opts.today, bought
+            ))
+
+    return batch
+
+
+async def current_max_ids(conn) -> Dict[type, int]:
+    start = {}
+    for model in COLUMNS:
+        if model is not DailyStats:
+            start[model] = (await conn.execute(select(func.coalesce(func.max(model.id), 0)))).scalar()
+    return start
+
+
+def copy_records(model: type, columns: Tuple[str, ...], rows: List[tuple]) -> List[tuple]:
+    """COPY через asyncpg принимает json только текстом - сериализуем здесь, а не в строках"""
+    json_columns = [i for i, name in enumerate(columns) if isinstance(model.__table__.c[name].type, JSON)]
+    if not json_columns:
+        return rows
+    return [
+        tuple(json.dumps(value, ensure_ascii=False) if i in json_columns else value for i, value in enumerate(row))
+        for row in rows
+    ]
+
+
+async def write_copy(conn, batch: Batch):
+    raw = (await conn.get_raw_connection()).driver_connection
+    for model, columns in COLUMNS.items():
+        if batch.get(model):
+            await raw.copy_records_to_table(
+                model.__tablename__, records=copy_records(model, columns, batch[model]), columns=columns
+            )
+
+
+async def write_insert(conn, batch: Batch):
+    for model, columns in COLUMNS.items():
+        rows = batch.get(model, [])
+        for i in range(0, len(rows), INSERT_CHUNK):
+            values = [dict(zip(columns, row)) for row in rows[i:i + INSERT_CHUNK]]
+            await conn.execute(insert(model.__table__).values(values))
+
+
+async def seed(opts: Options, method: str):
+    rng = random.Random(opts.seed)
+    write = write_copy if method == "copy" else write_insert
+    totals: Dict[str, int] = defaultdict(int)
+    started = time.perf_counter()
+
+    async with get_engine().begin() as conn:
+        ids = Ids(await current_max_ids(conn))
+        for n in range(opts.washes):
+            batch = generate_wash(rng, ids, opts)
+            await write(conn, batch)
+            for model, rows in batch.items():
+                totals[model.__tablename__] += len(rows)
+            print(f"\r{n + 1}/{opts.washes} washes, {sum(totals.values())} rows", end="", flush=True)
+
+        for model in COLUMNS:
+            if model is not DailyStats:
+                table = model.__tablename__
+                await conn.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                    f"(SELECT max(id) FROM {table}))"
+                ))
+
+    async with get_engine().begin() as conn:
+        await conn.execute(text("ANALYZE"))
+    await dispose_engine()
+
+    elapsed = time.perf_counter() - started
+    print(f"\nSeeded in {elapsed:.1f} s ({sum(totals.values()) / elapsed:.0f} rows/s):")
+    for table, count in totals.items():
+        print(f"  {table:<15}{count:>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--washes", type=int, default=20)
+    parser.add_argument("--clients-per-wash", type=int, default=2000)
+    parser.add_argument("--years", type=int, default=2, help="глубина истории")
+    parser.add_argument("--occupancy", type=float, default=0.6, help="доля занятых слотов")
+    parser.add_argument("--horizon-days", type=int, default=14, help="записи на будущее")
+    parser.add_argument("--today", type=date.fromisoformat, default=date.today())
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--method", choices=["copy", "insert"], default="copy")
+    args = parser.parse_args()
+
+    opts = Options(
+        washes=args.washes,
+        clients_per_wash=args.clients_per_wash,
+        years=args.years,
+        occupancy=args.occupancy,
+        horizon_days=args.horizon_days,
+        today=args.today,
+        seed=args.seed,
+    )
+    asyncio.run(seed(opts, args.method))
+
+
+if __name__ == "__main__":
+    main()
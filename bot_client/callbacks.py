@@ -0,0 +1,80 @@
+import base64
+import hashlib
+import hmac
+from datetime import date, datetime, time
+from typing import Optional
+
+from aiogram.filters.callback_data import CallbackData
+
+from core.config import settings
+
+# Шаги записи (поле step)
+SERVICE = "s"
+DATE = "d"
+TIME = "t"
+CONFIRM = "c"
+CANCEL = "x"
+BACK_TO_SERVICES = "bs"
+BACK_TO_DATES = "bd"
+
+# 12 символов base64 - 72 бита подписи, кнопка укладывается в 64 байта
+SIGNATURE_LENGTH = 12
+
+
+def _secret() -> bytes:
+    if settings.CALLBACK_SECRET:
+        return settings.CALLBACK_SECRET.encode()
+    return hashlib.sha256(f"callback:{settings.BOT_CLIENT_TOKEN}".encode()).digest()
+
+
+_SECRET = _secret()
+
+
+class Booking(CallbackData, prefix="b"):
+    """Контекст записи в кнопке вместо FSM: мойка, услуга, день, минута дня.
+
+    Данные подписаны HMAC: поддельная или поврежденная кнопка не проходит
+    фильтр Booking.filter() и до обработчика не доходит.
+    """
+    step: str
+    wash: int
+    service: Optional[int] = None
+    duration: Optional[int] = None
+    day: Optional[int] = None  # date.toordinal()
+    minute: Optional[int] = None  # от начала дня
+    sig: str = ""
+
+    def _body(self) -> str:
+        return self.__separator__.join(
+            [self.__prefix__] + [
+                self._encode_value(key, value)
+                for key, value in self.model_dump().items()
+                if key != "sig"
+            ]
+        )
+
+    def _signature(self) -> str:
+        digest = hmac.new(_SECRET, self._body().encode(), hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(digest).decode()[:SIGNATURE_LENGTH]
+
+    def pack(self) -> str:
+        return f"{self._body()}{self.__separator__}{self._signature()}"
+
+    @classmethod
+    def unpack(cls, value: str) -> "Booking":
+        booking = super().unpack(value)
+        if not hmac.compare_digest(booking.sig, booking._signature()):
+            raise ValueError("Bad callback signature")
+        return booking
+
+    def to(self, step: str, **changes) -> "Booking":
+        """Кнопка следующего шага с тем же контекстом"""
+        return self.model_copy(update={"step": step, **changes})
+
+    @property
+    def date(self) -> date:
+        return date.fromordinal(self.day)
+
+    @property
+    def start(self) -> datetime:
+        return datetime.combine(self.date, time(self.minute // 60, self.minute % 60))
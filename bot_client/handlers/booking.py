@@ -1,12 +1,20 @@
+from typing import Dict, List, Optional
+
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
-from datetime import datetime, timedelta
-from sqlalchemy import select, and_
+from datetime import date, datetime, timedelta
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from core.database import get_db_context
-from core.models import User, Service, Appointment, CarWash
-from bot_client.states import BookingStates
+from core.models import User, Service, Appointment
+from core.slot_cache import get_day_slots, invalidate_day
+from core.reservations import SlotTakenError, place_hold, release_hold, reserve_slot
+from core.reminders import schedule_reminders
+from bot_client.callbacks import (
+    Booking, SERVICE, DATE, TIME, CONFIRM, CANCEL, BACK_TO_SERVICES, BACK_TO_DATES
+)
 from bot_client.keyboards import (
     get_services_keyboard, get_dates_keyboard, 
     get_times_keyboard, get_confirmation_keyboard
@@ -14,187 +22,154 @@ from bot_client.keyboards import (
 
 router = Router()
 
+async def get_services_list(db: AsyncSession, car_wash_id: int) -> List[Dict]:
+    """Активные услуги мойки для клавиатуры"""
+    result = await db.execute(
+        select(Service.id, Service.name, Service.price, Service.duration).where(
+            Service.car_wash_id == car_wash_id,
+            Service.is_active == True
+        )
+    )
+    return [row._asdict() for row in result]
+
 @router.message(F.text == "🚗 Записаться")
-async def booking_start(message: Message, state: FSMContext):
-    """Начало записи"""
+async def booking_start(message: Message, state: FSMContext, raw_state: Optional[str]):
+    """Начало записи: дальше контекст записи хранится в кнопках, а не в FSM"""
     telegram_id = message.from_user.id
     
+    if raw_state is not None:
+        # Выходим из другого сценария (например, покупки абонемента)
+        await state.clear()
+    
     async with get_db_context() as db:
-        # Получаем пользователя
         result = await db.execute(
-            select(User).where(User.telegram_id == telegram_id)
+            select(User.car_wash_id).where(User.telegram_id == telegram_id)
         )
-        user = result.scalar_one()
-        
-        # Сохраняем ID мойки
-        await state.update_data(car_wash_id=user.car_wash_id)
-        
-        # Получаем услуги
-        result = await db.execute(
-            select(Service).where(
-                Service.car_wash_id == user.car_wash_id,
-                Service.is_active == True
-            )
-        )
-        services = result.scalars().all()
-        
-        services_list = [{
-            "id": s.id,
-            "name": s.name,
-            "price": s.price,
-            "duration": s.duration
-        } for s in services]
+        car_wash_id = result.scalar_one()
+        services_list = await get_services_list(db, car_wash_id)
     
-    await state.set_state(BookingStates.choosing_service)
     await message.answer(
         "Выберите услугу:",
-        reply_markup=get_services_keyboard(services_list)
+        reply_markup=get_services_keyboard(services_list, car_wash_id)
     )
 
-@router.callback_query(BookingStates.choosing_service, F.data.startswith("service:"))
-async def service_chosen(callback: CallbackQuery, state: FSMContext):
+@router.callback_query(Booking.filter(F.step == SERVICE))
+async def service_chosen(callback: CallbackQuery, callback_data: Booking):
     """Выбор услуги"""
-    service_id = int(callback.data.split(":")[1])
-    await state.update_data(service_id=service_id)
-    
-    await state.set_state(BookingStates.choosing_date)
     await callback.message.edit_text(
         "Выберите дату:",
-        reply_markup=get_dates_keyboard()
+        reply_markup=get_dates_keyboard(callback_data)
     )
     await callback.answer()
 
-@router.callback_query(BookingStates.choosing_date, F.data.startswith("date:"))
-async def date_chosen(callback: CallbackQuery, state: FSMContext):
-    """Выбор даты"""
-    date_str = callback.data.split(":")[1]
-    await state.update_data(selected_date=date_str)
+async def show_times(callback: CallbackQuery, booking: Booking, notice: str = "") -> bool:
+    """Показать свободное время на выбранную дату"""
+    # Свободные слоты с учетом графика, длительности услуги и занятых интервалов
+    slots = await get_day_slots(booking.wash, booking.service, booking.duration, booking.date)
     
-    # Получаем доступное время
-    data = await state.get_data()
-    service_id = data.get("service_id")
-    car_wash_id = data.get("car_wash_id")
+    if not slots:
+        await callback.answer("На эту дату нет свободного времени", show_alert=True)
+        return False
     
-    async with get_db_context() as db:
-        # Получаем услугу
-        result = await db.execute(
-            select(Service).where(Service.id == service_id)
-        )
-        service = result.scalar_one()
-        
-        # Получаем график работы
-        result = await db.execute(
-            select(CarWash).where(CarWash.id == car_wash_id)
-        )
-        carwash = result.scalar_one()
-        
-        # Получаем занятые слоты
-        selected_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-        day_start = datetime.combine(selected_date, datetime.min.time())
-        day_end = datetime.combine(selected_date, datetime.max.time())
-        
-        result = await db.execute(
-            select(Appointment).where(
-                Appointment.car_wash_id == car_wash_id,
-                Appointment.appointment_time >= day_start,
-                Appointment.appointment_time <= day_end,
-                Appointment.status.in_(["confirmed", "pending"])
-            )
-        )
-        busy = result.scalars().all()
-        
-        # Генерируем свободные слоты
-        busy_times = [a.appointment_time for a in busy]
-        
-        # Простая генерация слотов (для MVP)
-        slots = []
-        for hour in range(9, 21):  # 9:00 - 21:00
-            time_str = f"{hour:02d}:00"
-            slot_time = datetime.combine(selected_date, datetime.strptime(time_str, "%H:%M").time())
-            
-            if slot_time not in busy_times:
-                slots.append(time_str)
-    
-    await state.set_state(BookingStates.choosing_time)
     await callback.message.edit_text(
-        f"Дата: {selected_date.strftime('%d.%m.%Y')}\n\n"
+        f"{notice}"
+        f"Дата: {booking.date.strftime('%d.%m.%Y')}\n\n"
         f"Выберите время:",
-        reply_markup=get_times_keyboard(slots[:10])  # Ограничим 10 слотами
+        reply_markup=get_times_keyboard(slots[:10], booking)  # Ограничим 10 слотами
     )
-    await callback.answer()
+    return True
+
+@router.callback_query(Booking.filter(F.step == DATE))
+async def date_chosen(callback: CallbackQuery, callback_data: Booking):
+    """Выбор даты"""
+    if callback_data.date < date.today():
+        await callback.answer("Эта дата уже прошла, выберите другую", show_alert=True)
+        return
+    
+    if await show_times(callback, callback_data):
+        await callback.answer()
 
-@router.callback_query(BookingStates.choosing_time, F.data.startswith("time:"))
-async def time_chosen(callback: CallbackQuery, state: FSMContext):
+@router.callback_query(Booking.filter(F.step == TIME))
+async def time_chosen(callback: CallbackQuery, callback_data: Booking):
     """Выбор времени"""
-    time_str = callback.data.split(":")[1]
-    await state.update_data(selected_time=time_str)
+    selected_datetime = callback_data.start
+    if selected_datetime <= datetime.now():
+        await callback.answer("Это время уже прошло", show_alert=True)
+        return
     
-    data = await state.get_data()
-    service_id = data.get("service_id")
+    # Придерживаем слот, пока клиент подтверждает запись (единственная запись в Redis)
+    if not await place_hold(callback_data.wash, selected_datetime, callback.from_user.id):
+        await callback.answer("Это время уже выбрал другой клиент", show_alert=True)
+        return
     
     async with get_db_context() as db:
         result = await db.execute(
-            select(Service).where(Service.id == service_id)
+            select(Service.name, Service.price).where(Service.id == callback_data.service)
         )
-        service = result.scalar_one()
+        service = result.one()
     
-    selected_date = datetime.strptime(data["selected_date"], "%Y-%m-%d").date()
-    selected_datetime = datetime.combine(selected_date, datetime.strptime(time_str, "%H:%M").time())
-    
-    await state.set_state(BookingStates.confirming)
     await callback.message.edit_text(
         f"📝 <b>Проверьте данные:</b>\n\n"
         f"Услуга: {service.name}\n"
         f"Дата: {selected_datetime.strftime('%d.%m.%Y')}\n"
-        f"Время: {time_str}\n"
+        f"Время: {selected_datetime.strftime('%H:%M')}\n"
         f"Стоимость: {service.price}₽\n\n"
         f"Всё верно?",
-        reply_markup=get_confirmation_keyboard()
+        reply_markup=get_confirmation_keyboard(callback_data)
     )
     await callback.answer()
 
-@router.callback_query(BookingStates.confirming, F.data == "confirm")
-async def confirm_booking(callback: CallbackQuery, state: FSMContext):
+@router.callback_query(Booking.filter(F.step == CONFIRM))
+async def confirm_booking(callback: CallbackQuery, callback_data: Booking):
     """Подтверждение записи"""
-    data = await state.get_data()
     telegram_id = callback.from_user.id
+    car_wash_id = callback_data.wash
+    appointment_time = callback_data.start
+    
+    try:
+        async with get_db_context() as db:
+            # Получаем пользователя
+            result = await db.execute(
+                select(User.id).where(User.telegram_id == telegram_id)
+            )
+            user_id = result.scalar_one()
+            
+            # Получаем услугу (длительность - из БД, а не из кнопки)
+            result = await db.execute(
+                select(Service).where(
+                    Service.id == callback_data.service,
+                    Service.car_wash_id == car_wash_id
+                )
+            )
+            service = result.scalar_one()
+            
+            # Холд мог истечь и достаться другому клиенту
+            if not await place_hold(car_wash_id, appointment_time, telegram_id):
+                raise SlotTakenError()
+            
+            # Создаем запись
+            end_time = appointment_time + timedelta(minutes=service.duration)
+            
+            appointment = Appointment(
+                user_id=user_id,
+                service_id=service.id,
+                car_wash_id=car_wash_id,
+                appointment_time=appointment_time,
+                end_time=end_time,
+                status="confirmed"
+            )
+            await reserve_slot(db, appointment)
+    except SlotTakenError:
+        # Кэш показал этот слот свободным - он устарел
+        await invalidate_day(car_wash_id, appointment_time.date())
+        if await show_times(callback, callback_data, notice="❌ Это время только что заняли.\n\n"):
+            await callback.answer("Время уже занято", show_alert=True)
+        return
+    
+    await release_hold(car_wash_id, appointment_time, telegram_id)
+    await invalidate_day(car_wash_id, appointment_time.date())
+    await schedule_reminders(appointment.id, appointment_time)
     
-    service_id = data.get("service_id")
-    date_str = data.get("selected_date")
-    time_str = data.get("selected_time")
-    
-    appointment_time = datetime.strptime(
-        f"{date_str} {time_str}", "%Y-%m-%d %H:%M"
-    )
-    
-    async with get_db_context() as db:
-        # Получаем пользователя
-        result = await db.execute(
-            select(User).where(User.telegram_id == telegram_id)
-        )
-        user = result.scalar_one()
-        
-        # Получаем услугу
-        result = await db.execute(
-            select(Service).where(Service.id == service_id)
-        )
-        service = result.scalar_one()
-        
-        # Создаем запись
-        end_time = appointment_time + timedelta(minutes=service.duration)
-        
-        appointment = Appointment(
-            user_id=user.id,
-            service_id=service_id,
-            car_wash_id=user.car_wash_id,
-            appointment_time=appointment_time,
-            end_time=end_time,
-            status="confirmed"
-        )
-        db.add(appointment)
-        await db.commit()
-    
-    await state.clear()
     await callback.message.edit_text(
         f"✅ <b>Запись подтверждена!</b>\n\n"
         f"📅 {appointment_time.strftime('%d.%m.%Y в %H:%M')}\n"
@@ -203,48 +178,37 @@ async def confirm_booking(callback: CallbackQuery, state: FSMContext):
     )
     await callback.answer()
 
-@router.callback_query(F.data == "cancel")
-async def cancel_booking(callback: CallbackQuery, state: FSMContext):
+@router.callback_query(Booking.filter(F.step == CANCEL))
+async def cancel_booking(callback: CallbackQuery, callback_data: Booking):
     """Отмена записи"""
-    await state.clear()
+    await release_hold(callback_data.wash, callback_data.start, callback.from_user.id)
     await callback.message.edit_text("❌ Запись отменена.")
     await callback.answer()
 
-@router.callback_query(F.data == "back_to_services")
-async def back_to_services(callback: CallbackQuery, state: FSMContext):
+@router.callback_query(Booking.filter(F.step == BACK_TO_SERVICES))
+async def back_to_services(callback: CallbackQuery, callback_data: Booking):
     """Назад к услугам"""
-    data = await state.get_data()
-    car_wash_id = data.get("car_wash_id")
-    
     async with get_db_context() as db:
-        result = await db.execute(
-            select(Service).where(
-                Service.car_wash_id == car_wash_id,
-                Service.is_active == True
-            )
-        )
-        services = result.scalars().all()
-        
-        services_list = [{
-            "id": s.id,
-            "name": s.name,
-            "price": s.price,
-            "duration": s.duration
-        } for s in services]
+        services_list = await get_services_list(db, callback_data.wash)
     
-    await state.set_state(BookingStates.choosing_service)
     await callback.message.edit_text(
         "Выберите услугу:",
-        reply_markup=get_services_keyboard(services_list)
+        reply_markup=get_services_keyboard(services_list, callback_data.wash)
     )
     await callback.answer()
 
-@router.callback_query(F.data == "back_to_dates")
-async def back_to_dates(callback: CallbackQuery, state: FSMContext):
+@router.callback_query(Booking.filter(F.step == BACK_TO_DATES))
+async def back_to_dates(callback: CallbackQuery, callback_data: Booking):
     """Назад к датам"""
-    await state.set_state(BookingStates.choosing_date)
     await callback.message.edit_text(
         "Выберите дату:",
-        reply_markup=get_dates_keyboard()
+        reply_markup=get_dates_keyboard(callback_data)
     )
     await callback.answer()
+
+@router.callback_query(
+    F.data.regexp(r"^(service|date|time):") | F.data.in_({"confirm", "cancel", "back_to_services", "back_to_dates"})
+)
+async def stale_menu(callback: CallbackQuery):
+    """Кнопки записи старого формата (до переноса контекста в callback_data)"""
+    await callback.answer("Меню устарело, начните запись заново", show_alert=True)
@@ -4,6 +4,8 @@ from sqlalchemy import select, desc
 
 from core.database import get_db_context
 from core.models import User, Appointment, Service, Subscription
+from core.queries import get_user_history
+from core.tenants import get_tenant
 
 router = Router()
 
@@ -13,18 +15,7 @@ async def my_appointments(message: Message):
     telegram_id = message.from_user.id
     
     async with get_db_context() as db:
-        result = await db.execute(
-            select(User).where(User.telegram_id == telegram_id)
-        )
-        user = result.scalar_one()
-        
-        result = await db.execute(
-            select(Appointment)
-            .where(Appointment.user_id == user.id)
-            .order_by(desc(Appointment.appointment_time))
-            .limit(10)
-        )
-        appointments = result.scalars().all()
+        appointments = await get_user_history(db, 10, telegram_id=telegram_id)
     
     if not appointments:
         await message.answer("У вас пока нет записей.")
@@ -33,12 +24,6 @@ async def my_appointments(message: Message):
     text = "📋 <b>Ваши последние записи:</b>\n\n"
     
     for apt in appointments:
-        async with get_db_context() as db:
-            result = await db.execute(
-                select(Service).where(Service.id == apt.service_id)
-            )
-            service = result.scalar_one()
-        
         date_str = apt.appointment_time.strftime("%d.%m.%Y %H:%M")
         status_emoji = {
             "confirmed": "✅",
@@ -46,7 +31,7 @@ async def my_appointments(message: Message):
             "cancelled": "❌"
         }.get(apt.status, "⏳")
         
-        text += f"{status_emoji} {date_str} - {service.name}\n"
+        text += f"{status_emoji} {date_str} - {apt.service_name}\n"
     
     await message.answer(text)
 
@@ -57,14 +42,16 @@ async def contacts(message: Message):
     
     async with get_db_context() as db:
         result = await db.execute(
-            select(User).where(User.telegram_id == telegram_id)
+            select(User.car_wash_id).where(User.telegram_id == telegram_id)
         )
-        user = result.scalar_one()
-        
-        result = await db.execute(
-            select(CarWash).where(CarWash.id == user.car_wash_id)
-        )
-        carwash = result.scalar_one()
+        car_wash_id = result.scalar_one_or_none()
+    
+    # Контакты и график - из справочника моек, без запроса к carwashes
+    carwash = await get_tenant(car_wash_id)
+    if carwash is None:
+        # Клиент без мойки или мойка удалена
+        await message.answer("Откройте бота по ссылке или QR-коду вашей автомойки.")
+        return
     
     text = (
         f"🏢 <b>{carwash.name}</b>\n\n"
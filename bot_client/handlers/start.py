@@ -1,50 +1,116 @@
+from typing import Optional
+
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
-from aiogram.filters import CommandStart
+from aiogram.filters import CommandObject, CommandStart
 from aiogram.fsm.context import FSMContext
-from sqlalchemy import select
+from sqlalchemy import and_, case, literal_column, or_, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from core.database import get_db_context
-from core.models import User, CarWash
+from core.identity import invalidate_identity
+from core.models import User
+from core.tenants import parse_payload, resolve_tenant
 from bot_client.keyboards import get_main_keyboard
 
 router = Router()
 
+async def upsert_client(
+    db: AsyncSession,
+    telegram_id: int,
+    full_name: str,
+    username: Optional[str],
+    car_wash_id: int,
+    switch_wash: bool
+):
+    """Регистрация или обновление профиля одним запросом.
+
+    Возвращает (inserted,) для новой или измененной строки и None, если
+    пользователь уже есть и ничего не поменялось (строка не переписывается).
+    """
+    stmt = insert(User).values(
+        telegram_id=telegram_id,
+        car_wash_id=car_wash_id,
+        role="client",
+        full_name=full_name,
+        username=username,
+        balance=0
+    )
+    excluded = stmt.excluded
+    changed = [
+        User.full_name.is_distinct_from(excluded.full_name),
+        User.username.is_distinct_from(excluded.username),
+    ]
+    set_ = {"full_name": excluded.full_name, "username": excluded.username}
+    if switch_wash:
+        # Сотрудников ссылка клиентского бота не переносит
+        is_client = User.role == "client"
+        set_["car_wash_id"] = case((is_client, excluded.car_wash_id), else_=User.car_wash_id)
+        changed.append(and_(is_client, User.car_wash_id.is_distinct_from(excluded.car_wash_id)))
+    
+    result = await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[User.telegram_id],
+            set_=set_,
+            where=or_(*changed)
+        ).returning(literal_column("xmax = 0").label("inserted"))
+    )
+    return result.first()
+
 @router.message(CommandStart())
-async def cmd_start(message: Message, state: FSMContext):
-    """Обработка команды /start"""
+async def cmd_start(message: Message, state: FSMContext, command: CommandObject):
+    """Обработка команды /start (ссылка мойки: /start wash_42)"""
     await state.clear()
     
     telegram_id = message.from_user.id
     full_name = message.from_user.full_name
     username = message.from_user.username
     
+    # Мойка из ссылки; без ссылки - только если мойка одна
+    carwash = await resolve_tenant(command.args)
+    
     async with get_db_context() as db:
-        # Поиск пользователя
-        result = await db.execute(
-            select(User).where(User.telegram_id == telegram_id)
-        )
-        user = result.scalar_one_or_none()
-        
-        if not user:
-            # Создание нового пользователя
-            result = await db.execute(select(CarWash))
-            carwash = result.scalar_one()
-            
-            user = User(
-                telegram_id=telegram_id,
-                car_wash_id=carwash.id,
-                role="client",
-                full_name=full_name,
-                username=username,
-                balance=0
+        if carwash is None:
+            # Новых без мойки не создаем, известным обновляем профиль
+            result = await db.execute(
+                update(User)
+                .where(User.telegram_id == telegram_id)
+                .values(full_name=full_name, username=username)
+                .returning(User.id)
             )
-            db.add(user)
+            known = result.first() is not None
             await db.commit()
+            if known:
+                # Имя в кэше пользователя могло измениться
+                await invalidate_identity(telegram_id)
             
-            welcome = f"👋 Добро пожаловать, {full_name}!"
-        else:
+            if not known:
+                await message.answer(
+                    "👋 Здравствуйте!\n\n"
+                    "Откройте бота по ссылке или QR-коду вашей автомойки."
+                )
+                return
             welcome = f"👋 С возвращением, {full_name}!"
+        else:
+            row = await upsert_client(
+                db, telegram_id, full_name, username, carwash.id,
+                switch_wash=parse_payload(command.args) == carwash.id
+            )
+            await db.commit()
+            if row is not None:
+                # Новая или измененная строка (имя, мойка): сбрасываем кэш во всех ботах
+                await invalidate_identity(telegram_id)
+            
+            if row is None:
+                welcome = f"👋 С возвращением, {full_name}!"
+            elif row.inserted:
+                welcome = f"👋 Добро пожаловать в {carwash.name}, {full_name}!"
+            elif parse_payload(command.args) == carwash.id:
+                # Ссылка другой мойки переключила клиента на нее
+                welcome = f"👋 {full_name}, вы записываетесь в {carwash.name}."
+            else:
+                welcome = f"👋 С возвращением, {full_name}!"
     
     await message.answer(
         f"{welcome}\n\n"
@@ -1,135 +1,158 @@
+from html import escape
+
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery, BufferedInputFile
 from aiogram.fsm.context import FSMContext
-from datetime import datetime, timedelta
-import qrcode
-from io import BytesIO
+from aiogram.exceptions import TelegramBadRequest
 from sqlalchemy import select
 
+from core.catalog import get_plan, get_plans
+from core.config import settings
 from core.database import get_db_context
-from core.models import User, Transaction, Subscription
+from core.models import User, Transaction
+from core.outbox import enqueue
 from bot_client.states import SubscriptionStates
 from bot_client.keyboards import get_subscriptions_keyboard, get_payment_keyboard
+from bot_client.qr import payment_payload, get_photo, get_png, remember_file_id, forget_file_id
 
 router = Router()
 
-# Шаблоны абонементов
-SUBSCRIPTION_TEMPLATES = [
-    {"id": 1, "name": "🌱 Эконом", "washes": 5, "price": 2000, "days": 30},
-    {"id": 2, "name": "🌿 Стандарт", "washes": 10, "price": 3500, "days": 45},
-    {"id": 3, "name": "🌳 Премиум", "washes": 20, "price": 6000, "days": 60},
-]
-
 @router.message(F.text == "🎫 Абонементы")
 async def show_subscriptions(message: Message, state: FSMContext):
-    """Показать доступные абонементы"""
+    """Показать доступные абонементы (каталог мойки из кэша)"""
+    # Мойка клиента - из БД: кэш пользователей рассчитан на сотрудников
+    async with get_db_context() as db:
+        result = await db.execute(
+            select(User.car_wash_id).where(User.telegram_id == message.from_user.id)
+        )
+        car_wash_id = result.scalar_one_or_none()
+    plans = await get_plans(car_wash_id) if car_wash_id else []
+    
+    if not plans:
+        await message.answer("🎫 Абонементы пока не продаются.")
+        return
+    
     await state.set_state(SubscriptionStates.choosing)
     await message.answer(
         "🎫 <b>Доступные абонементы:</b>\n\n"
         "Абонемент дает право на определенное количество моек.",
-        reply_markup=get_subscriptions_keyboard(SUBSCRIPTION_TEMPLATES)
+        reply_markup=get_subscriptions_keyboard(plans)
     )
 
 @router.callback_query(SubscriptionStates.choosing, F.data.startswith("buy_sub:"))
 async def buy_subscription(callback: CallbackQuery, state: FSMContext):
     """Покупка абонемента"""
-    sub_id = int(callback.data.split(":")[1])
-    template = next((s for s in SUBSCRIPTION_TEMPLATES if s["id"] == sub_id), None)
+    plan_id = int(callback.data.split(":")[1])
     
-    if not template:
-        await callback.answer("Абонемент не найден")
-        return
-    
-    await state.update_data(template=template)
-    
-    # Создаем транзакцию
     async with get_db_context() as db:
+        # Мойку покупки берем из БД, а не из кэша: ссылка могла только что переключить клиента
         result = await db.execute(
-            select(User).where(User.telegram_id == callback.from_user.id)
+            select(User.id, User.car_wash_id).where(User.telegram_id == callback.from_user.id)
         )
-        user = result.scalar_one()
+        client = result.one_or_none()
+        plan = await get_plan(client.car_wash_id, plan_id) if client and client.car_wash_id else None
         
+        if plan is None or not plan.is_active:
+            await callback.answer("Абонемент больше не продается", show_alert=True)
+            return
+        
+        # Создаем транзакцию; абонемент выдается по plan_id при подтверждении
         transaction = Transaction(
-            user_id=user.id,
-            car_wash_id=user.car_wash_id,
-            amount=template["price"],
+            user_id=client.id,
+            car_wash_id=client.car_wash_id,
+            amount=plan.price,
             type="subscription_purchase",
-            status="pending"
+            status="pending",
+            plan_id=plan.id
         )
         db.add(transaction)
         await db.commit()
         await db.refresh(transaction)
     
-    # Генерируем QR-код
-    qr = qrcode.QRCode(version=1, box_size=10, border=5)
-    qr.add_data(f"WASHBOT:PAY:{template['price']}:{template['name']}")
-    qr.make(fit=True)
-    
-    img = qr.make_image(fill_color="black", back_color="white")
-    bio = BytesIO()
-    img.save(bio, format='PNG')
-    bio.seek(0)
+    # QR-код: file_id после первой загрузки, иначе PNG из пула рендеринга
+    payload = payment_payload(plan.price, plan.name)
+    caption = (
+        f"💳 <b>Оплата абонемента</b>\n\n"
+        f"{escape(plan.name)}\n"
+        f"Сумма: {plan.price}₽\n\n"
+        f"1️⃣ Оплатите по QR-коду\n"
+        f"2️⃣ Нажмите 'Я оплатил'\n"
+        f"3️⃣ Администратор подтвердит платеж"
+    )
     
     await callback.message.delete()
-    await callback.message.answer_photo(
-        BufferedInputFile(bio.getvalue(), filename="qr.png"),
-        caption=(
-            f"💳 <b>Оплата абонемента</b>\n\n"
-            f"{template['name']}\n"
-            f"Сумма: {template['price']}₽\n\n"
-            f"1️⃣ Оплатите по QR-коду\n"
-            f"2️⃣ Нажмите 'Я оплатил'\n"
-            f"3️⃣ Администратор подтвердит платеж"
-        ),
-        reply_markup=get_payment_keyboard(transaction.id)
-    )
+    photo = await get_photo(payload)
+    try:
+        sent = await callback.message.answer_photo(
+            photo,
+            caption=caption,
+            reply_markup=get_payment_keyboard(transaction.id)
+        )
+    except TelegramBadRequest:
+        if isinstance(photo, BufferedInputFile):
+            raise
+        # Сохраненный file_id устарел - загружаем заново
+        await forget_file_id(payload)
+        photo = BufferedInputFile(await get_png(payload), filename="qr.png")
+        sent = await callback.message.answer_photo(
+            photo,
+            caption=caption,
+            reply_markup=get_payment_keyboard(transaction.id)
+        )
+    
+    if isinstance(photo, BufferedInputFile):
+        await remember_file_id(payload, sent)
     
     await state.set_state(SubscriptionStates.waiting_payment)
     await callback.answer()
 
 @router.callback_query(SubscriptionStates.waiting_payment, F.data.startswith("paid:"))
 async def payment_confirmed(callback: CallbackQuery, state: FSMContext):
-    """Подтверждение оплаты клиентом"""
+    """Клиент сообщил об оплате: платеж ждет администратора, абонемент - после подтверждения"""
     transaction_id = int(callback.data.split(":")[1])
     
     async with get_db_context() as db:
         result = await db.execute(
-            select(Transaction).where(Transaction.id == transaction_id)
+            select(Transaction.status, Transaction.car_wash_id, Transaction.amount, User.full_name)
+            .join(User, User.id == Transaction.user_id)
+            .where(
+                Transaction.id == transaction_id,
+                User.telegram_id == callback.from_user.id
+            )
         )
-        transaction = result.scalar_one()
+        transaction = result.one_or_none()
         
-        if transaction.status != "pending":
-            await callback.message.edit_text("❌ Транзакция уже обработана")
+        if transaction is None or transaction.status != "pending":
+            await callback.message.edit_caption(caption="❌ Транзакция уже обработана")
             await state.clear()
             await callback.answer()
             return
         
-        transaction.status = "approved"
-        transaction.approved_at = datetime.now()
-        await db.commit()
-        
-        # Создаем абонемент
-        data = await state.get_data()
-        template = data.get("template")
-        
-        subscription = Subscription(
-            user_id=transaction.user_id,
-            car_wash_id=transaction.car_wash_id,
-            name=template["name"],
-            total_washes=template["washes"],
-            remaining_washes=template["washes"],
-            purchase_price=template["price"],
-            valid_until=datetime.now().date() + timedelta(days=template["days"]),
-            is_active=True
+        result = await db.execute(
+            select(User.telegram_id).where(
+                User.car_wash_id == transaction.car_wash_id,
+                User.role == "admin",
+                User.is_blocked == False
+            )
         )
-        db.add(subscription)
-        await db.commit()
+        admins = result.scalars().all()
     
-    await callback.message.edit_text(
-        f"✅ <b>Абонемент активирован!</b>\n\n"
-        f"{template['name']}\n"
-        f"Доступно моек: {template['washes']}\n"
-        f"Срок действия: {template['days']} дней"
+    # Подтверждают в боте сотрудников (💰 Платежи); сообщение - через его очередь
+    employee_bot_id = int(settings.BOT_EMPLOYEE_TOKEN.split(":", 1)[0])
+    for admin_telegram_id in admins:
+        await enqueue(
+            employee_bot_id,
+            admin_telegram_id,
+            f"💰 Клиент {escape(transaction.full_name or '')} оплатил платеж #{transaction_id} "
+            f"на {transaction.amount}₽ - подтвердите в разделе «💰 Платежи»"
+        )
+    
+    await callback.message.edit_caption(
+        caption=(
+            "⏳ <b>Платеж отправлен на проверку</b>\n\n"
+            "Абонемент активируется, когда администратор подтвердит оплату - "
+            "мы пришлем сообщение."
+        )
     )
     await state.clear()
     await callback.answer()
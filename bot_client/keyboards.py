@@ -1,8 +1,15 @@
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import ReplyKeyboardBuilder, InlineKeyboardBuilder
-from datetime import datetime, timedelta
-from typing import List, Dict
+from datetime import date, timedelta
+from typing import List, Dict, Tuple
 
+from core.catalog import Plan
+from core.markup import memoized, static
+from bot_client.callbacks import (
+    Booking, SERVICE, DATE, TIME, CONFIRM, CANCEL, BACK_TO_SERVICES, BACK_TO_DATES
+)
+
+@static
 def get_main_keyboard() -> ReplyKeyboardMarkup:
     """Главное меню клиента"""
     builder = ReplyKeyboardBuilder()
@@ -16,6 +23,7 @@ def get_main_keyboard() -> ReplyKeyboardMarkup:
     )
     return builder.as_markup(resize_keyboard=True)
 
+@static
 def get_phone_keyboard() -> ReplyKeyboardMarkup:
     """Клавиатура для запроса телефона"""
     builder = ReplyKeyboardBuilder()
@@ -24,64 +32,104 @@ def get_phone_keyboard() -> ReplyKeyboardMarkup:
     builder.adjust(1)
     return builder.as_markup(resize_keyboard=True)
 
-def get_services_keyboard(services: List[Dict]) -> InlineKeyboardMarkup:
+def get_services_keyboard(services: List[Dict], car_wash_id: int) -> InlineKeyboardMarkup:
     """Клавиатура выбора услуг"""
+    # Ключ - содержимое списка: правка услуги дает новую клавиатуру
+    return _services_keyboard(
+        car_wash_id,
+        tuple((s['id'], s['name'], s['price'], s['duration']) for s in services)
+    )
+
+@memoized()
+def _services_keyboard(car_wash_id: int, services: Tuple[tuple, ...]) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
-    for s in services:
+    for service_id, name, price, duration in services:
         builder.row(
             InlineKeyboardButton(
-                text=f"{s['name']} - {s['price']}₽ ({s['duration']} мин)",
-                callback_data=f"service:{s['id']}"
+                text=f"{name} - {price}₽ ({duration} мин)",
+                callback_data=Booking(
+                    step=SERVICE, wash=car_wash_id, service=service_id, duration=duration
+                ).pack()
             )
         )
     builder.row(InlineKeyboardButton(text="◀️ Назад", callback_data="back_to_main"))
     return builder.as_markup()
 
-def get_dates_keyboard(days: int = 7) -> InlineKeyboardMarkup:
+def _context(booking: Booking) -> tuple:
+    """Поля записи, от которых зависят кнопки (шаг кнопки задает сама)"""
+    return (booking.wash, booking.service, booking.duration, booking.day, booking.minute)
+
+def _booking(context: tuple) -> Booking:
+    wash, service, duration, day, minute = context
+    return Booking(step=SERVICE, wash=wash, service=service, duration=duration, day=day, minute=minute)
+
+def get_dates_keyboard(booking: Booking, days: int = 7) -> InlineKeyboardMarkup:
     """Клавиатура выбора даты"""
+    # Одно чтение часов на показ; новый день - новый ключ
+    return _dates_keyboard(_context(booking), date.today(), days)
+
+@memoized()
+def _dates_keyboard(context: tuple, today: date, days: int) -> InlineKeyboardMarkup:
+    booking = _booking(context)
     builder = InlineKeyboardBuilder()
     weekdays = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"]
     
     for i in range(days):
-        date = datetime.now() + timedelta(days=i)
-        weekday = weekdays[date.weekday()]
-        date_str = date.strftime(f"%d.%m")
-        callback = date.strftime("%Y-%m-%d")
+        day = today + timedelta(days=i)
         builder.row(
             InlineKeyboardButton(
-                text=f"{date_str} ({weekday})",
-                callback_data=f"date:{callback}"
+                text=f"{day.strftime('%d.%m')} ({weekdays[day.weekday()]})",
+                callback_data=booking.to(DATE, day=day.toordinal()).pack()
             )
         )
-    builder.row(InlineKeyboardButton(text="◀️ Назад", callback_data="back_to_services"))
+    builder.row(InlineKeyboardButton(
+        text="◀️ Назад",
+        callback_data=Booking(step=BACK_TO_SERVICES, wash=booking.wash).pack()
+    ))
     return builder.as_markup()
 
-def get_times_keyboard(times: List[str]) -> InlineKeyboardMarkup:
+def get_times_keyboard(times: List[str], booking: Booking) -> InlineKeyboardMarkup:
     """Клавиатура выбора времени"""
+    return _times_keyboard(tuple(times), _context(booking))
+
+@memoized()
+def _times_keyboard(times: Tuple[str, ...], context: tuple) -> InlineKeyboardMarkup:
+    booking = _booking(context)
     builder = InlineKeyboardBuilder()
     for time in times:
-        builder.add(InlineKeyboardButton(text=time, callback_data=f"time:{time}"))
+        hours, minutes = map(int, time.split(":"))
+        builder.add(InlineKeyboardButton(
+            text=time,
+            callback_data=booking.to(TIME, minute=hours * 60 + minutes).pack()
+        ))
     builder.adjust(3)
-    builder.row(InlineKeyboardButton(text="◀️ Назад", callback_data="back_to_dates"))
+    builder.row(InlineKeyboardButton(
+        text="◀️ Назад",
+        callback_data=booking.to(BACK_TO_DATES, day=None).pack()
+    ))
     return builder.as_markup()
 
-def get_confirmation_keyboard() -> InlineKeyboardMarkup:
+def get_confirmation_keyboard(booking: Booking) -> InlineKeyboardMarkup:
     """Клавиатура подтверждения"""
     builder = InlineKeyboardBuilder()
     builder.row(
-        InlineKeyboardButton(text="✅ Подтвердить", callback_data="confirm"),
-        InlineKeyboardButton(text="❌ Отмена", callback_data="cancel")
+        InlineKeyboardButton(text="✅ Подтвердить", callback_data=booking.to(CONFIRM).pack()),
+        InlineKeyboardButton(text="❌ Отмена", callback_data=booking.to(CANCEL).pack())
     )
     return builder.as_markup()
 
-def get_subscriptions_keyboard(subs: List[Dict]) -> InlineKeyboardMarkup:
+def get_subscriptions_keyboard(plans: List[Plan]) -> InlineKeyboardMarkup:
     """Клавиатура абонементов"""
+    return _subscriptions_keyboard(tuple(plans))
+
+@memoized()
+def _subscriptions_keyboard(plans: Tuple[Plan, ...]) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
-    for s in subs:
+    for plan in plans:
         builder.row(
             InlineKeyboardButton(
-                text=f"{s['name']} - {s['price']}₽",
-                callback_data=f"buy_sub:{s['id']}"
+                text=f"{plan.name} - {plan.price}₽ ({plan.washes} моек, {plan.days} дн.)",
+                callback_data=f"buy_sub:{plan.id}"
             )
         )
     builder.row(InlineKeyboardButton(text="◀️ Назад", callback_data="back_to_main"))
@@ -5,32 +5,51 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.redis import RedisStorage
-from aiogram.client.default import DefaultBotProperties
+from aiogram.fsm.storage.base import BaseStorage
 from aiogram.enums import ParseMode
 
 from core.config import settings
 from core.logger import setup_logger
-from core.database import init_db
+from core.runtime import bootstrap, create_storage, shutdown
+from core.reminders import run_scheduler
+from core.tenants import listen_invalidations
+from core.webhook import BotApp, run_webhook
+from core.metrics import setup_metrics
+from core.outbox import setup_outbox
 from bot_client.handlers import start, booking, subscriptions, profile
+from bot_client import qr
 
 logger = setup_logger("bot_client")
 
-async def main():
-    logger.info("Starting Client Bot")
+WEBHOOK_PATH = "/client"
+
+_background_tasks = set()
+
+def create_bot() -> Bot:
+    """Создание бота"""
+    return Bot(token=settings.BOT_CLIENT_TOKEN, parse_mode=ParseMode.HTML)
+
+async def on_startup():
+    # Сброс справочника моек по сигналам других процессов
+    _background_tasks.add(asyncio.create_task(listen_invalidations()))
+    # Напоминания о записях из ZSET; снятие атомарное, дублей между процессами нет
+    _background_tasks.add(asyncio.create_task(run_scheduler()))
+
+async def on_shutdown():
+    for task in _background_tasks:
+        task.cancel()
+    _background_tasks.clear()
+    qr.shutdown()
+
+def create_dispatcher(storage: BaseStorage) -> Dispatcher:
+    """Диспетчер с роутерами клиентского бота"""
+    dp = Dispatcher(storage=storage)
     
-    # Инициализация БД
-    await init_db()
+    # Задержки обработчиков и запросы к БД на апдейт (/metrics)
+    setup_metrics(dp)
     
-    # Создание бота
-    bot = Bot(
-        token=settings.BOT_CLIENT_TOKEN,
-        default=DefaultBotProperties(parse_mode=ParseMode.HTML)
-    )
-    
-    # Хранилище для FSM
-    storage = RedisStorage.from_url(settings.REDIS_URL)
-    dp = Dispatcher(storage=storage)
+    # Очередь исходящих сообщений с учетом лимитов Telegram (аргумент outbox)
+    setup_outbox(dp)
     
     # Регистрация роутеров
     dp.include_router(start.router)
@@ -38,15 +57,31 @@ async def main():
     dp.include_router(subscriptions.router)
     dp.include_router(profile.router)
     
+    dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
+    return dp
+
+async def main():
+    logger.info("Starting Client Bot")
+    
+    # Пулы БД/Redis и проверка схемы (миграции - python -m core.migrate)
+    await bootstrap("client")
+    
+    bot = create_bot()
+    
+    # Хранилище для FSM
+    storage = create_storage()
+    dp = create_dispatcher(storage)
+    
     # Запуск
     try:
         if settings.USE_WEBHOOK:
-            await bot.set_webhook(f"{settings.WEBHOOK_URL}/client")
-            logger.info(f"Webhook set to {settings.WEBHOOK_URL}/client")
+            await run_webhook([BotApp(WEBHOOK_PATH, bot, dp)])
         else:
             await dp.start_polling(bot)
     finally:
         await bot.session.close()
+        await shutdown()
 
 if __name__ == "__main__":
     asyncio.run(main())
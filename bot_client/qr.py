@@ -0,0 +1,74 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import Dict, Optional, Union
+
+import qrcode
+from aiogram.types import BufferedInputFile, Message
+
+from core.redis_client import get_redis
+
+# file_id уже загруженных в Telegram картинок: payload -> file_id
+FILE_ID_KEY = "washbot:qr:file_id"
+
+# Построение матрицы QR - чистый Python и держит GIL, поэтому отдельный процесс
+_executor: Optional[ProcessPoolExecutor] = None
+
+# PNG по payload; payload зависит только от цены и названия абонемента
+_png_cache: Dict[str, bytes] = {}
+
+
+def payment_payload(price, name: str) -> str:
+    """Данные для QR-кода оплаты"""
+    return f"WASHBOT:PAY:{price}:{name}"
+
+
+def render_png(payload: str) -> bytes:
+    """Отрисовать QR-код в PNG (выполняется в пуле процессов)"""
+    qr = qrcode.QRCode(version=1, box_size=10, border=5)
+    qr.add_data(payload)
+    qr.make(fit=True)
+
+    img = qr.make_image(fill_color="black", back_color="white")
+    bio = BytesIO()
+    img.save(bio, format="PNG")
+    return bio.getvalue()
+
+
+async def get_png(payload: str) -> bytes:
+    """PNG из кэша или из пула процессов, не блокируя event loop"""
+    global _executor
+    png = _png_cache.get(payload)
+    if png is None:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=1)
+        png = await asyncio.get_running_loop().run_in_executor(_executor, render_png, payload)
+        _png_cache[payload] = png
+    return png
+
+
+async def get_photo(payload: str) -> Union[str, BufferedInputFile]:
+    """file_id, если картинка уже загружалась, иначе PNG для загрузки"""
+    file_id = await get_redis().hget(FILE_ID_KEY, payload)
+    if file_id is not None:
+        return file_id.decode()
+    return BufferedInputFile(await get_png(payload), filename="qr.png")
+
+
+async def remember_file_id(payload: str, message: Message):
+    """Запомнить file_id после первой отправки"""
+    if message.photo:
+        await get_redis().hset(FILE_ID_KEY, payload, message.photo[-1].file_id)
+
+
+async def forget_file_id(payload: str):
+    """Забыть file_id, который Telegram больше не принимает"""
+    await get_redis().hdel(FILE_ID_KEY, payload)
+
+
+def shutdown():
+    """Остановить пул процессов"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,36 @@
+import zlib
+from typing import Iterable
+
+from aiogram.filters.callback_data import CallbackData
+
+# Действия сводки платежей (поле act)
+TOGGLE = "t"
+SELECT_PAGE = "s"
+APPROVE_SELECTED = "a"
+REJECT_SELECTED = "r"
+APPROVE_ALL = "x"
+NEXT = "n"
+PREV = "p"
+REFRESH = "f"
+
+
+def page_checksum(ids: Iterable[int]) -> str:
+    """Отпечаток состава страницы: маска выбора верна, только пока он совпадает"""
+    return f"{zlib.crc32(','.join(map(str, ids)).encode()) & 0xffff:04x}"
+
+
+class Review(CallbackData, prefix="pr"):
+    """Сводка платежей: выбор хранится в кнопке битовой маской по строкам страницы.
+
+    top - id первой строки страницы (для APPROVE_ALL - самый новый платеж
+    очереди на момент показа), key - ключ идемпотентности решения.
+    """
+    act: str
+    top: int = 0
+    mask: int = 0
+    crc: str = ""
+    key: str = ""
+    pos: int = 0
+
+    def to(self, act: str, **changes) -> "Review":
+        return self.model_copy(update={"act": act, **changes})
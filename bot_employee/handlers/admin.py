@@ -1,33 +1,32 @@
+from html import escape
+from typing import Optional, Tuple
+
 from aiogram import Router, F
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.types import Message, CallbackQuery
-from datetime import datetime, date
-from sqlalchemy import select, and_
+from datetime import date
 
+from core.availability import to_local_naive
 from core.database import get_db_context
-from core.models import Appointment, User, Service, Transaction, Subscription
-from bot_employee.keyboards import get_payment_keyboard
+from core.outbox import Outbox
+from core.payments import (
+    APPROVED, REJECTED, Decision, PendingPage, approve_payments, get_pending_page,
+    new_decision_key, notify_clients, queued_ids, reject_payments
+)
+from core.queries import get_day_schedule
+from bot_employee.callbacks import (
+    Review, page_checksum, TOGGLE, APPROVE_SELECTED, REJECT_SELECTED, APPROVE_ALL, NEXT, PREV, REFRESH
+)
+from bot_employee.keyboards import get_review_keyboard
 
 router = Router()
 
 @router.message(F.text == "📅 Записи на сегодня")
-async def show_today_appointments(message: Message, user: dict):
+async def show_today_appointments(message: Message, user: dict, outbox: Outbox):
     """Показать записи на сегодня"""
     
-    today_start = datetime.combine(date.today(), datetime.min.time())
-    today_end = datetime.combine(date.today(), datetime.max.time())
-    
     async with get_db_context() as db:
-        result = await db.execute(
-            select(Appointment)
-            .where(
-                Appointment.car_wash_id == user.car_wash_id,
-                Appointment.appointment_time >= today_start,
-                Appointment.appointment_time <= today_end,
-                Appointment.status.in_(["confirmed", "pending"])
-            )
-            .order_by(Appointment.appointment_time)
-        )
-        appointments = result.scalars().all()
+        appointments = await get_day_schedule(db, user.car_wash_id, date.today())
     
     if not appointments:
         await message.answer("📅 На сегодня записей нет.")
@@ -36,133 +35,189 @@ async def show_today_appointments(message: Message, user: dict):
     text = "📅 <b>Записи на сегодня:</b>\n\n"
     
     for apt in appointments:
-        async with get_db_context() as db:
-            result = await db.execute(
-                select(User).where(User.id == apt.user_id)
-            )
-            client = result.scalar_one()
-            
-            result = await db.execute(
-                select(Service).where(Service.id == apt.service_id)
-            )
-            service = result.scalar_one()
-        
         time_str = apt.appointment_time.strftime("%H:%M")
-        text += f"🕐 {time_str} - {client.full_name}\n"
-        text += f"   {service.name} - {service.price}₽\n"
+        text += f"🕐 {time_str} - {escape(apt.client_name or '')}\n"
+        text += f"   {escape(apt.service_name)} - {apt.price}₽\n"
         text += f"   Статус: {apt.status}\n\n"
         
         # Ограничим количество, чтобы не превысить лимит сообщения
         if len(text) > 3000:
-            await message.answer(text)
+            await outbox.send(message.chat.id, text)
             text = ""
     
     if text:
-        await message.answer(text)
+        await outbox.send(message.chat.id, text)
+
+REVIEW_PAGE_SIZE = 10
+
+TYPE_NAMES = {
+    "subscription_purchase": "абонемент",
+    "replenishment": "пополнение",
+    "service_payment": "оплата услуги",
+}
+
+def format_review(page: PendingPage, mask: int, notice: str = "") -> str:
+    """Текст сводки платежей"""
+    text = notice + f"💰 <b>Ожидают подтверждения: {page.total} на {page.total_amount}₽</b>\n\n"
+    for i, txn in enumerate(page.rows):
+        mark = "☑" if mask >> i & 1 else "☐"
+        text += (
+            f"{mark} <b>{i + 1}.</b> #{txn.id} {escape(txn.client_name or '')} - {txn.amount}₽, "
+            f"{TYPE_NAMES.get(txn.type, txn.type)}, "
+            f"{to_local_naive(txn.created_at).strftime('%d.%m %H:%M')}\n"
+        )
+    return text + "\nОтметьте платежи кнопками с номерами."
+
+async def edit_review(callback: CallbackQuery, page: PendingPage, mask: int, key: str, notice: str = ""):
+    """Перерисовать сводку в том же сообщении"""
+    if not page.rows:
+        text = notice + "💰 Нет ожидающих платежей."
+        markup = None
+    else:
+        text = format_review(page, mask, notice)
+        markup = get_review_keyboard(page, mask, key)
+    try:
+        await callback.message.edit_text(text, reply_markup=markup)
+    except TelegramBadRequest as e:
+        # 🔄 без изменений в очереди
+        if "message is not modified" not in str(e):
+            raise
+
+def decision_notice(decision: Decision, verb: str) -> str:
+    notice = f"{verb}: {len(decision.processed) + len(decision.replayed)}"
+    if decision.skipped:
+        notice += f", уже обработаны другими: {len(decision.skipped)}"
+    return notice + "\n\n"
 
 @router.message(F.text == "💰 Платежи")
 async def show_payments(message: Message, user: dict):
-    """Показать ожидающие платежи"""
-    
+    """Сводка ожидающих платежей одним сообщением"""
     async with get_db_context() as db:
-        result = await db.execute(
-            select(Transaction)
-            .where(
-                Transaction.car_wash_id == user.car_wash_id,
-                Transaction.status == "pending"
-            )
-            .order_by(Transaction.created_at.desc())
-        )
-        transactions = result.scalars().all()
+        page = await get_pending_page(db, user.car_wash_id, REVIEW_PAGE_SIZE)
     
-    if not transactions:
+    if not page.rows:
         await message.answer("💰 Нет ожидающих платежей.")
         return
     
-    for txn in transactions:
+    await message.answer(
+        format_review(page, 0),
+        reply_markup=get_review_keyboard(page, 0, new_decision_key())
+    )
+
+@router.callback_query(Review.filter())
+async def review_payments(callback: CallbackQuery, callback_data: Review, user: dict):
+    """Отметки, листание и решения в сводке; выбор - маска в кнопке"""
+    act = callback_data.act
+    wash = user.car_wash_id
+    
+    if act == APPROVE_ALL:
         async with get_db_context() as db:
-            result = await db.execute(
-                select(User).where(User.id == txn.user_id)
+            ids = await queued_ids(db, wash, callback_data.top, callback_data.key)
+            decision = await approve_payments(db, ids, wash, user.id, callback_data.key)
+            await notify_clients(db, decision.processed, APPROVED)
+            page = await get_pending_page(db, wash, REVIEW_PAGE_SIZE)
+        await answer_decision(callback, decision, page, "✅ Подтверждено")
+        return
+    
+    if act in (NEXT, PREV, REFRESH):
+        async with get_db_context() as db:
+            page = await get_pending_page(
+                db, wash, REVIEW_PAGE_SIZE,
+                top=callback_data.top if act != PREV else None,
+                above=callback_data.top if act == PREV else None
             )
-            client = result.scalar_one()
-        
-        text = (
-            f"💰 <b>Платеж #{txn.id}</b>\n\n"
-            f"Клиент: {client.full_name}\n"
-            f"Сумма: {txn.amount}₽\n"
-            f"Тип: {txn.type}\n"
-            f"Дата: {txn.created_at.strftime('%d.%m.%Y %H:%M')}"
+            if not page.rows and page.total:
+                # Страница опустела - возвращаемся к началу очереди
+                page = await get_pending_page(db, wash, REVIEW_PAGE_SIZE)
+        await edit_review(callback, page, 0, new_decision_key())
+        await callback.answer()
+        return
+    
+    deciding = act in (APPROVE_SELECTED, REJECT_SELECTED)
+    async with get_db_context() as db:
+        # Для решения - страница как при показе (с уже решенными этим ключом)
+        page = await get_pending_page(
+            db, wash, REVIEW_PAGE_SIZE, top=callback_data.top,
+            key=callback_data.key if deciding else None
         )
+        if page_checksum(row.id for row in page.rows) != callback_data.crc:
+            await edit_review(callback, page, 0, new_decision_key())
+            await callback.answer("Список изменился, выбор сброшен", show_alert=True)
+            return
         
-        await message.answer(
-            text,
-            reply_markup=get_payment_keyboard(txn.id)
-        )
+        if not deciding:
+            mask = callback_data.mask
+            if act == TOGGLE:
+                mask ^= 1 << callback_data.pos
+            else:
+                everything = (1 << len(page.rows)) - 1
+                mask = 0 if mask == everything else everything
+            await edit_review(callback, page, mask, callback_data.key)
+            await callback.answer()
+            return
+        
+        ids = [txn.id for i, txn in enumerate(page.rows) if callback_data.mask >> i & 1]
+        if act == APPROVE_SELECTED:
+            decision = await approve_payments(db, ids, wash, user.id, callback_data.key)
+            status, verb = APPROVED, "✅ Подтверждено"
+        else:
+            decision = await reject_payments(db, ids, wash, user.id, callback_data.key)
+            status, verb = REJECTED, "❌ Отклонено"
+        await notify_clients(db, decision.processed, status)
+        page = await get_pending_page(db, wash, REVIEW_PAGE_SIZE, top=callback_data.top)
+        if not page.rows and page.total:
+            page = await get_pending_page(db, wash, REVIEW_PAGE_SIZE)
+    
+    await answer_decision(callback, decision, page, verb)
+
+async def answer_decision(callback: CallbackQuery, decision: Decision, page: PendingPage, verb: str):
+    """Сводка после решения; повтор того же нажатия сообщение не трогает"""
+    notice = decision_notice(decision, verb)
+    if decision.processed or decision.skipped:
+        await edit_review(callback, page, 0, new_decision_key(), notice)
+    await callback.answer(notice.strip())
+
+# Кнопки отдельных карточек платежей, отправленных до появления сводки
+def parse_decision(data: str) -> Tuple[int, Optional[str]]:
+    """approve_pay:{id}:{key} -> (id, key); у старых кнопок ключа нет"""
+    parts = data.split(":")
+    return int(parts[1]), parts[2] if len(parts) > 2 else None
 
 @router.callback_query(F.data.startswith("approve_pay:"))
 async def approve_payment(callback: CallbackQuery, user: dict):
     """Подтверждение платежа"""
-    txn_id = int(callback.data.split(":")[1])
+    txn_id, key = parse_decision(callback.data)
     
     async with get_db_context() as db:
-        result = await db.execute(
-            select(Transaction).where(Transaction.id == txn_id)
-        )
-        txn = result.scalar_one()
-        
-        if txn.status != "pending":
-            await callback.answer("Платеж уже обработан", show_alert=True)
-            return
-        
-        txn.status = "approved"
-        txn.admin_id = user.id
-        txn.approved_at = datetime.now()
-        
-        # Начисляем абонемент или пополняем баланс
-        if txn.type == "subscription_purchase":
-            # Создаем абонемент (упрощенно)
-            subscription = Subscription(
-                user_id=txn.user_id,
-                car_wash_id=txn.car_wash_id,
-                name="Абонемент",
-                total_washes=5,
-                remaining_washes=5,
-                purchase_price=txn.amount,
-                valid_until=datetime.now().date() + timedelta(days=30),
-                is_active=True
-            )
-            db.add(subscription)
-        else:
-            # Пополнение баланса
-            result = await db.execute(
-                select(User).where(User.id == txn.user_id)
-            )
-            client = result.scalar_one()
-            client.balance += txn.amount
-        
-        await db.commit()
+        decision = await approve_payments(db, [txn_id], user.car_wash_id, user.id, key)
+        await notify_clients(db, decision.processed, APPROVED)
     
-    await callback.message.edit_text(
-        f"{callback.message.text}\n\n✅ Платеж подтвержден!"
-    )
+    if decision.skipped:
+        await callback.answer("Платеж уже обработан", show_alert=True)
+        return
+    
+    # Повтор той же кнопки: платеж уже подтвержден этим нажатием
+    if decision.processed:
+        await callback.message.edit_text(
+            f"{callback.message.text}\n\n✅ Платеж подтвержден!"
+        )
     await callback.answer("Платеж подтвержден")
 
 @router.callback_query(F.data.startswith("reject_pay:"))
 async def reject_payment(callback: CallbackQuery, user: dict):
     """Отклонение платежа"""
-    txn_id = int(callback.data.split(":")[1])
+    txn_id, key = parse_decision(callback.data)
     
     async with get_db_context() as db:
-        result = await db.execute(
-            select(Transaction).where(Transaction.id == txn_id)
-        )
-        txn = result.scalar_one()
-        
-        txn.status = "rejected"
-        txn.admin_id = user.id
-        await db.commit()
+        decision = await reject_payments(db, [txn_id], user.car_wash_id, user.id, key)
+        await notify_clients(db, decision.processed, REJECTED)
     
-    await callback.message.edit_text(
-        f"{callback.message.text}\n\n❌ Платеж отклонен!"
-    )
+    if decision.skipped:
+        await callback.answer("Платеж уже обработан", show_alert=True)
+        return
+    
+    if decision.processed:
+        await callback.message.edit_text(
+            f"{callback.message.text}\n\n❌ Платеж отклонен!"
+        )
     await callback.answer("Платеж отклонен")
@@ -1,57 +1,45 @@
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from datetime import datetime, date, timedelta
+from decimal import Decimal
+from html import escape
 from sqlalchemy import select, func
 
 from core.database import get_db_context
 from core.models import Appointment, User, Service
+from core.availability import to_local_naive
+from core.outbox import Outbox
+from core.queries import get_day_schedule
+from core.redemption import redeem_wash
+from core.reminders import cancel_reminders
+from core.stats import record_completion
+from core.slot_cache import invalidate_day
 from bot_employee.keyboards import get_appointment_complete_keyboard
 
 router = Router()
 
 @router.message(F.text == "🚗 Мои записи")
-async def my_appointments(message: Message, user: dict):
+async def my_appointments(message: Message, user: dict, outbox: Outbox):
     """Показать записи мойщика"""
     
-    today_start = datetime.combine(date.today(), datetime.min.time())
-    today_end = datetime.combine(date.today(), datetime.max.time())
-    
     async with get_db_context() as db:
-        result = await db.execute(
-            select(Appointment)
-            .where(
-                Appointment.car_wash_id == user.car_wash_id,
-                Appointment.appointment_time >= today_start,
-                Appointment.appointment_time <= today_end,
-                Appointment.status == "confirmed"
-            )
-            .order_by(Appointment.appointment_time)
+        appointments = await get_day_schedule(
+            db, user.car_wash_id, date.today(), statuses=("confirmed",)
         )
-        appointments = result.scalars().all()
     
     if not appointments:
         await message.answer("🚗 На сегодня записей нет.")
         return
     
     for apt in appointments:
-        async with get_db_context() as db:
-            result = await db.execute(
-                select(User).where(User.id == apt.user_id)
-            )
-            client = result.scalar_one()
-            
-            result = await db.execute(
-                select(Service).where(Service.id == apt.service_id)
-            )
-            service = result.scalar_one()
-        
         time_str = apt.appointment_time.strftime("%H:%M")
         text = (
-            f"🕐 {time_str} - {client.full_name}\n"
-            f"{service.name} - {service.duration} мин"
+            f"🕐 {time_str} - {escape(apt.client_name or '')}\n"
+            f"{escape(apt.service_name)} - {apt.duration} мин"
         )
         
-        await message.answer(
+        await outbox.send(
+            message.chat.id,
             text,
             reply_markup=get_appointment_complete_keyboard(apt.id)
         )
@@ -62,8 +50,9 @@ async def mark_completed(callback: CallbackQuery, user: dict):
     apt_id = int(callback.data.split(":")[1])
     
     async with get_db_context() as db:
+        # Блокируем строку, чтобы двойное нажатие не учло запись дважды
         result = await db.execute(
-            select(Appointment).where(Appointment.id == apt_id)
+            select(Appointment).where(Appointment.id == apt_id).with_for_update()
         )
         apt = result.scalar_one()
         
@@ -73,11 +62,34 @@ async def mark_completed(callback: CallbackQuery, user: dict):
         
         apt.status = "completed"
         apt.completed_at = datetime.now()
+        
+        # Мойка по абонементу, если у клиента есть действующий и запись не оплачена иначе
+        redeemed = None
+        if apt.payment_method in (None, "subscription"):
+            redeemed = await redeem_wash(db, apt.user_id, apt.car_wash_id, apt.completed_at.date())
+            if redeemed is not None:
+                apt.payment_method = "subscription"
+        
+        # Выручка и визиты в дневной сводке для дашборда; мойка по абонементу
+        # оплачена при покупке и выручку не добавляет
+        amount = Decimal(0)
+        if redeemed is None:
+            result = await db.execute(
+                select(Service.price).where(Service.id == apt.service_id)
+            )
+            amount = result.scalar_one()
+        await record_completion(db, apt.car_wash_id, apt.completed_at.date(), amount)
         await db.commit()
     
-    await callback.message.edit_text(
-        f"{callback.message.text}\n\n✅ <b>ВЫПОЛНЕНО</b>"
-    )
+    # Досрочное выполнение освобождает остаток слота
+    await invalidate_day(apt.car_wash_id, to_local_naive(apt.appointment_time).date())
+    await cancel_reminders(apt.id)
+    
+    # html_text - текст с уже экранированными именами, а не "сырой" text
+    text = f"{callback.message.html_text}\n\n✅ <b>ВЫПОЛНЕНО</b>"
+    if redeemed is not None:
+        text += f"\n🎫 Списано с абонемента «{escape(redeemed.name)}», осталось моек: {redeemed.remaining_washes}"
+    await callback.message.edit_text(text)
     await callback.answer("Отмечено как выполненное")
 
 @router.message(F.text == "📊 Моя статистика")
@@ -1,6 +1,14 @@
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import ReplyKeyboardBuilder, InlineKeyboardBuilder
 
+from core.markup import static
+from core.payments import PendingPage
+from bot_employee.callbacks import (
+    Review, page_checksum, TOGGLE, SELECT_PAGE, APPROVE_SELECTED, REJECT_SELECTED,
+    APPROVE_ALL, NEXT, PREV, REFRESH
+)
+
+@static
 def get_admin_keyboard() -> ReplyKeyboardMarkup:
     """Клавиатура администратора"""
     builder = ReplyKeyboardBuilder()
@@ -14,6 +22,7 @@ def get_admin_keyboard() -> ReplyKeyboardMarkup:
     )
     return builder.as_markup(resize_keyboard=True)
 
+@static
 def get_washer_keyboard() -> ReplyKeyboardMarkup:
     """Клавиатура мойщика"""
     builder = ReplyKeyboardBuilder()
@@ -26,19 +35,54 @@ def get_washer_keyboard() -> ReplyKeyboardMarkup:
     )
     return builder.as_markup(resize_keyboard=True)
 
-def get_payment_keyboard(transaction_id: int) -> InlineKeyboardMarkup:
-    """Кнопки для подтверждения платежа"""
+def get_review_keyboard(page: PendingPage, mask: int, key: str) -> InlineKeyboardMarkup:
+    """Сводка платежей: отметки по номерам строк, решение по выбранным, листание"""
     builder = InlineKeyboardBuilder()
-    builder.row(
-        InlineKeyboardButton(
-            text="✅ Подтвердить",
-            callback_data=f"approve_pay:{transaction_id}"
-        ),
+    current = Review(
+        act=REFRESH, top=page.rows[0].id, mask=mask,
+        crc=page_checksum(row.id for row in page.rows), key=key
+    )
+    
+    builder.row(*[
         InlineKeyboardButton(
-            text="❌ Отклонить",
-            callback_data=f"reject_pay:{transaction_id}"
+            text=f"{'☑' if mask >> i & 1 else '☐'} {i + 1}",
+            callback_data=current.to(TOGGLE, pos=i).pack()
         )
-    )
+        for i in range(len(page.rows))
+    ], width=5)
+    
+    selected = bin(mask).count("1")
+    everything = (1 << len(page.rows)) - 1
+    builder.row(InlineKeyboardButton(
+        text="Снять выбор" if mask == everything else "Выбрать все на странице",
+        callback_data=current.to(SELECT_PAGE).pack()
+    ))
+    if selected:
+        builder.row(
+            InlineKeyboardButton(
+                text=f"✅ Подтвердить ({selected})",
+                callback_data=current.to(APPROVE_SELECTED).pack()
+            ),
+            InlineKeyboardButton(
+                text=f"❌ Отклонить ({selected})",
+                callback_data=current.to(REJECT_SELECTED).pack()
+            )
+        )
+    
+    nav = []
+    if page.has_prev:
+        nav.append(InlineKeyboardButton(text="◀️", callback_data=current.to(PREV, mask=0).pack()))
+    nav.append(InlineKeyboardButton(text="🔄", callback_data=current.to(REFRESH, mask=0).pack()))
+    if page.has_next:
+        nav.append(InlineKeyboardButton(
+            text="▶️", callback_data=current.to(NEXT, top=page.rows[-1].id - 1, mask=0).pack()
+        ))
+    builder.row(*nav)
+    
+    builder.row(InlineKeyboardButton(
+        text=f"✅ Подтвердить все ({page.total} на {page.total_amount}₽)",
+        callback_data=current.to(APPROVE_ALL, top=page.newest, mask=0).pack()
+    ))
     return builder.as_markup()
 
 def get_appointment_complete_keyboard(appointment_id: int) -> InlineKeyboardMarkup:
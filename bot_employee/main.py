@@ -5,30 +5,47 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.redis import RedisStorage
-from aiogram.client.default import DefaultBotProperties
+from aiogram.fsm.storage.base import BaseStorage
 from aiogram.enums import ParseMode
 
 from core.config import settings
 from core.logger import setup_logger
-from core.database import init_db
+from core.runtime import bootstrap, create_storage, shutdown
+from core.identity import listen_invalidations
+from core.webhook import BotApp, run_webhook
+from core.metrics import setup_metrics
+from core.outbox import setup_outbox
 from bot_employee.handlers import auth, admin, washer
 from bot_employee.middleware import RoleMiddleware
 
 logger = setup_logger("bot_employee")
 
-async def main():
-    logger.info("Starting Employee Bot")
+WEBHOOK_PATH = "/employee"
+
+_background_tasks = set()
+
+def create_bot() -> Bot:
+    """Создание бота"""
+    return Bot(token=settings.BOT_EMPLOYEE_TOKEN, parse_mode=ParseMode.HTML)
+
+async def on_startup():
+    # Сброс кэша сотрудников по сигналам других процессов
+    _background_tasks.add(asyncio.create_task(listen_invalidations()))
+
+async def on_shutdown():
+    for task in _background_tasks:
+        task.cancel()
+    _background_tasks.clear()
+
+def create_dispatcher(storage: BaseStorage) -> Dispatcher:
+    """Диспетчер с роутерами бота сотрудников"""
+    dp = Dispatcher(storage=storage)
     
-    await init_db()
+    # Задержки обработчиков и запросы к БД на апдейт (/metrics)
+    setup_metrics(dp)
     
-    bot = Bot(
-        token=settings.BOT_EMPLOYEE_TOKEN,
-        default=DefaultBotProperties(parse_mode=ParseMode.HTML)
-    )
-    
-    storage = RedisStorage.from_url(settings.REDIS_URL)
-    dp = Dispatcher(storage=storage)
+    # Очередь исходящих сообщений с учетом лимитов Telegram (аргумент outbox)
+    setup_outbox(dp)
     
     # Middleware для проверки ролей
     dp.message.middleware(RoleMiddleware())
@@ -39,13 +56,28 @@ async def main():
     dp.include_router(admin.router)
     dp.include_router(washer.router)
     
+    dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
+    return dp
+
+async def main():
+    logger.info("Starting Employee Bot")
+    
+    await bootstrap("employee")
+    
+    bot = create_bot()
+    
+    storage = create_storage()
+    dp = create_dispatcher(storage)
+    
     try:
         if settings.USE_WEBHOOK:
-            await bot.set_webhook(f"{settings.WEBHOOK_URL}/employee")
+            await run_webhook([BotApp(WEBHOOK_PATH, bot, dp)])
         else:
             await dp.start_polling(bot)
     finally:
         await bot.session.close()
+        await shutdown()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from aiogram.filters.callback_data import CallbackData
+
+from core.queries import Cursor
+
+# Направление листания (поле to)
+FIRST = "f"
+NEXT = "n"
+PREV = "p"
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class ClientsPage(CallbackData, prefix="cl"):
+    """Страница списка клиентов: курсор (created_at в мкс, id) и режим поиска.
+
+    Сама строка поиска в кнопку не помещается - она в данных FSM.
+    """
+    to: str
+    ts: int = 0
+    id: int = 0
+    search: bool = False
+
+    @classmethod
+    def at(cls, to: str, cursor: Cursor, search: bool) -> "ClientsPage":
+        created_at, client_id = cursor
+        return cls(to=to, ts=(created_at - _EPOCH) // timedelta(microseconds=1), id=client_id, search=search)
+
+    @property
+    def cursor(self) -> Optional[Cursor]:
+        if self.to == FIRST:
+            return None
+        return _EPOCH + timedelta(microseconds=self.ts), self.id
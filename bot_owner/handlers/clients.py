@@ -1,48 +1,161 @@
+from html import escape
+from typing import Optional
+
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
-from sqlalchemy import select, or_
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
 
+from core.availability import to_local_naive
 from core.database import get_db_context
-from core.models import User, Appointment, Service, Subscription
-from bot_owner.keyboards import get_client_actions_keyboard
+from core.models import User, Subscription
+from core.queries import ClientPage, get_clients_page, get_user_history
+from bot_owner.callbacks import ClientsPage, NEXT, PREV
+from bot_owner.keyboards import MENU_TEXTS, get_client_actions_keyboard, get_clients_keyboard
 
 router = Router()
 
+PAGE_SIZE = 10
+# Короче 3 символов триграммный индекс не помогает
+SEARCH_MIN_LENGTH = 3
+SEARCH_KEY = "client_search"
+
+class ClientStates(StatesGroup):
+    search = State()
+
+def format_clients_page(page: ClientPage, search: Optional[str]) -> str:
+    """Текст страницы клиентов"""
+    if search:
+        text = f"🔍 <b>Клиенты по запросу «{escape(search)}»:</b>\n\n"
+    else:
+        text = "👥 <b>Клиенты:</b>\n\n"
+    
+    if not page.rows:
+        return text + "Никого не найдено."
+    
+    for client in page.rows:
+        text += f"• {escape(client.full_name or '')}"
+        if client.username:
+            text += f" (@{escape(client.username)})"
+        if client.phone:
+            text += f", {escape(client.phone)}"
+        text += f"\n  Баланс: {client.balance}₽\n\n"
+    return text
+
 @router.message(F.text == "👥 Клиенты")
-async def list_clients(message: Message):
-    """Список клиентов"""
-    telegram_id = message.from_user.id
+async def list_clients(message: Message, state: FSMContext, raw_state: Optional[str]):
+    """Список клиентов, новые первыми"""
+    if raw_state is not None:
+        # Кнопка меню прерывает ввод (поиск, правка абонемента)
+        await state.set_state(None)
     
     async with get_db_context() as db:
-        result = await db.execute(
-            select(User).where(User.telegram_id == telegram_id)
+        page = await get_clients_page(db, message.from_user.id, PAGE_SIZE)
+    
+    if not page.rows:
+        await message.answer("Клиентов пока нет.")
+        return
+    
+    await message.answer(
+        format_clients_page(page, None),
+        reply_markup=get_clients_keyboard(page, search=False)
+    )
+
+@router.callback_query(ClientsPage.filter())
+async def turn_clients_page(callback: CallbackQuery, callback_data: ClientsPage, state: FSMContext):
+    """Листание списка (курсор в кнопке, без OFFSET)"""
+    search = None
+    if callback_data.search:
+        search = (await state.get_data()).get(SEARCH_KEY)
+        if not search:
+            await callback.answer("Поиск устарел, повторите его", show_alert=True)
+            return
+    
+    cursor = callback_data.cursor
+    async with get_db_context() as db:
+        page = await get_clients_page(
+            db, callback.from_user.id, PAGE_SIZE,
+            after=cursor if callback_data.to == NEXT else None,
+            before=cursor if callback_data.to == PREV else None,
+            search=search
         )
-        owner = result.scalar_one()
-        
+    
+    if not page.rows and cursor is not None:
+        await callback.answer("Дальше никого нет")
+        return
+    
+    await callback.message.edit_text(
+        format_clients_page(page, search),
+        reply_markup=get_clients_keyboard(page, search=search is not None)
+    )
+    await callback.answer()
+
+@router.callback_query(F.data == "clients_search")
+async def start_search(callback: CallbackQuery, state: FSMContext):
+    """Запрос строки поиска"""
+    await state.set_state(ClientStates.search)
+    await callback.message.answer("🔍 Введите часть имени, @username или телефона:")
+    await callback.answer()
+
+@router.message(ClientStates.search, ~F.text.in_(MENU_TEXTS))
+async def search_clients(message: Message, state: FSMContext):
+    """Первая страница результатов поиска"""
+    search = (message.text or "").strip().lstrip("@")
+    if len(search) < SEARCH_MIN_LENGTH:
+        await message.answer(f"Введите не меньше {SEARCH_MIN_LENGTH} символов:")
+        return
+    
+    await state.set_state(None)
+    await state.update_data({SEARCH_KEY: search})
+    
+    async with get_db_context() as db:
+        page = await get_clients_page(db, message.from_user.id, PAGE_SIZE, search=search)
+    
+    await message.answer(
+        format_clients_page(page, search),
+        reply_markup=get_clients_keyboard(page, search=True)
+    )
+
+@router.callback_query(F.data.startswith("client:"))
+async def client_card(callback: CallbackQuery):
+    """Карточка клиента своей мойки"""
+    client_id = int(callback.data.split(":")[1])
+    owner = aliased(User)
+    owner_wash = (
+        select(owner.car_wash_id)
+        .where(owner.telegram_id == callback.from_user.id)
+        .scalar_subquery()
+    )
+    
+    async with get_db_context() as db:
         result = await db.execute(
-            select(User)
+            select(User.full_name, User.username, User.phone, User.balance, User.created_at)
             .where(
-                User.car_wash_id == owner.car_wash_id,
+                User.id == client_id,
+                User.car_wash_id == owner_wash,
                 User.role == "client"
             )
-            .order_by(User.created_at.desc())
-            .limit(10)
         )
-        clients = result.scalars().all()
+        client = result.one_or_none()
     
-    if not clients:
-        await message.answer("Клиентов пока нет.")
+    if client is None:
+        await callback.answer("Клиент не найден", show_alert=True)
         return
     
-    text = "👥 <b>Последние клиенты:</b>\n\n"
-    
-    for client in clients:
-        text += f"• {client.full_name}"
-        if client.username:
-            text += f" (@{client.username})"
-        text += f"\n  Баланс: {client.balance}₽\n\n"
+    text = f"👤 <b>{escape(client.full_name or '')}</b>\n"
+    if client.username:
+        text += f"@{escape(client.username)}\n"
+    if client.phone:
+        text += f"📞 {escape(client.phone)}\n"
+    text += (
+        f"\n💰 Баланс: {client.balance}₽\n"
+        f"📅 С нами с {to_local_naive(client.created_at).strftime('%d.%m.%Y')}"
+    )
     
-    await message.answer(text)
+    await callback.message.answer(text, reply_markup=get_client_actions_keyboard(client_id))
+    await callback.answer()
 
 @router.callback_query(F.data.startswith("client_balance:"))
 async def client_balance(callback: CallbackQuery):
@@ -72,7 +185,7 @@ async def client_balance(callback: CallbackQuery):
     
     if subs:
         for sub in subs:
-            text += f"• {sub.name}: осталось {sub.remaining_washes}/{sub.total_washes}\n"
+            text += f"• {escape(sub.name)}: осталось {sub.remaining_washes}/{sub.total_washes}\n"
     else:
         text += "Нет активных абонементов"
     
@@ -90,26 +203,14 @@ async def client_history(callback: CallbackQuery):
         )
         client = result.scalar_one()
         
-        result = await db.execute(
-            select(Appointment)
-            .where(Appointment.user_id == client_id)
-            .order_by(Appointment.appointment_time.desc())
-            .limit(5)
-        )
-        appointments = result.scalars().all()
+        appointments = await get_user_history(db, 5, user_id=client_id)
     
     text = f"📋 <b>История {client.full_name}</b>\n\n"
     
     if appointments:
         for apt in appointments:
-            async with get_db_context() as db:
-                result = await db.execute(
-                    select(Service).where(Service.id == apt.service_id)
-                )
-                service = result.scalar_one()
-            
             date_str = apt.appointment_time.strftime("%d.%m.%Y %H:%M")
-            text += f"• {date_str} - {service.name} ({apt.status})\n"
+            text += f"• {date_str} - {apt.service_name} ({apt.status})\n"
     else:
         text += "Нет записей"
     
@@ -1,12 +1,19 @@
+from decimal import Decimal, InvalidOperation
+from html import escape
+from typing import Optional
+
 from aiogram import Router, F
+from aiogram.filters import StateFilter
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from sqlalchemy import select
 
+from core.catalog import Plan, add_plan, get_plan, get_plans, update_plan
 from core.database import get_db_context
+from core.identity import get_identity
 from core.models import Service, CarWash, User
-from bot_owner.keyboards import get_settings_keyboard
+from bot_owner.keyboards import get_settings_keyboard, get_plans_keyboard, get_plan_keyboard
 
 router = Router()
 
@@ -16,9 +23,28 @@ class ServiceStates(StatesGroup):
     price = State()
     duration = State()
 
+class PlanStates(StatesGroup):
+    name = State()
+    washes = State()
+    price = State()
+    days = State()
+    edit = State()
+
+# Шаги добавления абонемента и вопросы к ним (они же - для правки поля)
+PLAN_STEPS = ["name", "washes", "price", "days"]
+PLAN_PROMPTS = {
+    "name": "Введите название абонемента:",
+    "washes": "Сколько моек входит в абонемент?",
+    "price": "Введите стоимость (в рублях):",
+    "days": "Введите срок действия (в днях):",
+}
+
 @router.message(F.text == "⚙️ Настройки")
-async def settings_menu(message: Message):
+async def settings_menu(message: Message, state: FSMContext, raw_state: Optional[str]):
     """Меню настроек"""
+    if raw_state is not None:
+        # Кнопка меню прерывает ввод (поиск, правка абонемента)
+        await state.set_state(None)
     await message.answer(
         "⚙️ <b>Настройки</b>\n\n"
         "Выберите раздел:",
@@ -90,7 +116,7 @@ async def add_service_price(message: Message, state: FSMContext):
     await message.answer("Введите длительность (в минутах):")
 
 @router.message(ServiceStates.duration)
-async def add_service_duration(message: Message, state: FSMContext, user: dict):
+async def add_service_duration(message: Message, state: FSMContext):
     """Ввод длительности и сохранение"""
     try:
         duration = int(message.text)
@@ -119,3 +145,164 @@ async def add_service_duration(message: Message, state: FSMContext, user: dict):
     
     await message.answer(f"✅ Услуга '{data['name']}' добавлена!")
     await state.clear()
+
+async def owner_wash_id(telegram_id: int) -> Optional[int]:
+    """Мойка владельца (из кэша identity)"""
+    identity = await get_identity(telegram_id)
+    return identity.car_wash_id if identity else None
+
+def parse_plan_value(field: str, text: str):
+    """Проверить ввод поля абонемента; ValueError - с текстом для владельца"""
+    text = (text or "").strip()
+    if field == "name":
+        if not text or len(text) > 255:
+            raise ValueError("❌ Название - от 1 до 255 символов")
+        return text
+    if field == "price":
+        try:
+            price = Decimal(text.replace(",", ".")).quantize(Decimal("0.01"))
+        except InvalidOperation:
+            raise ValueError("❌ Введите число")
+        if price <= 0:
+            raise ValueError("❌ Цена должна быть больше нуля")
+        return price
+    
+    limit = 1000 if field == "washes" else 3650
+    try:
+        value = int(text)
+    except ValueError:
+        raise ValueError("❌ Введите целое число")
+    if not 1 <= value <= limit:
+        raise ValueError(f"❌ Введите число от 1 до {limit}")
+    return value
+
+def format_plan(plan: Plan) -> str:
+    status = "в продаже" if plan.is_active else "снят с продажи"
+    return (
+        f"🎫 <b>{escape(plan.name)}</b>\n\n"
+        f"Цена: {plan.price}₽\n"
+        f"Моек: {plan.washes}\n"
+        f"Срок: {plan.days} дней\n"
+        f"Статус: {status}"
+    )
+
+@router.callback_query(F.data == "settings_subs")
+async def list_plans(callback: CallbackQuery):
+    """Каталог абонементов мойки"""
+    car_wash_id = await owner_wash_id(callback.from_user.id)
+    plans = await get_plans(car_wash_id, include_inactive=True) if car_wash_id else []
+    
+    text = "🎫 <b>Абонементы:</b>\n\n"
+    if plans:
+        for plan in plans:
+            status = "✅" if plan.is_active else "❌"
+            text += f"{status} <b>{escape(plan.name)}</b>\n"
+            text += f"   {plan.price}₽ | {plan.washes} моек | {plan.days} дн.\n"
+    else:
+        text += "Пока нет ни одного абонемента.\n"
+    text += "\nИзменения сразу видны клиентам."
+    
+    await callback.message.edit_text(text, reply_markup=get_plans_keyboard(plans))
+    await callback.answer()
+
+@router.callback_query(F.data.startswith("plan:"))
+async def show_plan(callback: CallbackQuery):
+    """Карточка абонемента"""
+    plan_id = int(callback.data.split(":")[1])
+    car_wash_id = await owner_wash_id(callback.from_user.id)
+    plan = await get_plan(car_wash_id, plan_id) if car_wash_id else None
+    
+    if plan is None:
+        await callback.answer("Абонемент не найден", show_alert=True)
+        return
+    
+    await callback.message.edit_text(format_plan(plan), reply_markup=get_plan_keyboard(plan))
+    await callback.answer()
+
+@router.callback_query(F.data.startswith("plan_toggle:"))
+async def toggle_plan(callback: CallbackQuery):
+    """Снять с продажи или вернуть (купленные абонементы не затрагиваются)"""
+    plan_id = int(callback.data.split(":")[1])
+    car_wash_id = await owner_wash_id(callback.from_user.id)
+    plan = await get_plan(car_wash_id, plan_id) if car_wash_id else None
+    
+    if plan is None:
+        await callback.answer("Абонемент не найден", show_alert=True)
+        return
+    
+    async with get_db_context() as db:
+        await update_plan(db, car_wash_id, plan_id, is_active=not plan.is_active)
+    
+    plan = await get_plan(car_wash_id, plan_id)
+    await callback.message.edit_text(format_plan(plan), reply_markup=get_plan_keyboard(plan))
+    await callback.answer()
+
+@router.callback_query(F.data.startswith("plan_edit:"))
+async def edit_plan_start(callback: CallbackQuery, state: FSMContext):
+    """Правка одного поля абонемента"""
+    _, plan_id, field = callback.data.split(":")
+    await state.set_state(PlanStates.edit)
+    await state.update_data(plan_id=int(plan_id), field=field)
+    await callback.message.answer(PLAN_PROMPTS[field])
+    await callback.answer()
+
+@router.message(PlanStates.edit)
+async def edit_plan_value(message: Message, state: FSMContext):
+    """Сохранение поля; новая версия каталога сразу видна клиентам"""
+    data = await state.get_data()
+    try:
+        value = parse_plan_value(data["field"], message.text)
+    except ValueError as e:
+        await message.answer(str(e))
+        return
+    
+    car_wash_id = await owner_wash_id(message.from_user.id)
+    async with get_db_context() as db:
+        found = await update_plan(db, car_wash_id, data["plan_id"], **{data["field"]: value})
+    await state.clear()
+    
+    if not found:
+        await message.answer("❌ Абонемент не найден")
+        return
+    
+    plan = await get_plan(car_wash_id, data["plan_id"])
+    await message.answer(format_plan(plan), reply_markup=get_plan_keyboard(plan))
+
+@router.callback_query(F.data == "plan_add")
+async def add_plan_start(callback: CallbackQuery, state: FSMContext):
+    """Добавление абонемента"""
+    await state.set_state(PlanStates.name)
+    await callback.message.answer(PLAN_PROMPTS["name"])
+    await callback.answer()
+
+@router.message(StateFilter(PlanStates.name, PlanStates.washes, PlanStates.price, PlanStates.days))
+async def add_plan_step(message: Message, state: FSMContext):
+    """Шаги добавления; после срока действия абонемент сохраняется"""
+    field = (await state.get_state()).split(":")[1]
+    try:
+        value = parse_plan_value(field, message.text)
+    except ValueError as e:
+        await message.answer(str(e))
+        return
+    
+    if field != PLAN_STEPS[-1]:
+        # Decimal в FSM не сериализуется - храним строкой
+        await state.update_data({field: str(value)})
+        next_field = PLAN_STEPS[PLAN_STEPS.index(field) + 1]
+        await state.set_state(getattr(PlanStates, next_field))
+        await message.answer(PLAN_PROMPTS[next_field])
+        return
+    
+    data = await state.get_data()
+    car_wash_id = await owner_wash_id(message.from_user.id)
+    async with get_db_context() as db:
+        plan_id = await add_plan(
+            db, car_wash_id, data["name"], int(data["washes"]), Decimal(data["price"]), value
+        )
+    await state.clear()
+    
+    plan = await get_plan(car_wash_id, plan_id)
+    await message.answer(
+        f"✅ Абонемент добавлен и уже виден клиентам\n\n{format_plan(plan)}",
+        reply_markup=get_plan_keyboard(plan)
+    )
@@ -1,6 +1,13 @@
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import ReplyKeyboardBuilder, InlineKeyboardBuilder
+from typing import List
 
+from core.catalog import Plan
+from core.markup import static
+from core.queries import ClientPage
+from bot_owner.callbacks import ClientsPage, FIRST, NEXT, PREV
+
+@static
 def get_main_keyboard() -> ReplyKeyboardMarkup:
     """Главное меню владельца"""
     builder = ReplyKeyboardBuilder()
@@ -14,6 +21,44 @@ def get_main_keyboard() -> ReplyKeyboardMarkup:
     )
     return builder.as_markup(resize_keyboard=True)
 
+# Кнопки главного меню: ввод в сценариях их не перехватывает
+MENU_TEXTS = frozenset(button.text for row in get_main_keyboard().keyboard for button in row)
+
+def get_clients_keyboard(page: ClientPage, search: bool) -> InlineKeyboardMarkup:
+    """Клиенты страницы, листание и поиск"""
+    builder = InlineKeyboardBuilder()
+    for client in page.rows:
+        builder.row(
+            InlineKeyboardButton(
+                text=f"👤 {client.full_name or client.username or client.id}",
+                callback_data=f"client:{client.id}"
+            )
+        )
+    
+    nav = []
+    if page.has_prev:
+        first = page.rows[0]
+        nav.append(InlineKeyboardButton(
+            text="◀️",
+            callback_data=ClientsPage.at(PREV, (first.created_at, first.id), search).pack()
+        ))
+    if page.has_next and page.rows:
+        last = page.rows[-1]
+        nav.append(InlineKeyboardButton(
+            text="▶️",
+            callback_data=ClientsPage.at(NEXT, (last.created_at, last.id), search).pack()
+        ))
+    if nav:
+        builder.row(*nav)
+    
+    if search:
+        builder.row(InlineKeyboardButton(
+            text="✖️ Сбросить поиск", callback_data=ClientsPage(to=FIRST).pack()
+        ))
+    else:
+        builder.row(InlineKeyboardButton(text="🔍 Поиск", callback_data="clients_search"))
+    return builder.as_markup()
+
 def get_client_actions_keyboard(client_id: int) -> InlineKeyboardMarkup:
     """Действия с клиентом"""
     builder = InlineKeyboardBuilder()
@@ -29,6 +74,7 @@ def get_client_actions_keyboard(client_id: int) -> InlineKeyboardMarkup:
     )
     return builder.as_markup()
 
+@static
 def get_settings_keyboard() -> InlineKeyboardMarkup:
     """Настройки"""
     builder = InlineKeyboardBuilder()
@@ -41,3 +87,34 @@ def get_settings_keyboard() -> InlineKeyboardMarkup:
         InlineKeyboardButton(text="👥 Сотрудники", callback_data="settings_staff")
     )
     return builder.as_markup()
+
+def get_plans_keyboard(plans: List[Plan]) -> InlineKeyboardMarkup:
+    """Абонементы мойки для правки"""
+    builder = InlineKeyboardBuilder()
+    for plan in plans:
+        status = "✅" if plan.is_active else "❌"
+        builder.row(
+            InlineKeyboardButton(text=f"{status} {plan.name}", callback_data=f"plan:{plan.id}")
+        )
+    builder.row(InlineKeyboardButton(text="➕ Добавить абонемент", callback_data="plan_add"))
+    return builder.as_markup()
+
+def get_plan_keyboard(plan: Plan) -> InlineKeyboardMarkup:
+    """Правка абонемента"""
+    builder = InlineKeyboardBuilder()
+    builder.row(
+        InlineKeyboardButton(text="✏️ Название", callback_data=f"plan_edit:{plan.id}:name"),
+        InlineKeyboardButton(text="💰 Цена", callback_data=f"plan_edit:{plan.id}:price")
+    )
+    builder.row(
+        InlineKeyboardButton(text="🚗 Мойки", callback_data=f"plan_edit:{plan.id}:washes"),
+        InlineKeyboardButton(text="📅 Срок", callback_data=f"plan_edit:{plan.id}:days")
+    )
+    builder.row(
+        InlineKeyboardButton(
+            text="❌ Снять с продажи" if plan.is_active else "✅ Вернуть в продажу",
+            callback_data=f"plan_toggle:{plan.id}"
+        )
+    )
+    builder.row(InlineKeyboardButton(text="◀️ К абонементам", callback_data="settings_subs"))
+    return builder.as_markup()
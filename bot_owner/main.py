@@ -5,42 +5,60 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.redis import RedisStorage
-from aiogram.client.default import DefaultBotProperties
+from aiogram.fsm.storage.base import BaseStorage
 from aiogram.enums import ParseMode
 
 from core.config import settings
 from core.logger import setup_logger
-from core.database import init_db
+from core.runtime import bootstrap, create_storage, shutdown
+from core.webhook import BotApp, run_webhook
+from core.metrics import setup_metrics
+from core.outbox import setup_outbox
 from bot_owner.handlers import dashboard, clients, settings as owner_settings
 
 logger = setup_logger("bot_owner")
 
-async def main():
-    logger.info("Starting Owner Bot")
-    
-    await init_db()
+WEBHOOK_PATH = "/owner"
+
+def create_bot() -> Bot:
+    """Создание бота"""
+    return Bot(token=settings.BOT_OWNER_TOKEN, parse_mode=ParseMode.HTML)
+
+def create_dispatcher(storage: BaseStorage) -> Dispatcher:
+    """Диспетчер с роутерами бота владельца"""
+    dp = Dispatcher(storage=storage)
     
-    bot = Bot(
-        token=settings.BOT_OWNER_TOKEN,
-        default=DefaultBotProperties(parse_mode=ParseMode.HTML)
-    )
+    # Задержки обработчиков и запросы к БД на апдейт (/metrics)
+    setup_metrics(dp)
     
-    storage = RedisStorage.from_url(settings.REDIS_URL)
-    dp = Dispatcher(storage=storage)
+    # Очередь исходящих сообщений с учетом лимитов Telegram (аргумент outbox)
+    setup_outbox(dp)
     
     # Регистрация роутеров
     dp.include_router(dashboard.router)
     dp.include_router(clients.router)
     dp.include_router(owner_settings.router)
     
+    return dp
+
+async def main():
+    logger.info("Starting Owner Bot")
+    
+    await bootstrap("owner")
+    
+    bot = create_bot()
+    
+    storage = create_storage()
+    dp = create_dispatcher(storage)
+    
     try:
         if settings.USE_WEBHOOK:
-            await bot.set_webhook(f"{settings.WEBHOOK_URL}/owner")
+            await run_webhook([BotApp(WEBHOOK_PATH, bot, dp)])
         else:
             await dp.start_polling(bot)
     finally:
         await bot.session.close()
+        await shutdown()
 
 if __name__ == "__main__":
     asyncio.run(main())
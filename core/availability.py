@@ -0,0 +1,173 @@
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.models import Appointment, Service
+from core.tenants import get_tenant
+
+# Статусы, которые занимают время мойки
+ACTIVE_STATUSES = ("confirmed", "pending")
+
+# График по умолчанию, если у мойки он не заполнен
+DEFAULT_HOURS = (time(9, 0), time(21, 0))
+
+WEEKDAY_KEYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+Interval = Tuple[datetime, datetime]
+
+
+def to_local_naive(dt: datetime) -> datetime:
+    """Приводит время из БД (timestamptz) к наивному локальному"""
+    if dt.tzinfo is None:
+        return dt
+    return dt.astimezone().replace(tzinfo=None)
+
+
+def parse_working_hours(working_hours: Optional[Dict], day: date) -> Optional[Tuple[time, time]]:
+    """Часы работы на день в формате {"mon": "09:00-21:00"}; None - выходной"""
+    if not working_hours:
+        return DEFAULT_HOURS
+
+    value = working_hours.get(WEEKDAY_KEYS[day.weekday()])
+    if not value or "-" not in str(value):
+        return None
+
+    try:
+        opens_str, closes_str = str(value).split("-", 1)
+        opens = datetime.strptime(opens_str.strip(), "%H:%M").time()
+        closes = datetime.strptime(closes_str.strip(), "%H:%M").time()
+    except ValueError:
+        return None
+
+    if closes <= opens:
+        return None
+    return opens, closes
+
+
+class DaySchedule:
+    """Занятость мойки на один день.
+
+    Занятые интервалы хранятся слитыми и отсортированными по началу,
+    поэтому проверка свободного окна - это один bisect, O(log n).
+    """
+
+    def __init__(self, opens: datetime, closes: datetime, busy: Iterable[Interval] = ()):
+        self.opens = opens
+        self.closes = closes
+        self._starts: List[datetime] = []
+        self._ends: List[datetime] = []
+        for start, end in sorted(busy):
+            self.add(start, end)
+
+    def add(self, start: datetime, end: datetime) -> None:
+        """Добавить занятый интервал [start, end)"""
+        if end <= start:
+            return
+
+        # Все интервалы, пересекающиеся или соприкасающиеся с новым, сливаем в один
+        lo = bisect_right(self._ends, start)
+        if lo > 0 and self._ends[lo - 1] >= start:
+            lo -= 1
+        hi = bisect_right(self._starts, end)
+
+        if lo < hi:
+            start = min(start, self._starts[lo])
+            end = max(end, self._ends[hi - 1])
+
+        self._starts[lo:hi] = [start]
+        self._ends[lo:hi] = [end]
+
+    def is_free(self, start: datetime, end: datetime) -> bool:
+        """Свободно ли окно [start, end)"""
+        if start < self.opens or end > self.closes:
+            return False
+
+        # Последний интервал, начавшийся раньше end
+        i = bisect_left(self._starts, end) - 1
+        return i < 0 or self._ends[i] <= start
+
+    def free_starts(
+        self,
+        duration: int,
+        step: int,
+        not_before: Optional[datetime] = None
+    ) -> List[datetime]:
+        """Время начала свободных окон длиной duration минут с шагом step минут"""
+        length = timedelta(minutes=duration)
+        tick = timedelta(minutes=max(step, 1))
+
+        slots = []
+        current = self.opens
+        while current + length <= self.closes:
+            if (not_before is None or current > not_before) and self.is_free(current, current + length):
+                slots.append(current)
+            current += tick
+        return slots
+
+
+async def load_day_schedule(
+    db: AsyncSession,
+    car_wash_id: int,
+    day: date,
+    working_hours: Optional[Dict]
+) -> Optional[DaySchedule]:
+    """Загрузить занятые интервалы мойки на день (None - мойка не работает)"""
+    hours = parse_working_hours(working_hours, day)
+    if hours is None:
+        return None
+
+    opens = datetime.combine(day, hours[0])
+    closes = datetime.combine(day, hours[1])
+
+    # Только два столбца, без ORM-объектов; берём и записи,
+    # начавшиеся раньше открытия, но заканчивающиеся позже него
+    result = await db.execute(
+        select(Appointment.appointment_time, Appointment.end_time)
+        .where(
+            Appointment.car_wash_id == car_wash_id,
+            Appointment.appointment_time < closes,
+            Appointment.end_time > opens,
+            Appointment.status.in_(ACTIVE_STATUSES)
+        )
+    )
+    busy = [(to_local_naive(start), to_local_naive(end)) for start, end in result.all()]
+
+    return DaySchedule(opens, closes, busy)
+
+
+async def get_free_slots(
+    db: AsyncSession,
+    car_wash_id: int,
+    service_id: int,
+    day: date
+) -> List[str]:
+    """Свободное время начала услуги на весь день в формате HH:MM"""
+    # График и шаг сетки - из справочника моек, без запроса к carwashes
+    tenant = await get_tenant(car_wash_id)
+    if tenant is None:
+        return []
+
+    result = await db.execute(
+        select(Service.duration).where(Service.id == service_id, Service.car_wash_id == car_wash_id)
+    )
+    duration = result.scalar_one_or_none()
+    if duration is None:
+        return []
+
+    schedule = await load_day_schedule(db, car_wash_id, day, tenant.working_hours)
+    if schedule is None:
+        return []
+
+    return [s.strftime("%H:%M") for s in schedule.free_starts(duration, tenant.slot_duration)]
+
+
+def drop_past_slots(slots: List[str], day: date, now: Optional[datetime] = None) -> List[str]:
+    """Убрать уже прошедшее время, если день - сегодня"""
+    now = now or datetime.now()
+    if day != now.date():
+        return slots
+    current = now.strftime("%H:%M")
+    return [s for s in slots if s > current]
@@ -0,0 +1,146 @@
+"""Каталог абонементов мойки с версионным read-through кэшем.
+
+У каждой мойки счетчик версии ``washbot:catalog:{car_wash_id}:version``:
+любое изменение каталога увеличивает его. Снимок каталога лежит в Redis под
+ключом с номером версии, процесс держит последний прочитанный снимок у себя.
+В штатном режиме чтение - один GET версии без запроса к БД; после правки
+владельца все процессы видят новую версию со следующего обращения.
+"""
+import json
+from decimal import Decimal
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.database import get_db_context
+from core.logger import logger
+from core.models import SubscriptionPlan
+from core.redis_client import get_redis
+
+KEY_PREFIX = "washbot:catalog"
+
+# Старые версии снимка больше не читаются и уходят по TTL
+SNAPSHOT_TTL = 24 * 60 * 60
+
+# Счетчики текущего процесса
+stats: Dict[str, int] = {"local_hits": 0, "redis_hits": 0, "misses": 0}
+
+
+class Plan(NamedTuple):
+    """Абонемент каталога"""
+    id: int
+    name: str
+    washes: int
+    price: Decimal
+    days: int
+    is_active: bool
+
+
+# car_wash_id -> (версия, абонементы по id в порядке показа)
+_local: Dict[int, Tuple[int, Dict[int, Plan]]] = {}
+
+
+def _version_key(car_wash_id: int) -> str:
+    return f"{KEY_PREFIX}:{car_wash_id}:version"
+
+
+def _snapshot_key(car_wash_id: int, version: int) -> str:
+    return f"{KEY_PREFIX}:{car_wash_id}:v{version}"
+
+
+async def _load(car_wash_id: int) -> List[Plan]:
+    async with get_db_context() as db:
+        result = await db.execute(
+            select(
+                SubscriptionPlan.id, SubscriptionPlan.name, SubscriptionPlan.washes,
+                SubscriptionPlan.price, SubscriptionPlan.days, SubscriptionPlan.is_active
+            )
+            .where(SubscriptionPlan.car_wash_id == car_wash_id)
+            .order_by(SubscriptionPlan.price, SubscriptionPlan.id)
+        )
+        return [Plan(*row) for row in result.all()]
+
+
+def _encode(plans: List[Plan]) -> str:
+    return json.dumps([[p.id, p.name, p.washes, str(p.price), p.days, p.is_active] for p in plans])
+
+
+def _decode(raw) -> List[Plan]:
+    return [
+        Plan(plan_id, name, washes, Decimal(price), days, is_active)
+        for plan_id, name, washes, price, days, is_active in json.loads(raw)
+    ]
+
+
+async def _catalog(car_wash_id: int) -> Dict[int, Plan]:
+    redis = get_redis()
+    version = int(await redis.get(_version_key(car_wash_id)) or 0)
+
+    cached = _local.get(car_wash_id)
+    if cached is not None and cached[0] == version:
+        stats["local_hits"] += 1
+        return cached[1]
+
+    raw = await redis.get(_snapshot_key(car_wash_id, version))
+    if raw is not None:
+        stats["redis_hits"] += 1
+        plans = _decode(raw)
+    else:
+        stats["misses"] += 1
+        plans = await _load(car_wash_id)
+        await redis.set(_snapshot_key(car_wash_id, version), _encode(plans), ex=SNAPSHOT_TTL)
+
+    catalog = {plan.id: plan for plan in plans}
+    _local[car_wash_id] = (version, catalog)
+    return catalog
+
+
+async def get_plans(car_wash_id: int, include_inactive: bool = False) -> List[Plan]:
+    """Абонементы мойки (для клиентов - только активные)"""
+    catalog = await _catalog(car_wash_id)
+    return [plan for plan in catalog.values() if include_inactive or plan.is_active]
+
+
+async def get_plan(car_wash_id: int, plan_id: Optional[int]) -> Optional[Plan]:
+    """Абонемент по id, в том числе выключенный (для уже купленных)"""
+    if plan_id is None:
+        return None
+    return (await _catalog(car_wash_id)).get(plan_id)
+
+
+async def bump_version(car_wash_id: int):
+    """Новая версия каталога мойки - после любой правки абонементов"""
+    try:
+        await get_redis().incr(_version_key(car_wash_id))
+    except Exception as e:
+        # Без новой версии процессы не увидят правку до сброса Redis
+        logger.error(f"Catalog version bump failed for wash {car_wash_id}: {e}")
+
+
+async def add_plan(db: AsyncSession, car_wash_id: int, name: str, washes: int, price: Decimal, days: int) -> int:
+    """Добавить абонемент в каталог (коммит - здесь)"""
+    plan = SubscriptionPlan(
+        car_wash_id=car_wash_id, name=name, washes=washes, price=price, days=days, is_active=True
+    )
+    db.add(plan)
+    await db.flush()
+    plan_id = plan.id
+    await db.commit()
+    await bump_version(car_wash_id)
+    return plan_id
+
+
+async def update_plan(db: AsyncSession, car_wash_id: int, plan_id: int, **values) -> bool:
+    """Изменить абонемент своей мойки (коммит - здесь); False - не найден"""
+    result = await db.execute(
+        update(SubscriptionPlan)
+        .where(SubscriptionPlan.id == plan_id, SubscriptionPlan.car_wash_id == car_wash_id)
+        .values(**values)
+        .returning(SubscriptionPlan.id)
+    )
+    if result.scalar_one_or_none() is None:
+        return False
+    await db.commit()
+    await bump_version(car_wash_id)
+    return True
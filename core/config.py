@@ -1,6 +1,6 @@
 from pydantic_settings import BaseSettings
 from pydantic import Field
-from typing import Optional
+from typing import Dict, Optional
 
 class Settings(BaseSettings):
     # Database
@@ -10,19 +10,48 @@ class Settings(BaseSettings):
     POSTGRES_USER: str = "postgres"
     POSTGRES_PASSWORD: str = "postgres"
     
+    # Пулы соединений: на каждый процесс свой размер (см. core.runtime)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 5
+    DB_POOL_SIZE_CLIENT: int = 10
+    DB_POOL_SIZE_EMPLOYEE: int = 4
+    DB_POOL_SIZE_OWNER: int = 2
+    DB_POOL_SIZE_WEBHOOK: int = 15
+    
     # Redis
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
     
+    # FSM: TTL ключей по состоянию или группе состояний, секунды (см. core.fsm_storage)
+    FSM_DEFAULT_TTL: int = 24 * 60 * 60
+    FSM_STATE_TTLS: Dict[str, int] = {
+        "SubscriptionStates:choosing": 30 * 60,
+        "SubscriptionStates:waiting_payment": 24 * 60 * 60,
+        "ServiceStates": 60 * 60,
+        "ClientStates": 10 * 60,
+        "PlanStates": 60 * 60,
+    }
+    
     # Telegram Bots
     BOT_CLIENT_TOKEN: str = Field(..., env="BOT_CLIENT_TOKEN")
     BOT_EMPLOYEE_TOKEN: str = Field(..., env="BOT_EMPLOYEE_TOKEN")
     BOT_OWNER_TOKEN: str = Field(..., env="BOT_OWNER_TOKEN")
+    # Ключ подписи callback_data; по умолчанию выводится из токена клиентского бота
+    CALLBACK_SECRET: Optional[str] = None
     
     # Webhook (опционально)
     USE_WEBHOOK: bool = False
     WEBHOOK_URL: Optional[str] = None
+    WEBHOOK_HOST: str = "0.0.0.0"
     WEBHOOK_PORT: int = 8443
+    # Передается в setWebhook и сверяется с X-Telegram-Bot-Api-Secret-Token
+    WEBHOOK_SECRET: Optional[str] = None
+    
+    # Метрики (/metrics) и порог запросов на апдейт для предупреждения о N+1
+    METRICS_ENABLED: bool = True
+    METRICS_HOST: str = "0.0.0.0"
+    METRICS_PORT: int = 9100
+    METRICS_QUERY_THRESHOLD: int = 10
     
     @property
     def DATABASE_URL(self) -> str:
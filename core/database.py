@@ -1,8 +1,8 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 from sqlalchemy import MetaData
 from contextlib import asynccontextmanager
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Optional
 
 from core.config import settings
 from core.logger import logger
@@ -19,24 +19,55 @@ convention = {
 metadata = MetaData(naming_convention=convention)
 Base = declarative_base(metadata=metadata)
 
-# Создание движка
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=False,
-    pool_size=20,
-    max_overflow=10
-)
+# Движок создается при первом обращении, с размером пула процесса
+_engine: Optional[AsyncEngine] = None
+_session_factory: Optional[async_sessionmaker] = None
+_pool_size = settings.DB_POOL_SIZE
+_max_overflow = settings.DB_MAX_OVERFLOW
 
-# Фабрика сессий
-AsyncSessionLocal = async_sessionmaker(
-    engine,
-    class_=AsyncSession,
-    expire_on_commit=False
-)
+def configure_engine(pool_size: int, max_overflow: int):
+    """Задать размер пула до первого обращения к БД"""
+    global _pool_size, _max_overflow
+    if _engine is not None:
+        logger.warning("Database engine already created, pool settings ignored")
+        return
+    _pool_size = pool_size
+    _max_overflow = max_overflow
+
+def get_engine() -> AsyncEngine:
+    """Общий движок процесса"""
+    global _engine
+    if _engine is None:
+        _engine = create_async_engine(
+            settings.DATABASE_URL,
+            echo=False,
+            pool_size=_pool_size,
+            max_overflow=_max_overflow
+        )
+    return _engine
+
+def get_session_factory() -> async_sessionmaker:
+    """Фабрика сессий"""
+    global _session_factory
+    if _session_factory is None:
+        _session_factory = async_sessionmaker(
+            get_engine(),
+            class_=AsyncSession,
+            expire_on_commit=False
+        )
+    return _session_factory
+
+async def dispose_engine():
+    """Закрыть пул соединений"""
+    global _engine, _session_factory
+    if _engine is not None:
+        await _engine.dispose()
+        _engine = None
+        _session_factory = None
 
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """Зависимость для получения сессии БД"""
-    async with AsyncSessionLocal() as session:
+    async with get_session_factory()() as session:
         try:
             yield session
             await session.commit()
@@ -50,16 +81,10 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
 @asynccontextmanager
 async def get_db_context():
     """Контекстный менеджер для БД"""
-    async with AsyncSessionLocal() as session:
+    async with get_session_factory()() as session:
         try:
             yield session
             await session.commit()
         except Exception:
             await session.rollback()
             raise
-
-async def init_db():
-    """Инициализация БД (создание таблиц)"""
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-    logger.info("Database initialized")
@@ -0,0 +1,303 @@
+"""FSM-хранилище ботов с TTL по состояниям и компактными ключами.
+
+Состояние и данные пользователя лежат в одном hash ``f:{bot_id}:{user_id}``
+(поля ``s`` и ``d``), у ключа всегда есть TTL: при смене состояния - TTL
+этого состояния (FSM_STATE_TTLS), данные без состояния - FSM_DEFAULT_TTL.
+
+Перенос ключей старого формата (``fsm:...:state`` / ``fsm:...:data``):
+
+    python -m core.fsm_storage --migrate
+"""
+import argparse
+import asyncio
+import json
+from typing import Any, Collection, Dict, NamedTuple, Optional, Tuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import DEFAULT_DESTINY, StateType, StorageKey
+from aiogram.fsm.storage.redis import KeyBuilder, RedisStorage
+from redis.asyncio import Redis
+
+from core.config import settings
+from core.logger import logger
+from core.redis_client import close_redis, get_redis
+
+KEY_PREFIX = "f"
+STATE_FIELD = "s"
+DATA_FIELD = "d"
+
+LEGACY_PREFIX = "fsm"
+
+SWEEP_LOCK = "washbot:fsm:sweeper"
+SWEEP_INTERVAL = 10 * 60
+SCAN_BATCH = 1000
+# MEMORY USAGE по каждому N-му ключу, остальное экстраполируется
+MEMORY_SAMPLE_EVERY = 50
+
+# Итоги последнего прохода (для /metrics)
+sweep_stats: Dict[str, int] = {"keys": 0, "without_ttl": 0, "memory_bytes": 0, "legacy_keys": 0}
+
+
+class CompactKeyBuilder(KeyBuilder):
+    """f:{bot_id}:{user_id}; chat_id - только если чат не личный"""
+
+    def build(self, key: StorageKey, part: str = "") -> str:
+        parts = [KEY_PREFIX, str(key.bot_id)]
+        if key.chat_id != key.user_id:
+            parts.append(str(key.chat_id))
+        if key.thread_id:
+            parts.append(str(key.thread_id))
+        parts.append(str(key.user_id))
+        if key.destiny != DEFAULT_DESTINY:
+            parts.append(key.destiny)
+        if part == "lock":
+            parts.append("l")
+        return ":".join(parts)
+
+
+class TTLRedisStorage(RedisStorage):
+    """RedisStorage, у ключей которого всегда есть TTL"""
+
+    def __init__(self, redis: Redis, state_ttls: Dict[str, int], default_ttl: int):
+        super().__init__(redis=redis, key_builder=CompactKeyBuilder())
+        self.state_ttls = state_ttls
+        self.default_ttl = default_ttl
+
+    def ttl_for(self, state: Optional[str]) -> int:
+        """TTL состояния, затем его группы (SubscriptionStates), затем общий"""
+        if state is None:
+            return self.default_ttl
+        if state in self.state_ttls:
+            return self.state_ttls[state]
+        return self.state_ttls.get(state.split(":", 1)[0], self.default_ttl)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        redis_key = self.key_builder.build(key)
+        if state is None:
+            await self.redis.hdel(redis_key, STATE_FIELD)
+            return
+        value = state.state if isinstance(state, State) else state
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(redis_key, STATE_FIELD, value)
+            pipe.expire(redis_key, self.ttl_for(value))
+            await pipe.execute()
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        value = await self.redis.hget(self.key_builder.build(key), STATE_FIELD)
+        if isinstance(value, bytes):
+            return value.decode("utf-8")
+        return value
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        redis_key = self.key_builder.build(key)
+        if not data:
+            await self.redis.hdel(redis_key, DATA_FIELD)
+            return
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(redis_key, DATA_FIELD, self.json_dumps(data))
+            # TTL уже выставлен состоянием; данные без состояния - общий TTL
+            pipe.expire(redis_key, self.default_ttl, nx=True)
+            await pipe.execute()
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        value = await self.redis.hget(self.key_builder.build(key), DATA_FIELD)
+        if value is None:
+            return {}
+        if isinstance(value, bytes):
+            value = value.decode("utf-8")
+        return self.json_loads(value)
+
+
+def create_fsm_storage() -> TTLRedisStorage:
+    return TTLRedisStorage(get_redis(), settings.FSM_STATE_TTLS, settings.FSM_DEFAULT_TTL)
+
+
+async def sweep(redis: Redis) -> Dict[str, int]:
+    """Проход по ключам FSM: количество, память, TTL для ключей без него"""
+    stats = {"keys": 0, "without_ttl": 0, "memory_bytes": 0, "legacy_keys": 0}
+    sampled = sampled_bytes = 0
+
+    batch = []
+    async for key in redis.scan_iter(match=f"{KEY_PREFIX}:*", count=SCAN_BATCH):
+        batch.append(key)
+        if len(batch) >= SCAN_BATCH:
+            sampled, sampled_bytes = await _sweep_batch(redis, batch, stats, sampled, sampled_bytes)
+            batch = []
+    if batch:
+        sampled, sampled_bytes = await _sweep_batch(redis, batch, stats, sampled, sampled_bytes)
+
+    if sampled:
+        stats["memory_bytes"] = sampled_bytes * stats["keys"] // sampled
+
+    async for _ in redis.scan_iter(match=f"{LEGACY_PREFIX}:*", count=SCAN_BATCH):
+        stats["legacy_keys"] += 1
+    return stats
+
+
+async def _sweep_batch(redis: Redis, keys, stats: Dict[str, int], sampled: int, sampled_bytes: int):
+    async with redis.pipeline(transaction=False) as pipe:
+        for key in keys:
+            pipe.ttl(key)
+        ttls = await pipe.execute()
+
+        samples = keys[::MEMORY_SAMPLE_EVERY]
+        for key in samples:
+            pipe.memory_usage(key)
+        for key, ttl in zip(keys, ttls):
+            # Ключ без TTL (запись в обход хранилища) - выставляем общий
+            if ttl == -1:
+                pipe.expire(key, settings.FSM_DEFAULT_TTL)
+        results = await pipe.execute()
+
+    stats["keys"] += len(keys)
+    stats["without_ttl"] += sum(1 for ttl in ttls if ttl == -1)
+    sizes = [size for size in results[:len(samples)] if size]
+    return sampled + len(sizes), sampled_bytes + sum(sizes)
+
+
+async def run_sweeper():
+    """Фоновая задача: один проход за интервал на все процессы (блокировка в Redis)"""
+    redis = get_redis()
+    while True:
+        try:
+            if await redis.set(SWEEP_LOCK, "1", nx=True, ex=SWEEP_INTERVAL):
+                sweep_stats.update(await sweep(redis))
+                logger.info(
+                    f"FSM keys: {sweep_stats['keys']}, ~{sweep_stats['memory_bytes'] / 1024:.0f} KiB, "
+                    f"fixed TTL on {sweep_stats['without_ttl']}, legacy {sweep_stats['legacy_keys']}"
+                )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"FSM sweep failed: {e}")
+        await asyncio.sleep(SWEEP_INTERVAL)
+
+
+def _legacy_bot_ids() -> Dict[str, str]:
+    """Группа состояний -> id бота для ключей без bot_id в имени"""
+    client = settings.BOT_CLIENT_TOKEN.split(":", 1)[0]
+    owner = settings.BOT_OWNER_TOKEN.split(":", 1)[0]
+    return {"BookingStates": client, "SubscriptionStates": client, "ServiceStates": owner}
+
+
+def _known_bot_ids() -> Tuple[str, ...]:
+    return tuple(
+        token.split(":", 1)[0]
+        for token in (settings.BOT_CLIENT_TOKEN, settings.BOT_EMPLOYEE_TOKEN, settings.BOT_OWNER_TOKEN)
+    )
+
+
+class LegacyKey(NamedTuple):
+    """Поля ключа DefaultKeyBuilder"""
+    bot_id: Optional[str]
+    chat_id: str
+    thread_id: Optional[str]
+    user_id: str
+    destiny: str
+    part: str
+
+
+def _is_int(value: str) -> bool:
+    return value.lstrip("-").isdigit()
+
+
+def _parse_legacy(key: str, bot_ids: Collection[str]) -> Optional[LegacyKey]:
+    """fsm:[bot_id:]chat_id:[thread_id:]user_id:[destiny:]part; None - не разобрать.
+
+    Числовых полей от двух до четырех; при трех неясно, что лишнее - bot_id
+    или thread_id: решаем по известным id ботов, по личному чату
+    (chat_id == user_id) и по знаку chat_id групп.
+    """
+    prefix, *fields = key.split(":")
+    if prefix != LEGACY_PREFIX or len(fields) < 3:
+        return None
+    *fields, part = fields
+
+    destiny = DEFAULT_DESTINY
+    if not _is_int(fields[-1]):
+        destiny = fields.pop()
+    if not all(_is_int(field) for field in fields):
+        return None
+
+    if len(fields) == 2:
+        return LegacyKey(None, fields[0], None, fields[1], destiny, part)
+    if len(fields) == 4:
+        return LegacyKey(fields[0], fields[1], fields[2], fields[3], destiny, part)
+    if len(fields) == 3:
+        first, second, user_id = fields
+        if first in bot_ids or second == user_id:
+            return LegacyKey(first, second, None, user_id, destiny, part)
+        # id бота положительный, а у групп chat_id отрицательный
+        if first == user_id or first.startswith("-"):
+            return LegacyKey(None, first, second, user_id, destiny, part)
+    return None
+
+
+def _compact_data(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Подписка хранила весь шаблон - оставляем только его id"""
+    template = data.pop("template", None)
+    if isinstance(template, dict) and "id" in template:
+        data["template_id"] = template["id"]
+    return data
+
+
+async def migrate_legacy_keys(redis: Redis, dry_run: bool = False) -> Dict[str, int]:
+    """Перенести ключи DefaultKeyBuilder в компактный формат с TTL"""
+    storage = TTLRedisStorage(redis, settings.FSM_STATE_TTLS, settings.FSM_DEFAULT_TTL)
+    legacy_bots = _legacy_bot_ids()
+
+    bot_ids = _known_bot_ids()
+    result = {"migrated": 0, "dropped": 0, "skipped": 0}
+
+    sessions: Dict[Tuple, Dict[str, Optional[str]]] = {}
+    async for raw in redis.scan_iter(match=f"{LEGACY_PREFIX}:*", count=SCAN_BATCH):
+        key = raw.decode() if isinstance(raw, bytes) else raw
+        parsed = _parse_legacy(key, bot_ids)
+        if parsed is None:
+            # Не трогаем: лучше оставить ключ, чем перенести не тому пользователю
+            logger.warning(f"FSM migration: skipped unrecognized key {key}")
+            result["skipped"] += 1
+            continue
+        if parsed.part not in ("state", "data"):
+            continue
+        session = (parsed.bot_id, parsed.chat_id, parsed.thread_id, parsed.user_id, parsed.destiny)
+        sessions.setdefault(session, {})[parsed.part] = key
+
+    for (bot_id, chat_id, thread_id, user_id, destiny), keys in sessions.items():
+        state = await redis.get(keys["state"]) if "state" in keys else None
+        data = await redis.get(keys["data"]) if "data" in keys else None
+        state = state.decode() if isinstance(state, bytes) else state
+        group = state.split(":", 1)[0] if state else None
+
+        bot_id = bot_id or legacy_bots.get(group)
+        # Записи больше нет в FSM (контекст в кнопках); без бота - не восстановить
+        keep = state is not None and group != "BookingStates" and bot_id is not None
+
+        if not dry_run:
+            if keep:
+                storage_key = StorageKey(
+                    bot_id=int(bot_id), chat_id=int(chat_id), user_id=int(user_id),
+                    thread_id=int(thread_id) if thread_id else None, destiny=destiny
+                )
+                await storage.set_state(storage_key, state)
+                if data:
+                    await storage.set_data(storage_key, _compact_data(json.loads(data)))
+            await redis.delete(*keys.values())
+        result["migrated" if keep else "dropped"] += 1
+
+    return result
+
+
+async def _main(dry_run: bool):
+    redis = get_redis()
+    if dry_run:
+        print(await sweep(redis))
+    print(await migrate_legacy_keys(redis, dry_run=dry_run))
+    await close_redis()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Перенос ключей FSM в компактный формат")
+    parser.add_argument("--migrate", action="store_true", help="перенести и удалить старые ключи")
+    args = parser.parse_args()
+    asyncio.run(_main(dry_run=not args.migrate))
@@ -0,0 +1,142 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Tuple
+
+from sqlalchemy import select
+
+from core.database import get_db_context
+from core.logger import logger
+from core.models import User
+from core.redis_client import get_redis
+
+KEY_PREFIX = "washbot:identity"
+INVALIDATE_CHANNEL = "washbot:identity:invalidate"
+
+# Локальный кэш живет недолго: он страхует от пропущенной инвалидации
+LOCAL_TTL = 60
+LOCAL_MAX_SIZE = 4096
+REDIS_TTL = 30 * 60
+
+# Неизвестных пользователей тоже кэшируем, но ненадолго
+MISSING_TTL = 60
+
+# Записать загруженное из БД, только если поколение пользователя не менялось
+# с начала загрузки (инвалидация во время чтения не теряется)
+_FILL_SCRIPT = """
+if (redis.call('GET', KEYS[2]) or '') ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+
+
+class Identity(NamedTuple):
+    """Проекция пользователя для проверки доступа"""
+    id: int
+    telegram_id: int
+    role: str
+    car_wash_id: Optional[int]
+    full_name: Optional[str]
+    is_blocked: bool
+
+
+_local: "OrderedDict[int, Tuple[float, Optional[Identity]]]" = OrderedDict()
+
+
+def _key(telegram_id: int) -> str:
+    return f"{KEY_PREFIX}:{telegram_id}"
+
+
+def _generation_key(telegram_id: int) -> str:
+    return f"{KEY_PREFIX}:{telegram_id}:generation"
+
+
+def _remember(telegram_id: int, identity: Optional[Identity]):
+    _local[telegram_id] = (time.monotonic() + LOCAL_TTL, identity)
+    _local.move_to_end(telegram_id)
+    while len(_local) > LOCAL_MAX_SIZE:
+        _local.popitem(last=False)
+
+
+async def _load(telegram_id: int) -> Optional[Identity]:
+    async with get_db_context() as db:
+        result = await db.execute(
+            select(
+                User.id, User.telegram_id, User.role,
+                User.car_wash_id, User.full_name, User.is_blocked
+            ).where(User.telegram_id == telegram_id)
+        )
+        row = result.one_or_none()
+    if row is None:
+        return None
+    return Identity(row.id, row.telegram_id, row.role, row.car_wash_id, row.full_name, bool(row.is_blocked))
+
+
+async def get_identity(telegram_id: int) -> Optional[Identity]:
+    """Пользователь по telegram_id: локальный LRU -> Redis -> БД"""
+    cached = _local.get(telegram_id)
+    if cached is not None and cached[0] > time.monotonic():
+        _local.move_to_end(telegram_id)
+        return cached[1]
+
+    redis = get_redis()
+    pipe = redis.pipeline(transaction=False)
+    pipe.get(_key(telegram_id))
+    pipe.get(_generation_key(telegram_id))
+    raw, generation = await pipe.execute()
+    if raw is not None:
+        data = json.loads(raw)
+        identity = Identity(**data) if data else None
+        _remember(telegram_id, identity)
+        return identity
+
+    identity = await _load(telegram_id)
+    if isinstance(generation, bytes):
+        generation = generation.decode()
+    filled = await redis.eval(
+        _FILL_SCRIPT, 2, _key(telegram_id), _generation_key(telegram_id),
+        generation or "",
+        json.dumps(identity._asdict() if identity else None),
+        REDIS_TTL if identity else MISSING_TTL
+    )
+    if filled:
+        # Иначе пользователя изменили во время загрузки: следующий запрос перечитает
+        _remember(telegram_id, identity)
+    return identity
+
+
+async def invalidate_identity(telegram_id: int):
+    """Сбросить кэш пользователя во всех процессах.
+
+    Вызывать после каждой записи role, car_wash_id, is_blocked или full_name.
+    """
+    _local.pop(telegram_id, None)
+    redis = get_redis()
+    pipe = redis.pipeline(transaction=True)
+    pipe.delete(_key(telegram_id))
+    # Новое поколение: загрузка, начатая до изменения, не запишет старое
+    pipe.incr(_generation_key(telegram_id))
+    pipe.expire(_generation_key(telegram_id), REDIS_TTL)
+    await pipe.execute()
+    await redis.publish(INVALIDATE_CHANNEL, str(telegram_id))
+
+
+async def listen_invalidations():
+    """Фоновая задача: сбрасывает локальный кэш по сообщениям других процессов"""
+    pubsub = get_redis().pubsub()
+    await pubsub.subscribe(INVALIDATE_CHANNEL)
+    try:
+        async for message in pubsub.listen():
+            if message["type"] != "message":
+                continue
+            _local.pop(int(message["data"]), None)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        # Без слушателя устаревание ограничено LOCAL_TTL
+        logger.error(f"Identity invalidation listener stopped: {e}")
+    finally:
+        await pubsub.aclose()
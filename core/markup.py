@@ -0,0 +1,58 @@
+"""Реестр готовых клавиатур.
+
+Статичные клавиатуры (главные меню, настройки) строятся один раз на процесс.
+Клавиатуры с параметрами запоминаются по своим входным данным в LRU: ключ -
+все, от чего зависят кнопки (содержимое списка услуг, день, набор слотов),
+поэтому изменившиеся данные дают новый ключ, а старая запись вытесняется.
+
+Разметка из реестра общая для всех вызовов - менять ее на месте нельзя.
+"""
+from collections import OrderedDict
+from functools import wraps
+from typing import Callable, Dict, Hashable, Tuple, TypeVar
+
+DEFAULT_MAX_SIZE = 512
+
+# Счетчики текущего процесса (для /metrics)
+stats: Dict[str, int] = {"hits": 0, "misses": 0}
+
+M = TypeVar("M")
+
+# Имя функции -> ее кэш (для сброса и осмотра)
+_registry: "Dict[str, OrderedDict[Tuple[Hashable, ...], object]]" = {}
+
+
+def memoized(max_size: int = DEFAULT_MAX_SIZE) -> Callable[[Callable[..., M]], Callable[..., M]]:
+    """Запоминать клавиатуру по позиционным аргументам (они должны быть hashable)"""
+
+    def decorator(build: Callable[..., M]) -> Callable[..., M]:
+        cache: "OrderedDict[Tuple[Hashable, ...], M]" = OrderedDict()
+        _registry[f"{build.__module__}.{build.__qualname__}"] = cache
+
+        @wraps(build)
+        def wrapper(*args: Hashable) -> M:
+            markup = cache.get(args)
+            if markup is not None:
+                stats["hits"] += 1
+                cache.move_to_end(args)
+                return markup
+            stats["misses"] += 1
+            markup = cache[args] = build(*args)
+            while len(cache) > max_size:
+                cache.popitem(last=False)
+            return markup
+
+        return wrapper
+
+    return decorator
+
+
+def static(build: Callable[[], M]) -> Callable[[], M]:
+    """Клавиатура без параметров - одна на процесс"""
+    return memoized(max_size=1)(build)
+
+
+def clear():
+    """Сбросить все запомненные клавиатуры"""
+    for cache in _registry.values():
+        cache.clear()
@@ -0,0 +1,199 @@
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.types import TelegramObject
+from aiohttp import web
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from core import catalog, fsm_storage, markup, outbox, slot_cache
+from core.config import settings
+from core.logger import logger
+
+# Границы бакетов гистограммы задержек, секунды
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    """Гистограмма в формате Prometheus (бакеты накапливаются при выгрузке)"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: str) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+
+class UpdateStats:
+    """Счетчики одного апдейта"""
+    __slots__ = ("handler", "queries", "db_time")
+
+    def __init__(self):
+        self.handler = "unhandled"
+        self.queries = 0
+        self.db_time = 0.0
+
+
+_current: ContextVar[Optional[UpdateStats]] = ContextVar("washbot_update_stats", default=None)
+
+handler_latency: Dict[str, Histogram] = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+handler_queries: Dict[str, Histogram] = defaultdict(lambda: Histogram(QUERY_BUCKETS))
+handler_db_seconds: Dict[str, float] = defaultdict(float)
+n_plus_one: Dict[str, int] = defaultdict(int)
+
+
+def _record(stats: UpdateStats, elapsed: float):
+    handler_latency[stats.handler].observe(elapsed)
+    handler_queries[stats.handler].observe(stats.queries)
+    handler_db_seconds[stats.handler] += stats.db_time
+
+    if stats.queries > settings.METRICS_QUERY_THRESHOLD:
+        n_plus_one[stats.handler] += 1
+        logger.warning(
+            f"Possible N+1 in {stats.handler}: {stats.queries} queries, "
+            f"{stats.db_time * 1000:.1f} ms in DB"
+        )
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """Внешний middleware апдейта: задержка и запросы к БД на апдейт"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        stats = UpdateStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            _current.reset(token)
+            _record(stats, time.perf_counter() - started)
+
+
+class HandlerNameMiddleware(BaseMiddleware):
+    """Внутренний middleware: запоминает, какой обработчик сработал"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        stats = _current.get()
+        handler_object = data.get("handler")
+        if stats is not None and handler_object is not None:
+            callback = handler_object.callback
+            stats.handler = f"{callback.__module__}.{callback.__name__}"
+        return await handler(event, data)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("washbot_query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["washbot_query_started"].pop()
+    stats = _current.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_time += time.perf_counter() - started
+
+
+def install_db_hooks():
+    """Подсчет запросов и времени в БД для всех движков процесса"""
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def setup_metrics(dp: Dispatcher):
+    """Подключить инструментирование к диспетчеру"""
+    if not settings.METRICS_ENABLED:
+        return
+    install_db_hooks()
+    dp.update.outer_middleware(MetricsMiddleware())
+    for observer in (dp.message, dp.callback_query):
+        observer.middleware(HandlerNameMiddleware())
+
+
+def render() -> str:
+    """Все метрики процесса в текстовом формате Prometheus"""
+    lines = [
+        "# TYPE washbot_handler_duration_seconds histogram",
+    ]
+    for name, histogram in sorted(handler_latency.items()):
+        lines.extend(histogram.render("washbot_handler_duration_seconds", f'handler="{name}"'))
+
+    lines.append("# TYPE washbot_handler_db_queries histogram")
+    for name, histogram in sorted(handler_queries.items()):
+        lines.extend(histogram.render("washbot_handler_db_queries", f'handler="{name}"'))
+
+    lines.append("# TYPE washbot_handler_db_seconds_total counter")
+    for name, seconds in sorted(handler_db_seconds.items()):
+        lines.append(f'washbot_handler_db_seconds_total{{handler="{name}"}} {seconds}')
+
+    lines.append("# TYPE washbot_n_plus_one_total counter")
+    for name, count in sorted(n_plus_one.items()):
+        lines.append(f'washbot_n_plus_one_total{{handler="{name}"}} {count}')
+
+    lines.append("# TYPE washbot_slot_cache_total counter")
+    for result, count in sorted(slot_cache.stats.items()):
+        lines.append(f'washbot_slot_cache_total{{result="{result}"}} {count}')
+
+    lines.append("# TYPE washbot_catalog_cache_total counter")
+    for result, count in sorted(catalog.stats.items()):
+        lines.append(f'washbot_catalog_cache_total{{result="{result}"}} {count}')
+
+    lines.append("# TYPE washbot_keyboard_cache_total counter")
+    for result, count in sorted(markup.stats.items()):
+        lines.append(f'washbot_keyboard_cache_total{{result="{result}"}} {count}')
+
+    lines.append("# TYPE washbot_outbox_messages_total counter")
+    for result, count in sorted(outbox.stats.items()):
+        lines.append(f'washbot_outbox_messages_total{{result="{result}"}} {count}')
+
+    lines.append("# TYPE washbot_fsm_keys gauge")
+    for name, value in sorted(fsm_storage.sweep_stats.items()):
+        lines.append(f'washbot_fsm_keys{{stat="{name}"}} {value}')
+
+    return "\n".join(lines) + "\n"
+
+
+async def metrics_handler(request: web.Request) -> web.Response:
+    return web.Response(text=render(), content_type="text/plain", charset="utf-8")
+
+
+async def start_metrics_server() -> web.AppRunner:
+    """Отдельный внутренний HTTP-сервер /metrics (и в polling, и в webhook)"""
+    app = web.Application()
+    app.router.add_get("/metrics", metrics_handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host=settings.METRICS_HOST, port=settings.METRICS_PORT).start()
+    logger.info(f"Metrics on {settings.METRICS_HOST}:{settings.METRICS_PORT}/metrics")
+    return runner
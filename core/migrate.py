@@ -0,0 +1,29 @@
+"""Миграция схемы БД: python -m core.migrate [revision]
+
+Запускается отдельно от ботов (один раз на деплой), чтобы рестарт
+контейнеров не брал DDL-блокировки, пока другие боты обслуживают трафик.
+"""
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from alembic import command
+from alembic.config import Config
+
+from core.logger import setup_logger
+from core.runtime import ALEMBIC_INI
+
+logger = setup_logger("migrate")
+
+def main():
+    revision = sys.argv[1] if len(sys.argv) > 1 else "head"
+    config = Config(str(ALEMBIC_INI))
+    config.set_main_option("script_location", str(ALEMBIC_INI.parent / "migrations"))
+    
+    logger.info(f"Upgrading schema to {revision}")
+    command.upgrade(config, revision)
+    logger.info("Schema is up to date")
+
+if __name__ == "__main__":
+    main()
@@ -3,8 +3,9 @@ from sqlalchemy import (
     Numeric, ForeignKey, JSON, Date, BigInteger, Index,
     UniqueConstraint, CheckConstraint
 )
+from sqlalchemy.dialects.postgresql import ExcludeConstraint
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 from datetime import datetime
 from core.database import Base
 
@@ -44,8 +45,17 @@ class User(Base):
     subscriptions = relationship("Subscription", back_populates="user")
     
     __table_args__ = (
-        Index("ix_users_telegram_id", "telegram_id"),
+        # telegram_id уже проиндексирован уникальным ограничением
         Index("ix_users_role", "role"),
+        # Клиенты мойки по дате регистрации: keyset-листание (owner), дашборд
+        Index("ix_users_wash_role_created_id", "car_wash_id", "role", "created_at", "id"),
+        # Поиск клиентов по подстроке (ILIKE), нужен pg_trgm
+        Index("ix_users_full_name_trgm", "full_name", postgresql_using="gin",
+              postgresql_ops={"full_name": "gin_trgm_ops"}),
+        Index("ix_users_username_trgm", "username", postgresql_using="gin",
+              postgresql_ops={"username": "gin_trgm_ops"}),
+        Index("ix_users_phone_trgm", "phone", postgresql_using="gin",
+              postgresql_ops={"phone": "gin_trgm_ops"}),
     )
 
 class Service(Base):
@@ -84,7 +94,25 @@ class Appointment(Base):
     
     __table_args__ = (
         Index("ix_appointments_time", "appointment_time"),
-        Index("ix_appointments_status", "status"),
+        # Расписание и свободные слоты мойки: только активные записи
+        Index(
+            "ix_appointments_wash_time_active",
+            "car_wash_id", "appointment_time",
+            postgresql_where=text("status IN ('confirmed', 'pending')")
+        ),
+        # Статистика выполненных записей
+        Index("ix_appointments_wash_status_completed", "car_wash_id", "status", "completed_at"),
+        # История клиента, новые сверху
+        Index("ix_appointments_user_time", user_id, appointment_time.desc()),
+        Index("ix_appointments_service_id", "service_id"),
+        # Две активные записи одной мойки не могут пересекаться по времени
+        ExcludeConstraint(
+            ("car_wash_id", "="),
+            (func.tstzrange(text("appointment_time"), text("end_time")), "&&"),
+            name="ex_appointments_no_overlap",
+            using="gist",
+            where=text("status IN ('confirmed', 'pending')")
+        ),
     )
 
 class Subscription(Base):
@@ -103,6 +131,30 @@ class Subscription(Base):
     
     # Relationships
     user = relationship("User", back_populates="subscriptions")
+    
+    __table_args__ = (
+        # Активные абонементы клиента
+        Index("ix_subscriptions_user_active", "user_id", postgresql_where=text("is_active")),
+        # Истечение: по сроку среди действующих
+        Index("ix_subscriptions_active_valid_until", "valid_until", postgresql_where=text("is_active")),
+    )
+
+class SubscriptionPlan(Base):
+    """Абонемент в каталоге мойки (что можно купить)"""
+    __tablename__ = "subscription_plans"
+    
+    id = Column(Integer, primary_key=True)
+    car_wash_id = Column(Integer, ForeignKey("carwashes.id"), nullable=False)
+    name = Column(String(255), nullable=False)
+    washes = Column(Integer, nullable=False)
+    price = Column(Numeric(10, 2), nullable=False)
+    days = Column(Integer, nullable=False)
+    is_active = Column(Boolean, nullable=False, default=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        Index("ix_subscription_plans_car_wash_id", "car_wash_id"),
+    )
 
 class Transaction(Base):
     __tablename__ = "transactions"
@@ -115,10 +167,28 @@ class Transaction(Base):
     status = Column(String(50), nullable=False, default="pending")
     payment_method = Column(String(50))
     admin_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    # Абонемент из каталога для subscription_purchase
+    plan_id = Column(Integer, ForeignKey("subscription_plans.id"))
+    # Ключ идемпотентности решения (подтверждения или отклонения)
+    decision_key = Column(String(16))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     approved_at = Column(DateTime(timezone=True))
     
     __table_args__ = (
-        Index("ix_transactions_status", "status"),
         Index("ix_transactions_created", "created_at"),
+        # Очередь платежей на подтверждение
+        Index(
+            "ix_transactions_pending",
+            "car_wash_id", "created_at",
+            postgresql_where=text("status = 'pending'")
+        ),
     )
+
+class DailyStats(Base):
+    """Дневная выручка и визиты мойки, обновляется при выполнении записи"""
+    __tablename__ = "daily_stats"
+    
+    car_wash_id = Column(Integer, ForeignKey("carwashes.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    revenue = Column(Numeric(12, 2), nullable=False, default=0)
+    visits = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,275 @@
+import asyncio
+import json
+import secrets
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Optional, Tuple
+
+from aiogram import Bot, Dispatcher
+from aiogram.exceptions import (
+    TelegramBadRequest, TelegramForbiddenError, TelegramNetworkError,
+    TelegramRetryAfter, TelegramServerError
+)
+from aiogram.types import InlineKeyboardMarkup
+
+from core.logger import logger
+from core.redis_client import get_redis
+
+# Очередь бота: list с JSON-сообщениями; взятые в работу - в :processing
+QUEUE_PREFIX = "washbot:outbox"
+
+# Лимиты Telegram: ~30 сообщений/с на бота, ~1/с в один чат (короткие всплески допустимы)
+GLOBAL_RATE = 25
+CHAT_RATE = 1
+CHAT_BURST = 3
+CHAT_BUCKETS_MAX = 10000
+
+# Сколько сообщений держим в памяти, остальное ждет в Redis
+MAX_IN_FLIGHT = 500
+# Повторы при сетевых ошибках и 5xx (RetryAfter не считается попыткой)
+MAX_ATTEMPTS = 5
+
+# Каждый процесс держит взятое в работу в своем списке и продлевает пульс;
+# список процесса без пульса возвращается в очередь живыми процессами
+HEARTBEAT_INTERVAL = 10
+HEARTBEAT_TTL = 30
+
+# Счетчики всех очередей процесса (для /metrics)
+stats: Dict[str, int] = {"sent": 0, "retried": 0, "dropped": 0}
+
+
+def queue_key(bot_id: int) -> str:
+    return f"{QUEUE_PREFIX}:{bot_id}"
+
+
+async def enqueue(bot_id: int, chat_id: int, text: str, reply_markup: Optional[InlineKeyboardMarkup] = None):
+    """Поставить сообщение в очередь бота (отправит процесс, где запущен этот бот)"""
+    job = {"c": chat_id, "t": text}
+    if reply_markup is not None:
+        job["m"] = reply_markup.model_dump(exclude_none=True)
+    await get_redis().rpush(queue_key(bot_id), json.dumps(job, ensure_ascii=False))
+
+
+class TokenBucket:
+    """Token bucket с резервированием: очередь ожидающих выстраивается по времени"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def reserve(self) -> float:
+        """Взять токен; вернуть, сколько секунд ждать до отправки"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    async def acquire(self):
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class Outbox:
+    """Исходящие сообщения бота: очередь в Redis, лимиты на чат и на бота.
+
+    Сообщения одного чата уходят по порядку, разные чаты - параллельно.
+    Обработчик только кладет сообщение в очередь и сразу отвечает.
+    У каждого процесса свой список :processing:{instance}, поэтому несколько
+    реплик одного бота (webhook, перекрытие при перезапуске) не забирают
+    друг у друга сообщения, которые сейчас отправляются.
+    """
+
+    def __init__(self, bot: Bot):
+        self.bot = bot
+        self.queue_key = queue_key(bot.id)
+        self.instance = secrets.token_hex(6)
+        self.instances_key = f"{self.queue_key}:instances"
+        self.processing_key = self._processing_key(self.instance)
+        self.heartbeat_key = self._heartbeat_key(self.instance)
+        self.global_bucket = TokenBucket(GLOBAL_RATE, GLOBAL_RATE)
+        self._chat_buckets: "OrderedDict[int, TokenBucket]" = OrderedDict()
+        self._pending: Dict[int, Deque[Tuple[bytes, dict]]] = {}
+        self._chat_tasks: Dict[int, asyncio.Task] = {}
+        self._in_flight = asyncio.Semaphore(MAX_IN_FLIGHT)
+        self._paused_until = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._heartbeat_task: Optional[asyncio.Task] = None
+
+    def _processing_key(self, instance: str) -> str:
+        return f"{self.queue_key}:processing:{instance}"
+
+    def _heartbeat_key(self, instance: str) -> str:
+        return f"{self.queue_key}:alive:{instance}"
+
+    async def send(self, chat_id: int, text: str, reply_markup: Optional[InlineKeyboardMarkup] = None):
+        """Поставить сообщение в очередь"""
+        await enqueue(self.bot.id, chat_id, text, reply_markup)
+
+    async def start(self):
+        redis = get_redis()
+        await redis.set(self.heartbeat_key, "1", ex=HEARTBEAT_TTL)
+        await redis.sadd(self.instances_key, self.instance)
+        await self.recover()
+        self._heartbeat_task = asyncio.create_task(self._heartbeat())
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        tasks = [t for t in [self._task, self._heartbeat_task, *self._chat_tasks.values()] if t is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = self._heartbeat_task = None
+        # Отправка остановлена - недоставленное сразу возвращаем в очередь
+        redis = get_redis()
+        await self._requeue(self.processing_key)
+        await redis.srem(self.instances_key, self.instance)
+        await redis.delete(self.heartbeat_key)
+
+    async def _requeue(self, processing_key: str):
+        """Вернуть список взятых в работу в начало очереди, сохраняя порядок"""
+        redis = get_redis()
+        while await redis.lmove(processing_key, self.queue_key, "RIGHT", "LEFT") is not None:
+            pass
+
+    async def recover(self):
+        """Вернуть в очередь сообщения процессов, переставших продлевать пульс"""
+        redis = get_redis()
+        for raw in await redis.smembers(self.instances_key):
+            instance = raw.decode() if isinstance(raw, bytes) else raw
+            if instance == self.instance or await redis.exists(self._heartbeat_key(instance)):
+                continue
+            # Один восстановитель на мертвый процесс
+            if not await redis.set(f"{self.queue_key}:recovering:{instance}", "1", nx=True, ex=HEARTBEAT_TTL):
+                continue
+            await self._requeue(self._processing_key(instance))
+            await redis.srem(self.instances_key, instance)
+            logger.warning(f"Outbox {self.bot.id}: recovered messages of stopped instance {instance}")
+
+    async def _heartbeat(self):
+        redis = get_redis()
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            try:
+                await redis.set(self.heartbeat_key, "1", ex=HEARTBEAT_TTL)
+                # После долгого сбоя Redis нас могли счесть остановленными
+                await redis.sadd(self.instances_key, self.instance)
+                await self.recover()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Outbox {self.bot.id} heartbeat failed: {e}")
+
+    async def drain(self, poll: float = 0.05):
+        """Дождаться отправки всего, что есть в очереди"""
+        redis = get_redis()
+        while self._chat_tasks or await redis.llen(self.queue_key):
+            await asyncio.sleep(poll)
+
+    async def _run(self):
+        redis = get_redis()
+        while True:
+            await self._in_flight.acquire()
+            try:
+                raw = await redis.blmove(self.queue_key, self.processing_key, 1, "LEFT", "RIGHT")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Outbox {self.bot.id} read failed: {e}")
+                raw = None
+                await asyncio.sleep(1)
+            if raw is None:
+                self._in_flight.release()
+                continue
+
+            job = json.loads(raw)
+            chat_id = job["c"]
+            self._pending.setdefault(chat_id, deque()).append((raw, job))
+            if chat_id not in self._chat_tasks:
+                self._chat_tasks[chat_id] = asyncio.create_task(self._drain_chat(chat_id))
+
+    async def _drain_chat(self, chat_id: int):
+        redis = get_redis()
+        queue = self._pending[chat_id]
+        try:
+            while queue:
+                raw, job = queue[0]
+                await self._deliver(job)
+                queue.popleft()
+                await redis.lrem(self.processing_key, 1, raw)
+                self._in_flight.release()
+        finally:
+            if not queue:
+                self._pending.pop(chat_id, None)
+            self._chat_tasks.pop(chat_id, None)
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._chat_buckets[chat_id] = TokenBucket(CHAT_RATE, CHAT_BURST)
+            while len(self._chat_buckets) > CHAT_BUCKETS_MAX:
+                self._chat_buckets.popitem(last=False)
+        else:
+            self._chat_buckets.move_to_end(chat_id)
+        return bucket
+
+    async def _deliver(self, job: dict):
+        chat_id = job["c"]
+        markup = InlineKeyboardMarkup.model_validate(job["m"]) if "m" in job else None
+        attempts = 0
+        while True:
+            await self._chat_bucket(chat_id).acquire()
+            pause = self._paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+            await self.global_bucket.acquire()
+
+            try:
+                await self.bot.send_message(chat_id, job["t"], reply_markup=markup)
+                stats["sent"] += 1
+                return
+            except TelegramRetryAfter as e:
+                # Флуд-контроль касается всего бота - притормаживаем всю очередь
+                self._paused_until = max(self._paused_until, time.monotonic() + e.retry_after)
+                stats["retried"] += 1
+                logger.warning(f"Outbox {self.bot.id}: flood control, retry after {e.retry_after} s")
+            except (TelegramForbiddenError, TelegramBadRequest) as e:
+                # Бот заблокирован или сообщение некорректно - повтор не поможет
+                stats["dropped"] += 1
+                logger.error(
+                    f"Outbox {self.bot.id}: dropped message to {chat_id} "
+                    f"({type(e).__name__}: {e}): {job['t'][:200]!r}"
+                )
+                return
+            except (TelegramNetworkError, TelegramServerError) as e:
+                attempts += 1
+                if attempts >= MAX_ATTEMPTS:
+                    stats["dropped"] += 1
+                    logger.error(f"Outbox {self.bot.id}: giving up on {chat_id} after {attempts} attempts: {e}")
+                    return
+                stats["retried"] += 1
+                await asyncio.sleep(min(2 ** attempts, 30))
+            except Exception as e:
+                stats["dropped"] += 1
+                logger.error(f"Outbox {self.bot.id}: failed to send to {chat_id}: {e}")
+                return
+
+
+def setup_outbox(dp: Dispatcher):
+    """Очередь на бота диспетчера; обработчики получают ее аргументом outbox"""
+
+    async def on_startup(bot: Bot):
+        outbox = Outbox(bot)
+        await outbox.start()
+        dp["outbox"] = outbox
+
+    async def on_shutdown():
+        outbox = dp.workflow_data.pop("outbox", None)
+        if outbox is not None:
+            await outbox.stop()
+
+    dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
@@ -0,0 +1,305 @@
+"""Подтверждение и отклонение платежей.
+
+Переход из pending - один ``UPDATE ... WHERE status = 'pending' RETURNING``:
+двойное нажатие или два администратора не проведут платеж дважды. Строки,
+которые в этот момент обрабатывает другой администратор, пропускаются
+(SKIP LOCKED), а не ждут его транзакцию. Баланс меняется инкрементом в SQL.
+
+Кнопка решения несет ключ идемпотентности: он сохраняется в decision_key,
+и повтор той же кнопки получает тот же ответ, а не "уже обработан".
+"""
+import secrets
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from html import escape
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from sqlalchemy import bindparam, func, insert, or_, select, true, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from core.catalog import Plan, get_plan
+from core.config import settings
+from core.logger import logger
+from core.models import Subscription, Transaction, User
+from core.outbox import enqueue
+
+APPROVED = "approved"
+REJECTED = "rejected"
+
+# Для покупок без абонемента из каталога (созданных до каталога)
+FALLBACK_PLAN = Plan(id=0, name="Абонемент", washes=5, price=Decimal(0), days=30, is_active=False)
+
+
+class Processed(NamedTuple):
+    """Платеж, переведенный этим вызовом"""
+    id: int
+    user_id: int
+    car_wash_id: int
+    amount: Decimal
+    type: str
+    plan_id: Optional[int]
+
+
+class Decision(NamedTuple):
+    """Итог решения по списку платежей"""
+    processed: List[Processed]
+    # Уже переведены этим же ключом (повтор нажатия)
+    replayed: List[int]
+    # Обработаны раньше другим решением или сейчас в работе у другого администратора
+    skipped: List[int]
+
+
+class PendingRow(NamedTuple):
+    """Платеж в сводке на подтверждение"""
+    id: int
+    amount: Decimal
+    type: str
+    created_at: datetime
+    client_name: Optional[str]
+    status: str
+
+
+class PendingPage(NamedTuple):
+    rows: List[PendingRow]
+    # По всей очереди мойки, не только по странице
+    total: int
+    total_amount: Decimal
+    newest: Optional[int]
+    has_prev: bool
+    has_next: bool
+
+
+def new_decision_key() -> str:
+    """Ключ идемпотентности для кнопки (8 символов)"""
+    return secrets.token_urlsafe(6)
+
+
+async def plan_for(txn: "Processed") -> Plan:
+    """Абонемент покупки - из кэша каталога, в том числе выключенный"""
+    return await get_plan(txn.car_wash_id, txn.plan_id) or FALLBACK_PLAN
+
+
+async def get_pending_page(
+    db: AsyncSession,
+    car_wash_id: int,
+    limit: int,
+    top: Optional[int] = None,
+    above: Optional[int] = None,
+    key: Optional[str] = None
+) -> PendingPage:
+    """Страница очереди платежей одним запросом, новые первыми.
+
+    Keyset по id: top - id первой строки (страница - id <= top), above - id,
+    выше которого взять предыдущую страницу. С key в страницу попадают и
+    платежи, уже решенные этим ключом: так страница выглядит как при показе,
+    и по маске выбора можно найти те же строки при повторном нажатии.
+    """
+    queue = (
+        Transaction.car_wash_id == car_wash_id,
+        Transaction.status == "pending"
+    )
+    totals = (
+        select(
+            func.count().label("total"),
+            func.coalesce(func.sum(Transaction.amount), 0).label("total_amount"),
+            func.max(Transaction.id).label("newest")
+        )
+        .where(*queue)
+        .subquery()
+    )
+
+    visible = Transaction.status == "pending"
+    if key is not None:
+        visible = or_(visible, Transaction.decision_key == key)
+    query = (
+        select(
+            Transaction.id, Transaction.amount, Transaction.type, Transaction.created_at,
+            User.full_name, Transaction.status, *totals.c
+        )
+        .join(User, User.id == Transaction.user_id)
+        .join(totals, true())
+        .where(Transaction.car_wash_id == car_wash_id, visible)
+    )
+    if above is not None:
+        query = query.where(Transaction.id > above).order_by(Transaction.id)
+    else:
+        if top is not None:
+            query = query.where(Transaction.id <= top)
+        query = query.order_by(Transaction.id.desc())
+
+    result = await db.execute(query.limit(limit + 1))
+    rows = result.all()
+    if not rows:
+        # Страница пуста - итоги очереди отдельным запросом
+        total, total_amount, newest = (await db.execute(select(totals))).one()
+        return PendingPage([], total, total_amount, newest, has_prev=False, has_next=False)
+
+    total, total_amount, newest = rows[0][-3:]
+    more = len(rows) > limit
+    page = [PendingRow(*row[:6]) for row in rows[:limit]]
+    if above is not None:
+        page.reverse()
+        return PendingPage(page, total, total_amount, newest, has_prev=more, has_next=True)
+    return PendingPage(
+        page, total, total_amount, newest,
+        has_prev=newest is not None and newest > page[0].id,
+        has_next=more
+    )
+
+
+async def queued_ids(db: AsyncSession, car_wash_id: int, newest: int, key: Optional[str] = None) -> List[int]:
+    """Все платежи очереди до newest (и уже решенные ключом key - для повтора)"""
+    visible = Transaction.status == "pending"
+    if key is not None:
+        visible = or_(visible, Transaction.decision_key == key)
+    result = await db.execute(
+        select(Transaction.id).where(
+            Transaction.car_wash_id == car_wash_id,
+            Transaction.id <= newest,
+            visible
+        )
+    )
+    return list(result.scalars().all())
+
+
+async def _transition(
+    db: AsyncSession,
+    txn_ids: Iterable[int],
+    car_wash_id: int,
+    admin_id: int,
+    key: Optional[str],
+    status: str
+) -> Decision:
+    txn_ids = sorted(set(txn_ids))
+    # Блокируем в порядке id и пропускаем чужие: ни дедлоков, ни очередей на блокировках
+    claim = aliased(Transaction)
+    claimable = (
+        select(claim.id)
+        .where(
+            claim.id.in_(txn_ids),
+            claim.car_wash_id == car_wash_id,
+            claim.status == "pending"
+        )
+        .order_by(claim.id)
+        .with_for_update(skip_locked=True)
+    )
+    result = await db.execute(
+        update(Transaction)
+        .where(Transaction.id.in_(claimable), Transaction.status == "pending")
+        .values(status=status, admin_id=admin_id, approved_at=func.now(), decision_key=key)
+        .returning(
+            Transaction.id, Transaction.user_id, Transaction.car_wash_id,
+            Transaction.amount, Transaction.type, Transaction.plan_id
+        )
+        .execution_options(synchronize_session=False)
+    )
+    processed = sorted((Processed(*row) for row in result.all()), key=lambda p: p.id)
+
+    done = {p.id for p in processed}
+    rest = [txn_id for txn_id in txn_ids if txn_id not in done]
+    replayed, skipped = [], []
+    if rest and key is not None:
+        result = await db.execute(
+            select(Transaction.id).where(
+                Transaction.id.in_(rest),
+                Transaction.status == status,
+                Transaction.decision_key == key
+            )
+        )
+        replayed = sorted(result.scalars().all())
+    skipped = [txn_id for txn_id in rest if txn_id not in replayed]
+    return Decision(processed, replayed, skipped)
+
+
+async def _credit(db: AsyncSession, processed: List[Processed]):
+    """Пополнения - инкрементом баланса, покупки - новыми абонементами"""
+    credits: Dict[int, Decimal] = {}
+    subscriptions = []
+    today = date.today()
+    for txn in processed:
+        if txn.type == "replenishment":
+            credits[txn.user_id] = credits.get(txn.user_id, Decimal(0)) + txn.amount
+        elif txn.type == "subscription_purchase":
+            plan = await plan_for(txn)
+            subscriptions.append({
+                "user_id": txn.user_id,
+                "car_wash_id": txn.car_wash_id,
+                "name": plan.name,
+                "total_washes": plan.washes,
+                "remaining_washes": plan.washes,
+                "purchase_price": txn.amount,
+                "valid_until": today + timedelta(days=plan.days),
+                "is_active": True
+            })
+
+    if credits:
+        # Одно executemany, строки клиентов - в порядке id
+        await db.execute(
+            update(User.__table__)
+            .where(User.__table__.c.id == bindparam("client_id"))
+            .values(balance=User.__table__.c.balance + bindparam("credit")),
+            [{"client_id": user_id, "credit": amount} for user_id, amount in sorted(credits.items())]
+        )
+    if subscriptions:
+        await db.execute(insert(Subscription), subscriptions)
+
+
+async def approve_payments(
+    db: AsyncSession,
+    txn_ids: Iterable[int],
+    car_wash_id: int,
+    admin_id: int,
+    key: Optional[str] = None
+) -> Decision:
+    """Подтвердить платежи мойки одной транзакцией БД (коммит - здесь)"""
+    decision = await _transition(db, txn_ids, car_wash_id, admin_id, key, APPROVED)
+    if decision.processed:
+        await _credit(db, decision.processed)
+    await db.commit()
+    return decision
+
+
+async def reject_payments(
+    db: AsyncSession,
+    txn_ids: Iterable[int],
+    car_wash_id: int,
+    admin_id: int,
+    key: Optional[str] = None
+) -> Decision:
+    """Отклонить платежи мойки (коммит - здесь)"""
+    decision = await _transition(db, txn_ids, car_wash_id, admin_id, key, REJECTED)
+    await db.commit()
+    return decision
+
+
+async def _client_text(txn: Processed, status: str) -> str:
+    if status == REJECTED:
+        return f"❌ Платеж #{txn.id} на {txn.amount}₽ отклонен. Если это ошибка, обратитесь к администратору."
+    if txn.type == "subscription_purchase":
+        plan = await plan_for(txn)
+        return (
+            f"✅ <b>Абонемент активирован!</b>\n\n"
+            f"{escape(plan.name)}\n"
+            f"Доступно моек: {plan.washes}\n"
+            f"Срок действия: {plan.days} дней"
+        )
+    if txn.type == "replenishment":
+        return f"✅ Баланс пополнен на {txn.amount}₽"
+    return f"✅ Платеж #{txn.id} на {txn.amount}₽ подтвержден"
+
+
+async def notify_clients(db: AsyncSession, processed: List[Processed], status: str):
+    """Сообщить клиентам о решении через очередь клиентского бота"""
+    if not processed:
+        return
+    result = await db.execute(
+        select(User.id, User.telegram_id).where(User.id.in_({p.user_id for p in processed}))
+    )
+    telegram_ids = dict(result.all())
+    bot_id = int(settings.BOT_CLIENT_TOKEN.split(":", 1)[0])
+    for txn in processed:
+        try:
+            await enqueue(bot_id, telegram_ids[txn.user_id], await _client_text(txn, status))
+        except Exception as e:
+            logger.error(f"Payment {txn.id}: client notification failed: {e}")
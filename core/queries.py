@@ -0,0 +1,160 @@
+from datetime import date, datetime
+from decimal import Decimal
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import or_, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from core.models import Appointment, Service, User
+
+
+class ScheduleRow(NamedTuple):
+    """Запись в расписании: только то, что нужно для вывода"""
+    id: int
+    appointment_time: datetime
+    client_name: Optional[str]
+    service_name: str
+    price: Decimal
+    duration: int
+    status: str
+
+
+def _schedule_query():
+    return (
+        select(
+            Appointment.id,
+            Appointment.appointment_time,
+            User.full_name,
+            Service.name,
+            Service.price,
+            Service.duration,
+            Appointment.status
+        )
+        .join(User, User.id == Appointment.user_id)
+        .join(Service, Service.id == Appointment.service_id)
+    )
+
+
+async def get_day_schedule(
+    db: AsyncSession,
+    car_wash_id: int,
+    day: date,
+    statuses: Sequence[str] = ("confirmed", "pending")
+) -> List[ScheduleRow]:
+    """Расписание мойки на день одним запросом"""
+    day_start = datetime.combine(day, datetime.min.time())
+    day_end = datetime.combine(day, datetime.max.time())
+
+    result = await db.execute(
+        _schedule_query()
+        .where(
+            Appointment.car_wash_id == car_wash_id,
+            Appointment.appointment_time >= day_start,
+            Appointment.appointment_time <= day_end,
+            Appointment.status.in_(statuses)
+        )
+        .order_by(Appointment.appointment_time)
+    )
+    return [ScheduleRow(*row) for row in result.all()]
+
+
+async def get_user_history(
+    db: AsyncSession,
+    limit: int,
+    user_id: Optional[int] = None,
+    telegram_id: Optional[int] = None
+) -> List[ScheduleRow]:
+    """Последние записи клиента (по id или telegram_id) одним запросом"""
+    if user_id is None and telegram_id is None:
+        # Без фильтра запрос вернул бы записи всех моек
+        raise ValueError("get_user_history: user_id or telegram_id is required")
+    query = _schedule_query()
+    if user_id is not None:
+        query = query.where(Appointment.user_id == user_id)
+    if telegram_id is not None:
+        query = query.where(User.telegram_id == telegram_id)
+
+    result = await db.execute(
+        query.order_by(Appointment.appointment_time.desc()).limit(limit)
+    )
+    return [ScheduleRow(*row) for row in result.all()]
+
+
+class ClientRow(NamedTuple):
+    """Клиент в списке владельца"""
+    id: int
+    full_name: Optional[str]
+    username: Optional[str]
+    phone: Optional[str]
+    balance: Decimal
+    created_at: datetime
+
+
+# Ключ страницы: (created_at, id) крайнего клиента
+Cursor = Tuple[datetime, int]
+
+
+class ClientPage(NamedTuple):
+    rows: List[ClientRow]
+    has_prev: bool
+    has_next: bool
+
+
+def _like_pattern(search: str) -> str:
+    escaped = search.replace("!", "!!").replace("%", "!%").replace("_", "!_")
+    return f"%{escaped}%"
+
+
+async def get_clients_page(
+    db: AsyncSession,
+    owner_telegram_id: int,
+    limit: int,
+    after: Optional[Cursor] = None,
+    before: Optional[Cursor] = None,
+    search: Optional[str] = None
+) -> ClientPage:
+    """Страница клиентов мойки владельца, новые первыми, одним запросом.
+
+    Keyset по (created_at, id): любая страница - проход по индексу от курсора,
+    без OFFSET. after - следующая страница, before - предыдущая.
+    Поиск - ILIKE по имени, username и телефону (триграммные индексы).
+    """
+    owner = aliased(User)
+    owner_wash = (
+        select(owner.car_wash_id)
+        .where(owner.telegram_id == owner_telegram_id)
+        .scalar_subquery()
+    )
+    query = select(
+        User.id, User.full_name, User.username, User.phone, User.balance, User.created_at
+    ).where(
+        User.car_wash_id == owner_wash,
+        User.role == "client"
+    )
+    if search:
+        pattern = _like_pattern(search)
+        query = query.where(or_(
+            User.full_name.ilike(pattern, escape="!"),
+            User.username.ilike(pattern, escape="!"),
+            User.phone.ilike(pattern, escape="!")
+        ))
+
+    key = tuple_(User.created_at, User.id)
+    if before is not None:
+        # Предыдущая страница: идем к новым от курсора и разворачиваем
+        query = query.where(key > tuple_(*before)).order_by(User.created_at, User.id)
+    else:
+        if after is not None:
+            query = query.where(key < tuple_(*after))
+        query = query.order_by(User.created_at.desc(), User.id.desc())
+
+    result = await db.execute(query.limit(limit + 1))
+    rows = [ClientRow(*row) for row in result.all()]
+    more = len(rows) > limit
+    rows = rows[:limit]
+
+    if before is not None:
+        rows.reverse()
+        return ClientPage(rows, has_prev=more, has_next=True)
+    return ClientPage(rows, has_prev=after is not None, has_next=more)
@@ -0,0 +1,106 @@
+"""Списание моек с абонементов и истечение абонементов.
+
+Списание - один условный ``UPDATE ... RETURNING``: подзапрос выбирает
+лучший действующий абонемент клиента (раньше всех истекающий, затем с
+меньшим остатком) и блокирует его, внешний UPDATE уменьшает остаток и
+выключает абонемент на последней мойке. От двойного нажатия защищает
+блокировка записи в mark_completed; две разные записи клиента, выполненные
+одновременно, списываются по очереди: вторая ждет блокировку абонемента.
+
+Истекшие абонементы выключаются одним UPDATE по всей таблице; проход делает
+один процесс за интервал (блокировка в Redis).
+"""
+import asyncio
+from datetime import date
+from typing import NamedTuple, Optional
+
+from sqlalchemy import nulls_last, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from core.database import get_db_context
+from core.logger import logger
+from core.models import Subscription
+from core.redis_client import get_redis
+
+EXPIRY_LOCK = "washbot:subscriptions:expiry"
+EXPIRY_INTERVAL = 60 * 60
+
+
+class Redeemed(NamedTuple):
+    """Абонемент, с которого списана мойка"""
+    id: int
+    name: str
+    remaining_washes: int
+    valid_until: Optional[date]
+
+
+async def redeem_wash(db: AsyncSession, user_id: int, car_wash_id: int, day: date) -> Optional[Redeemed]:
+    """Списать мойку с лучшего действующего абонемента; None - абонемента нет.
+
+    Коммит - у вызывающего, в одной транзакции с отметкой выполнения.
+    """
+    candidate = aliased(Subscription)
+    best = (
+        select(candidate.id)
+        .where(
+            candidate.user_id == user_id,
+            candidate.car_wash_id == car_wash_id,
+            candidate.is_active,
+            candidate.remaining_washes > 0,
+            (candidate.valid_until == None) | (candidate.valid_until >= day)
+        )
+        .order_by(nulls_last(candidate.valid_until), candidate.remaining_washes, candidate.id)
+        .limit(1)
+        # Параллельное списание с того же абонемента ждет, а не проходит бесплатно
+        .with_for_update()
+        .scalar_subquery()
+    )
+    result = await db.execute(
+        update(Subscription)
+        .where(Subscription.id == best, Subscription.remaining_washes > 0)
+        .values(
+            remaining_washes=Subscription.remaining_washes - 1,
+            # Справа - значение до обновления: последняя мойка выключает абонемент
+            is_active=Subscription.remaining_washes > 1
+        )
+        .returning(
+            Subscription.id, Subscription.name,
+            Subscription.remaining_washes, Subscription.valid_until
+        )
+        .execution_options(synchronize_session=False)
+    )
+    row = result.one_or_none()
+    return Redeemed(*row) if row is not None else None
+
+
+async def expire_subscriptions(db: AsyncSession, today: date) -> int:
+    """Выключить истекшие и израсходованные абонементы одним UPDATE (коммит - здесь)"""
+    result = await db.execute(
+        update(Subscription)
+        .where(
+            Subscription.is_active,
+            (Subscription.valid_until < today) | (Subscription.remaining_washes <= 0)
+        )
+        .values(is_active=False)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount
+
+
+async def run_expiry():
+    """Фоновая задача: один проход за интервал на все процессы (блокировка в Redis)"""
+    redis = get_redis()
+    while True:
+        try:
+            if await redis.set(EXPIRY_LOCK, "1", nx=True, ex=EXPIRY_INTERVAL):
+                async with get_db_context() as db:
+                    expired = await expire_subscriptions(db, date.today())
+                if expired:
+                    logger.info(f"Subscriptions expired: {expired}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Subscription expiry failed: {e}")
+        await asyncio.sleep(EXPIRY_INTERVAL)
@@ -0,0 +1,23 @@
+from typing import Optional
+
+from redis.asyncio import Redis
+
+from core.config import settings
+
+_redis: Optional[Redis] = None
+
+
+def get_redis() -> Redis:
+    """Общий клиент Redis (тот же инстанс, что и у RedisStorage)"""
+    global _redis
+    if _redis is None:
+        _redis = Redis.from_url(settings.REDIS_URL)
+    return _redis
+
+
+async def close_redis():
+    """Закрыть общий клиент Redis"""
+    global _redis
+    if _redis is not None:
+        await _redis.aclose()
+        _redis = None
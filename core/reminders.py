@@ -0,0 +1,285 @@
+"""Напоминания клиентам о записях.
+
+Время срабатывания хранится в ZSET ``washbot:reminders`` (score - unix time,
+член - ``{appointment_id}:{kind}``), поэтому добавление, удаление и выборка
+созревших - O(log n), а таблица appointments не опрашивается. Созревшие
+снимаются пачками атомарно (Lua), так что несколько процессов не отправят
+одно напоминание дважды; отправка - через очередь клиентского бота.
+Снятые лежат в ``washbot:reminders:processing``, пока каждое не поставлено
+в очередь; неотправленные при ошибке возвращаются в расписание, а после
+падения процесса - по таймауту. Попыток на напоминание не больше MAX_ATTEMPTS.
+
+Заполнить ZSET по уже существующим будущим записям (один раз при деплое):
+
+    python -m core.reminders --rebuild
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+from html import escape
+from typing import Dict, List, Optional
+
+from sqlalchemy import select
+
+from core.availability import to_local_naive
+from core.config import settings
+from core.database import dispose_engine, get_db_context
+from core.logger import logger
+from core.models import Appointment, Service, User
+from core.outbox import enqueue
+from core.redis_client import close_redis, get_redis
+from core.tenants import get_tenant
+
+REMINDERS_KEY = "washbot:reminders"
+PROCESSING_KEY = "washbot:reminders:processing"
+ATTEMPTS_KEY = "washbot:reminders:attempts"
+
+# За сколько до начала записи напоминать
+OFFSETS: Dict[str, timedelta] = {
+    "day": timedelta(hours=24),
+    "soon": timedelta(hours=2),
+}
+
+BATCH_SIZE = 200
+# Проверка не реже этого интервала: новые записи могут созреть раньше текущей головы
+MAX_SLEEP = 30
+# Снятые, но не подтвержденные дольше этого, считаются брошенными упавшим процессом
+PROCESSING_TIMEOUT = 5 * 60
+# Повтор после ошибки - не раньше чем через RETRY_DELAY * номер попытки
+RETRY_DELAY = 60
+MAX_ATTEMPTS = 5
+
+# Вернуть из KEYS[2] в расписание KEYS[1] на ARGV[1] + RETRY_DELAY * попытка
+# напоминания ARGV[3..]; исчерпавшие ARGV[2] попыток выбрасываются и возвращаются
+_RETRY_LUA = """
+local function retry(members, now, max_attempts, delay)
+    local dropped = {}
+    for _, member in ipairs(members) do
+        if redis.call('ZREM', KEYS[2], member) == 1 then
+            local attempt = redis.call('HINCRBY', KEYS[3], member, 1)
+            if attempt >= max_attempts then
+                redis.call('HDEL', KEYS[3], member)
+                table.insert(dropped, member)
+            else
+                redis.call('ZADD', KEYS[1], now + delay * attempt, member)
+            end
+        end
+    end
+    return dropped
+end
+"""
+
+_RELEASE_SCRIPT = _RETRY_LUA + """
+return retry({unpack(ARGV, 4)}, tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]))
+"""
+
+# Вернуть брошенные (взяты раньше ARGV[3]) и переложить до ARGV[2] созревших
+# к ARGV[1] напоминаний в KEYS[2] с временем взятия
+_POP_DUE_SCRIPT = _RETRY_LUA + """
+local now = tonumber(ARGV[1])
+local stale = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[3])
+local dropped = retry(stale, now, tonumber(ARGV[4]), tonumber(ARGV[5]))
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, member in ipairs(due) do
+    redis.call('ZADD', KEYS[2], ARGV[1], member)
+end
+if #due > 0 then
+    redis.call('ZREM', KEYS[1], unpack(due))
+end
+return {due, dropped}
+"""
+
+
+def _member(appointment_id: int, kind: str) -> str:
+    return f"{appointment_id}:{kind}"
+
+
+def _fire_times(appointment_id: int, appointment_time: datetime) -> Dict[str, float]:
+    start = appointment_time.timestamp()
+    now = time.time()
+    return {
+        _member(appointment_id, kind): start - offset.total_seconds()
+        for kind, offset in OFFSETS.items()
+        if start - offset.total_seconds() > now
+    }
+
+
+async def schedule_reminders(appointment_id: int, appointment_time: datetime):
+    """Поставить напоминания для подтвержденной записи (прошедшие пропускаются)"""
+    mapping = _fire_times(appointment_id, appointment_time)
+    if mapping:
+        await get_redis().zadd(REMINDERS_KEY, mapping)
+
+
+async def cancel_reminders(appointment_id: int):
+    """Убрать напоминания записи (выполнена или отменена)"""
+    await get_redis().zrem(REMINDERS_KEY, *[_member(appointment_id, kind) for kind in OFFSETS])
+
+
+def _decode(members) -> List[str]:
+    return [m.decode() if isinstance(m, bytes) else m for m in members]
+
+
+def _log_dropped(dropped: List[str]):
+    if dropped:
+        logger.error(f"Reminders dropped after {MAX_ATTEMPTS} attempts: {', '.join(dropped)}")
+
+
+async def pop_due(now: Optional[float] = None, limit: int = BATCH_SIZE) -> List[str]:
+    """Атомарно переложить созревшие напоминания в обработку"""
+    now = now or time.time()
+    due, dropped = await get_redis().eval(
+        _POP_DUE_SCRIPT, 3, REMINDERS_KEY, PROCESSING_KEY, ATTEMPTS_KEY,
+        now, limit, now - PROCESSING_TIMEOUT, MAX_ATTEMPTS, RETRY_DELAY
+    )
+    _log_dropped(_decode(dropped))
+    return _decode(due)
+
+
+async def ack(members: List[str]):
+    """Напоминания поставлены в очередь - убрать из обработки"""
+    redis = get_redis()
+    await redis.zrem(PROCESSING_KEY, *members)
+    await redis.hdel(ATTEMPTS_KEY, *members)
+
+
+async def release(members: List[str]):
+    """Отправка не удалась - вернуть еще не подтвержденные напоминания на повтор"""
+    dropped = await get_redis().eval(
+        _RELEASE_SCRIPT, 3, REMINDERS_KEY, PROCESSING_KEY, ATTEMPTS_KEY,
+        time.time(), MAX_ATTEMPTS, RETRY_DELAY, *members
+    )
+    _log_dropped(_decode(dropped))
+
+
+def _day_word(appointment_time: datetime, now: datetime) -> str:
+    days = (appointment_time.date() - now.date()).days
+    if days == 0:
+        return "сегодня"
+    if days == 1:
+        return "завтра"
+    return appointment_time.strftime("%d.%m")
+
+
+def _reminder_text(appointment_time: datetime, now: datetime, service_name: str, tenant) -> str:
+    when = _day_word(appointment_time, now)
+    text = (
+        f"⏰ <b>Напоминание о записи</b>\n\n"
+        f"{when.capitalize()} в {appointment_time.strftime('%H:%M')} - {escape(service_name)}\n"
+    )
+    if tenant is not None:
+        text += f"🏢 {escape(tenant.name)}"
+        if tenant.address:
+            text += f", {escape(tenant.address)}"
+        text += "\n"
+    return text + "\nЕсли планы изменились, предупредите мойку заранее."
+
+
+async def dispatch(members: List[str]) -> int:
+    """Отправить пачку напоминаний одним запросом к БД; вернуть число отправленных.
+
+    Каждое напоминание подтверждается сразу после постановки в очередь: при
+    ошибке на середине пачки повторно отправятся только неотправленные.
+    """
+    wanted: Dict[int, List[str]] = {}
+    for member in members:
+        wanted.setdefault(int(member.split(":", 1)[0]), []).append(member)
+
+    async with get_db_context() as db:
+        result = await db.execute(
+            select(
+                Appointment.id, Appointment.appointment_time, Appointment.car_wash_id,
+                User.telegram_id, Service.name.label("service_name")
+            )
+            .join(User, User.id == Appointment.user_id)
+            .join(Service, Service.id == Appointment.service_id)
+            .where(
+                Appointment.id.in_(wanted),
+                Appointment.status == "confirmed"
+            )
+        )
+        rows = result.all()
+
+    bot_id = int(settings.BOT_CLIENT_TOKEN.split(":", 1)[0])
+    now = datetime.now()
+    sent = 0
+    for row in rows:
+        appointment_time = to_local_naive(row.appointment_time)
+        # Иначе процесс простаивал дольше, чем до начала записи
+        if appointment_time > now:
+            tenant = await get_tenant(row.car_wash_id)
+            # Если созрели оба напоминания сразу, достаточно одного
+            await enqueue(bot_id, row.telegram_id, _reminder_text(appointment_time, now, row.service_name, tenant))
+            sent += 1
+        await ack(wanted.pop(row.id))
+
+    # Отмененные и уже выполненные записи
+    rest = [member for group in wanted.values() for member in group]
+    if rest:
+        await ack(rest)
+    return sent
+
+
+async def run_scheduler():
+    """Фоновая задача клиентского бота: снимает и отправляет созревшие напоминания"""
+    redis = get_redis()
+    while True:
+        members: List[str] = []
+        try:
+            members = await pop_due()
+            if members:
+                sent = await dispatch(members)
+                logger.info(f"Reminders: {sent} sent of {len(members)} due")
+                if len(members) == BATCH_SIZE:
+                    continue
+
+            head = await redis.zrange(REMINDERS_KEY, 0, 0, withscores=True)
+            delay = MAX_SLEEP if not head else min(max(head[0][1] - time.time(), 0.1), MAX_SLEEP)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Reminder scheduler failed: {e}")
+            delay = MAX_SLEEP
+            if members:
+                try:
+                    # Подтвержденные dispatch уже не в обработке и не вернутся
+                    await release(members)
+                except Exception as e:
+                    # Вернутся в расписание по PROCESSING_TIMEOUT
+                    logger.error(f"Reminders release failed: {e}")
+        await asyncio.sleep(delay)
+
+
+async def rebuild() -> int:
+    """Заполнить ZSET по будущим подтвержденным записям (частичный индекс по времени)"""
+    async with get_db_context() as db:
+        result = await db.execute(
+            select(Appointment.id, Appointment.appointment_time).where(
+                Appointment.status == "confirmed",
+                Appointment.appointment_time > datetime.now()
+            )
+        )
+        rows = result.all()
+
+    redis = get_redis()
+    for i in range(0, len(rows), BATCH_SIZE):
+        mapping = {}
+        for row in rows[i:i + BATCH_SIZE]:
+            mapping.update(_fire_times(row.id, to_local_naive(row.appointment_time)))
+        if mapping:
+            await redis.zadd(REMINDERS_KEY, mapping)
+    return len(rows)
+
+
+async def _main():
+    print(f"Scheduled reminders for {await rebuild()} appointments")
+    await dispose_engine()
+    await close_redis()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Напоминания о записях")
+    parser.add_argument("--rebuild", action="store_true", required=True, help="заполнить ZSET из БД")
+    parser.parse_args()
+    asyncio.run(_main())
@@ -0,0 +1,65 @@
+from datetime import datetime
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.models import Appointment
+from core.redis_client import get_redis
+
+HOLD_PREFIX = "washbot:hold"
+
+# Сколько слот держится за клиентом между выбором времени и подтверждением
+HOLD_TTL = 5 * 60
+
+# Имя EXCLUDE-ограничения в core.models.Appointment
+OVERLAP_CONSTRAINT = "ex_appointments_no_overlap"
+
+# Удаляем холд, только если он все еще наш
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class SlotTakenError(Exception):
+    """Выбранное время уже занято другим клиентом"""
+
+
+def _hold_key(car_wash_id: int, start: datetime) -> str:
+    return f"{HOLD_PREFIX}:{car_wash_id}:{start:%Y-%m-%dT%H:%M}"
+
+
+async def place_hold(car_wash_id: int, start: datetime, telegram_id: int) -> bool:
+    """Придержать слот за клиентом; False - слот держит кто-то другой"""
+    redis = get_redis()
+    key = _hold_key(car_wash_id, start)
+
+    if await redis.set(key, telegram_id, nx=True, ex=HOLD_TTL):
+        return True
+
+    # Повторный выбор того же времени тем же клиентом продлевает холд
+    holder = await redis.get(key)
+    if holder is not None and int(holder) == telegram_id:
+        await redis.expire(key, HOLD_TTL)
+        return True
+    return False
+
+
+async def release_hold(car_wash_id: int, start: datetime, telegram_id: int):
+    """Снять холд клиента со слота"""
+    await get_redis().eval(_RELEASE_SCRIPT, 1, _hold_key(car_wash_id, start), str(telegram_id))
+
+
+async def reserve_slot(db: AsyncSession, appointment: Appointment) -> Appointment:
+    """Сохранить запись; пересечение с чужой записью отсекает EXCLUDE-ограничение в БД"""
+    db.add(appointment)
+    try:
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        if OVERLAP_CONSTRAINT in str(e.orig):
+            raise SlotTakenError() from e
+        raise
+    return appointment
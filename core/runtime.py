@@ -0,0 +1,117 @@
+import asyncio
+import time
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from sqlalchemy import text
+
+from core.config import settings
+from core.database import configure_engine, dispose_engine, get_engine
+from core.fsm_storage import TTLRedisStorage, create_fsm_storage, run_sweeper
+from core.logger import logger
+from core.metrics import start_metrics_server
+from core.redemption import run_expiry
+from core.redis_client import close_redis, get_redis
+
+ALEMBIC_INI = Path(__file__).parent.parent / "alembic.ini"
+
+# Отсчет времени старта процесса (модуль импортируется первым делом в main)
+_process_started = time.perf_counter()
+
+_metrics_runner = None
+_sweeper: Optional[asyncio.Task] = None
+_expiry: Optional[asyncio.Task] = None
+
+
+class StartupReport(NamedTuple):
+    """Метрики старта процесса, мс"""
+    role: str
+    pool_size: int
+    startup_ms: float
+    db_connect_ms: float
+    redis_ping_ms: float
+    schema_revision: Optional[str]
+    schema_up_to_date: bool
+
+
+def pool_size_for(role: str) -> int:
+    """Размер пула БД для роли процесса (client, employee, owner, webhook)"""
+    return getattr(settings, f"DB_POOL_SIZE_{role.upper()}", settings.DB_POOL_SIZE)
+
+
+def head_revision() -> Optional[str]:
+    """Последняя ревизия миграций в репозитории"""
+    config = Config(str(ALEMBIC_INI))
+    config.set_main_option("script_location", str(ALEMBIC_INI.parent / "migrations"))
+    return ScriptDirectory.from_config(config).get_current_head()
+
+
+async def bootstrap(role: str) -> StartupReport:
+    """Подготовка процесса: пул БД по роли, проверка БД, Redis и версии схемы.
+
+    Схема здесь не создается и не меняется - это делает python -m core.migrate.
+    /metrics - всегда на отдельном внутреннем порту, не рядом с webhook.
+    """
+    global _metrics_runner, _sweeper, _expiry
+    if settings.METRICS_ENABLED:
+        _metrics_runner = await start_metrics_server()
+
+    pool_size = pool_size_for(role)
+    configure_engine(pool_size=pool_size, max_overflow=settings.DB_MAX_OVERFLOW)
+
+    started = time.perf_counter()
+    async with get_engine().connect() as conn:
+        revision = None
+        if (await conn.execute(text("SELECT to_regclass('alembic_version')"))).scalar():
+            revision = (await conn.execute(text("SELECT version_num FROM alembic_version"))).scalar()
+    db_connect_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    await get_redis().ping()
+    redis_ping_ms = (time.perf_counter() - started) * 1000
+
+    # Подсчет и чистка ключей FSM; проход делает один процесс за интервал
+    _sweeper = asyncio.create_task(run_sweeper())
+    # Выключение истекших абонементов, тоже один процесс за интервал
+    _expiry = asyncio.create_task(run_expiry())
+    
+    head = head_revision()
+    report = StartupReport(
+        role=role,
+        pool_size=pool_size,
+        startup_ms=(time.perf_counter() - _process_started) * 1000,
+        db_connect_ms=db_connect_ms,
+        redis_ping_ms=redis_ping_ms,
+        schema_revision=revision,
+        schema_up_to_date=revision == head
+    )
+
+    logger.info(
+        f"Startup [{role}]: {report.startup_ms:.0f} ms total, "
+        f"db {report.db_connect_ms:.1f} ms, redis {report.redis_ping_ms:.1f} ms, "
+        f"pool {pool_size}+{settings.DB_MAX_OVERFLOW}, schema {revision}"
+    )
+    if not report.schema_up_to_date:
+        logger.warning(f"Schema revision {revision} != {head}, run: python -m core.migrate")
+    return report
+
+
+def create_storage() -> TTLRedisStorage:
+    """FSM-хранилище на общем пуле Redis; bot_id в ключах разделяет ботов"""
+    return create_fsm_storage()
+
+
+async def shutdown():
+    """Закрыть пулы БД и Redis"""
+    global _metrics_runner, _sweeper, _expiry
+    for task in (_sweeper, _expiry):
+        if task is not None:
+            task.cancel()
+    _sweeper = _expiry = None
+    if _metrics_runner is not None:
+        await _metrics_runner.cleanup()
+        _metrics_runner = None
+    await dispose_engine()
+    await close_redis()
@@ -0,0 +1,92 @@
+import json
+from datetime import date
+from typing import Dict, List
+
+from core.availability import drop_past_slots, get_free_slots
+from core.database import get_db_context
+from core.logger import logger
+from core.redis_client import get_redis
+
+# Один hash на мойку и день: поле - длительность услуги, значение - свободные слоты
+KEY_PREFIX = "washbot:slots"
+
+# Страховочный TTL на случай пропущенной инвалидации
+CACHE_TTL = 15 * 60
+
+# Счетчики попаданий в кэш текущего процесса; stale_fills - заполнения,
+# отброшенные из-за инвалидации во время чтения из БД
+stats: Dict[str, int] = {"hits": 0, "misses": 0, "invalidations": 0, "stale_fills": 0}
+
+# Записать слоты, только если версия дня не изменилась с начала чтения из БД
+_FILL_SCRIPT = """
+if (redis.call('GET', KEYS[2]) or '') ~= ARGV[1] then
+    return 0
+end
+redis.call('HSET', KEYS[1], ARGV[2], ARGV[3])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return 1
+"""
+
+
+def _day_key(car_wash_id: int, day: date) -> str:
+    return f"{KEY_PREFIX}:{car_wash_id}:{day.isoformat()}"
+
+
+def _version_key(car_wash_id: int, day: date) -> str:
+    return f"{_day_key(car_wash_id, day)}:version"
+
+
+async def get_day_slots(
+    car_wash_id: int,
+    service_id: int,
+    duration: int,
+    day: date
+) -> List[str]:
+    """Свободные слоты на день: сначала из Redis, при промахе - из БД"""
+    redis = get_redis()
+    key = _day_key(car_wash_id, day)
+    version_key = _version_key(car_wash_id, day)
+
+    # Версию дня читаем до БД: инвалидация после этого не даст записать старое
+    pipe = redis.pipeline(transaction=False)
+    pipe.hget(key, str(duration))
+    pipe.get(version_key)
+    cached, version = await pipe.execute()
+    if cached is not None:
+        stats["hits"] += 1
+        return drop_past_slots(json.loads(cached), day)
+
+    stats["misses"] += 1
+    async with get_db_context() as db:
+        slots = await get_free_slots(db, car_wash_id, service_id, day)
+
+    if isinstance(version, bytes):
+        version = version.decode()
+    filled = await redis.eval(
+        _FILL_SCRIPT, 2, key, version_key, version or "", str(duration), json.dumps(slots), CACHE_TTL
+    )
+    if not filled:
+        stats["stale_fills"] += 1
+
+    return drop_past_slots(slots, day)
+
+
+async def invalidate_day(car_wash_id: int, day: date):
+    """Сбросить кэш слотов мойки на день (после любой записи в appointments)"""
+    stats["invalidations"] += 1
+    try:
+        pipe = get_redis().pipeline(transaction=True)
+        pipe.delete(_day_key(car_wash_id, day))
+        pipe.incr(_version_key(car_wash_id, day))
+        # Версия должна пережить чтение из БД, а не сам кэш
+        pipe.expire(_version_key(car_wash_id, day), CACHE_TTL)
+        await pipe.execute()
+    except Exception as e:
+        # Кэш доживет до TTL, запись в БД уже сделана
+        logger.error(f"Slot cache invalidation failed: {e}")
+
+
+def hit_ratio() -> float:
+    """Доля попаданий в кэш"""
+    total = stats["hits"] + stats["misses"]
+    return stats["hits"] / total if total else 0.0
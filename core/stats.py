@@ -0,0 +1,121 @@
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import NamedTuple, Optional
+
+from sqlalchemy import Date, case, cast, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.models import Appointment, DailyStats, Service, Transaction, User
+
+
+class Dashboard(NamedTuple):
+    revenue_today: Decimal
+    revenue_week: Decimal
+    revenue_month: Decimal
+    appointments_today: int
+    clients_count: int
+    pending_payments: int
+
+
+async def record_completion(db: AsyncSession, car_wash_id: int, day: date, amount: Decimal):
+    """Учесть выполненную запись в дневной сводке (в транзакции вызывающего)"""
+    stmt = insert(DailyStats).values(
+        car_wash_id=car_wash_id, day=day, revenue=amount, visits=1
+    )
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[DailyStats.car_wash_id, DailyStats.day],
+            set_={
+                "revenue": DailyStats.revenue + stmt.excluded.revenue,
+                "visits": DailyStats.visits + 1
+            }
+        )
+    )
+
+
+async def rebuild_daily_stats(db: AsyncSession, car_wash_id: Optional[int] = None):
+    """Пересчитать сводку из appointments (первичное заполнение и сверка)"""
+    day = cast(Appointment.completed_at, Date)
+    source = (
+        select(
+            Appointment.car_wash_id,
+            day.label("day"),
+            # Мойки по абонементу оплачены покупкой - как в record_completion
+            func.sum(case((Appointment.payment_method == "subscription", 0), else_=Service.price)),
+            func.count()
+        )
+        .join(Service, Service.id == Appointment.service_id)
+        .where(
+            Appointment.status == "completed",
+            Appointment.completed_at.isnot(None)
+        )
+        .group_by(Appointment.car_wash_id, day)
+    )
+    if car_wash_id is not None:
+        source = source.where(Appointment.car_wash_id == car_wash_id)
+
+    stmt = insert(DailyStats).from_select(
+        ["car_wash_id", "day", "revenue", "visits"], source
+    )
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[DailyStats.car_wash_id, DailyStats.day],
+            set_={"revenue": stmt.excluded.revenue, "visits": stmt.excluded.visits}
+        )
+    )
+
+
+async def get_dashboard(db: AsyncSession, owner_telegram_id: int, today: Optional[date] = None) -> Dashboard:
+    """Все показатели дашборда одним запросом"""
+    today = today or date.today()
+    week_ago = today - timedelta(days=7)
+    month_ago = today - timedelta(days=30)
+    today_start = datetime.combine(today, datetime.min.time())
+    tomorrow_start = today_start + timedelta(days=1)
+
+    car_wash_id = (
+        select(User.car_wash_id)
+        .where(User.telegram_id == owner_telegram_id)
+        .scalar_subquery()
+    )
+
+    def revenue_since(since: date):
+        return func.coalesce(func.sum(DailyStats.revenue).filter(DailyStats.day >= since), 0)
+
+    appointments_today = (
+        select(func.count())
+        .select_from(Appointment)
+        .where(
+            Appointment.car_wash_id == car_wash_id,
+            Appointment.appointment_time >= today_start,
+            Appointment.appointment_time < tomorrow_start
+        )
+        .scalar_subquery()
+    )
+    clients_count = (
+        select(func.count())
+        .select_from(User)
+        .where(User.car_wash_id == car_wash_id, User.role == "client")
+        .scalar_subquery()
+    )
+    pending_payments = (
+        select(func.count())
+        .select_from(Transaction)
+        .where(Transaction.car_wash_id == car_wash_id, Transaction.status == "pending")
+        .scalar_subquery()
+    )
+
+    result = await db.execute(
+        select(
+            revenue_since(today),
+            revenue_since(week_ago),
+            revenue_since(month_ago),
+            appointments_today,
+            clients_count,
+            pending_payments
+        )
+        .select_from(DailyStats)
+        .where(DailyStats.car_wash_id == car_wash_id, DailyStats.day >= month_ago)
+    )
+    return Dashboard(*result.one())
@@ -0,0 +1,131 @@
+import asyncio
+import re
+import time
+from typing import Dict, NamedTuple, Optional
+
+from sqlalchemy import select
+
+from core.database import get_db_context
+from core.logger import logger
+from core.models import CarWash
+from core.redis_client import get_redis
+
+INVALIDATE_CHANNEL = "washbot:tenants:invalidate"
+
+# Справочник моек целиком в памяти процесса: сотни строк
+DIRECTORY_TTL = 5 * 60
+
+# Неизвестный id из ссылки перезагружает справочник не чаще этого интервала
+MISS_RELOAD_INTERVAL = 10
+
+# Deep link клиентского бота: https://t.me/<bot>?start=wash_42
+PAYLOAD_PREFIX = "wash_"
+_PAYLOAD_RE = re.compile(rf"^{PAYLOAD_PREFIX}(\d+)$")
+
+
+class Tenant(NamedTuple):
+    """Настройки мойки, нужные обработчикам"""
+    id: int
+    name: str
+    address: Optional[str]
+    phone: Optional[str]
+    working_hours: Dict[str, str]
+    slot_duration: int
+
+
+_directory: Dict[int, Tenant] = {}
+_expires_at = 0.0
+_last_miss_reload = 0.0
+_lock = asyncio.Lock()
+
+
+def parse_payload(payload: Optional[str]) -> Optional[int]:
+    """id мойки из аргумента /start"""
+    if not payload:
+        return None
+    match = _PAYLOAD_RE.match(payload.strip())
+    return int(match.group(1)) if match else None
+
+
+def start_payload(car_wash_id: int) -> str:
+    return f"{PAYLOAD_PREFIX}{car_wash_id}"
+
+
+async def _reload():
+    global _directory, _expires_at
+    async with get_db_context() as db:
+        result = await db.execute(
+            select(
+                CarWash.id, CarWash.name, CarWash.address, CarWash.phone,
+                CarWash.working_hours, CarWash.slot_duration
+            )
+        )
+        _directory = {
+            row.id: Tenant(row.id, row.name, row.address, row.phone, row.working_hours or {}, row.slot_duration or 60)
+            for row in result
+        }
+    _expires_at = time.monotonic() + DIRECTORY_TTL
+
+
+async def get_directory() -> Dict[int, Tenant]:
+    """Все мойки; из БД только при истечении TTL или после инвалидации"""
+    if _expires_at <= time.monotonic():
+        async with _lock:
+            if _expires_at <= time.monotonic():
+                await _reload()
+    return _directory
+
+
+async def get_tenant(car_wash_id: Optional[int]) -> Optional[Tenant]:
+    global _last_miss_reload
+    if car_wash_id is None:
+        return None
+    directory = await get_directory()
+    tenant = directory.get(car_wash_id)
+    if tenant is None and time.monotonic() - _last_miss_reload > MISS_RELOAD_INTERVAL:
+        # Мойка могла появиться после загрузки справочника
+        _last_miss_reload = time.monotonic()
+        async with _lock:
+            await _reload()
+        tenant = _directory.get(car_wash_id)
+    return tenant
+
+
+async def resolve_tenant(payload: Optional[str]) -> Optional[Tenant]:
+    """Мойка для /start: из deep link, а если мойка одна - она"""
+    tenant = await get_tenant(parse_payload(payload))
+    if tenant is not None:
+        return tenant
+    directory = await get_directory()
+    if len(directory) == 1:
+        return next(iter(directory.values()))
+    return None
+
+
+async def invalidate_tenants():
+    """Сбросить справочник во всех процессах.
+
+    Вызывать после каждого изменения carwashes (название, адрес, телефон,
+    график, шаг сетки) и добавления мойки.
+    """
+    global _expires_at
+    _expires_at = 0.0
+    await get_redis().publish(INVALIDATE_CHANNEL, "1")
+
+
+async def listen_invalidations():
+    """Фоновая задача: сбрасывает справочник по сообщениям других процессов"""
+    global _expires_at
+    pubsub = get_redis().pubsub()
+    await pubsub.subscribe(INVALIDATE_CHANNEL)
+    try:
+        async for message in pubsub.listen():
+            if message["type"] == "message":
+                _expires_at = 0.0
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        # Без слушателя устаревание ограничено DIRECTORY_TTL
+        logger.error(f"Tenant invalidation listener stopped: {e}")
+    finally:
+        await pubsub.aclose()
@@ -0,0 +1,65 @@
+import asyncio
+from typing import List, NamedTuple
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from core.config import settings
+from core.logger import logger
+
+
+class BotApp(NamedTuple):
+    """Бот, обслуживаемый webhook-сервером по своему пути"""
+    path: str
+    bot: Bot
+    dispatcher: Dispatcher
+
+
+async def healthcheck(request: web.Request) -> web.Response:
+    return web.Response(text="ok")
+
+
+def build_app(bots: List[BotApp]) -> web.Application:
+    """aiohttp-приложение: каждый бот на своем пути, общий процесс, БД и Redis"""
+    app = web.Application()
+
+    for item in bots:
+        # handle_in_background: Telegram получает ответ сразу,
+        # апдейты обрабатываются конкурентно в отдельных задачах
+        SimpleRequestHandler(
+            dispatcher=item.dispatcher,
+            bot=item.bot,
+            handle_in_background=True,
+            secret_token=settings.WEBHOOK_SECRET
+        ).register(app, path=item.path)
+        setup_application(app, item.dispatcher, bot=item.bot)
+
+    async def on_startup(app: web.Application):
+        for item in bots:
+            url = f"{settings.WEBHOOK_URL}{item.path}"
+            await item.bot.set_webhook(
+                url,
+                secret_token=settings.WEBHOOK_SECRET,
+                allowed_updates=item.dispatcher.resolve_used_update_types()
+            )
+            logger.info(f"Webhook set to {url}")
+
+    app.on_startup.append(on_startup)
+    app.router.add_get("/healthz", healthcheck)
+    # /metrics сюда не добавляем: порт webhook открыт наружу (см. core.runtime)
+    return app
+
+
+async def run_webhook(bots: List[BotApp]):
+    """Запустить webhook-сервер и работать до отмены"""
+    runner = web.AppRunner(build_app(bots))
+    await runner.setup()
+    site = web.TCPSite(runner, host=settings.WEBHOOK_HOST, port=settings.WEBHOOK_PORT)
+    await site.start()
+    logger.info(f"Webhook server listening on {settings.WEBHOOK_HOST}:{settings.WEBHOOK_PORT}")
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
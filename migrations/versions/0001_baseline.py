@@ -0,0 +1,129 @@
+"""baseline schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 12:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Базы, созданные раньше через init_db(), уже содержат эти таблицы
+    if not context.is_offline_mode() and sa.inspect(op.get_bind()).has_table("carwashes"):
+        return
+
+    op.create_table(
+        "carwashes",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(length=255), nullable=False),
+        sa.Column("address", sa.Text(), nullable=True),
+        sa.Column("phone", sa.String(length=20), nullable=True),
+        sa.Column("working_hours", sa.JSON(), nullable=True),
+        sa.Column("slot_duration", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=True),
+        sa.PrimaryKeyConstraint("id", name="pk_carwashes"),
+    )
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("telegram_id", sa.BigInteger(), nullable=False),
+        sa.Column("car_wash_id", sa.Integer(), nullable=True),
+        sa.Column("role", sa.String(length=50), nullable=False),
+        sa.Column("full_name", sa.String(length=255), nullable=True),
+        sa.Column("username", sa.String(length=255), nullable=True),
+        sa.Column("phone", sa.String(length=20), nullable=True),
+        sa.Column("balance", sa.Numeric(10, 2), nullable=True),
+        sa.Column("is_blocked", sa.Boolean(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=True),
+        sa.ForeignKeyConstraint(["car_wash_id"], ["carwashes.id"], name="fk_users_car_wash_id_carwashes"),
+        sa.PrimaryKeyConstraint("id", name="pk_users"),
+        sa.UniqueConstraint("telegram_id", name="uq_users_telegram_id"),
+    )
+    op.create_index("ix_users_telegram_id", "users", ["telegram_id"])
+    op.create_index("ix_users_role", "users", ["role"])
+    op.create_table(
+        "services",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("car_wash_id", sa.Integer(), nullable=True),
+        sa.Column("name", sa.String(length=255), nullable=False),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("price", sa.Numeric(10, 2), nullable=False),
+        sa.Column("duration", sa.Integer(), nullable=False),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.ForeignKeyConstraint(["car_wash_id"], ["carwashes.id"], name="fk_services_car_wash_id_carwashes"),
+        sa.PrimaryKeyConstraint("id", name="pk_services"),
+    )
+    op.create_table(
+        "appointments",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("service_id", sa.Integer(), nullable=True),
+        sa.Column("car_wash_id", sa.Integer(), nullable=True),
+        sa.Column("appointment_time", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("end_time", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("status", sa.String(length=50), nullable=False),
+        sa.Column("payment_method", sa.String(length=50), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=True),
+        sa.Column("completed_at", sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(["car_wash_id"], ["carwashes.id"], name="fk_appointments_car_wash_id_carwashes"),
+        sa.ForeignKeyConstraint(["service_id"], ["services.id"], name="fk_appointments_service_id_services"),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], name="fk_appointments_user_id_users"),
+        sa.PrimaryKeyConstraint("id", name="pk_appointments"),
+    )
+    op.create_index("ix_appointments_time", "appointments", ["appointment_time"])
+    op.create_index("ix_appointments_status", "appointments", ["status"])
+    op.create_table(
+        "subscriptions",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("car_wash_id", sa.Integer(), nullable=True),
+        sa.Column("name", sa.String(length=255), nullable=False),
+        sa.Column("total_washes", sa.Integer(), nullable=False),
+        sa.Column("remaining_washes", sa.Integer(), nullable=False),
+        sa.Column("purchase_price", sa.Numeric(10, 2), nullable=False),
+        sa.Column("valid_until", sa.Date(), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=True),
+        sa.ForeignKeyConstraint(["car_wash_id"], ["carwashes.id"], name="fk_subscriptions_car_wash_id_carwashes"),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], name="fk_subscriptions_user_id_users"),
+        sa.PrimaryKeyConstraint("id", name="pk_subscriptions"),
+    )
+    op.create_table(
+        "transactions",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("car_wash_id", sa.Integer(), nullable=True),
+        sa.Column("amount", sa.Numeric(10, 2), nullable=False),
+        sa.Column("type", sa.String(length=50), nullable=False),
+        sa.Column("status", sa.String(length=50), nullable=False),
+        sa.Column("payment_method", sa.String(length=50), nullable=True),
+        sa.Column("admin_id", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=True),
+        sa.Column("approved_at", sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(["admin_id"], ["users.id"], name="fk_transactions_admin_id_users"),
+        sa.ForeignKeyConstraint(["car_wash_id"], ["carwashes.id"], name="fk_transactions_car_wash_id_carwashes"),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], name="fk_transactions_user_id_users"),
+        sa.PrimaryKeyConstraint("id", name="pk_transactions"),
+    )
+    op.create_index("ix_transactions_status", "transactions", ["status"])
+    op.create_index("ix_transactions_created", "transactions", ["created_at"])
+
+
+def downgrade() -> None:
+    op.drop_table("transactions")
+    op.drop_table("subscriptions")
+    op.drop_table("appointments")
+    op.drop_table("services")
+    op.drop_table("users")
+    op.drop_table("carwashes")
@@ -0,0 +1,35 @@
+"""exclusion constraint against overlapping appointments
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 12:10:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+
+    # Уже существующие пересечения нужно разрешить вручную до миграции
+    op.execute(
+        "DO $$ BEGIN "
+        "IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'ex_appointments_no_overlap') THEN "
+        "ALTER TABLE appointments ADD CONSTRAINT ex_appointments_no_overlap "
+        "EXCLUDE USING gist (car_wash_id WITH =, tstzrange(appointment_time, end_time) WITH &&) "
+        "WHERE (status IN ('confirmed', 'pending')); "
+        "END IF; END $$"
+    )
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE appointments DROP CONSTRAINT IF EXISTS ex_appointments_no_overlap")
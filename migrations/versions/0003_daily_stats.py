@@ -0,0 +1,46 @@
+"""daily revenue/visits rollup
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 12:20:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if context.is_offline_mode() or not sa.inspect(op.get_bind()).has_table("daily_stats"):
+        op.create_table(
+            "daily_stats",
+            sa.Column("car_wash_id", sa.Integer(), nullable=False),
+            sa.Column("day", sa.Date(), nullable=False),
+            sa.Column("revenue", sa.Numeric(12, 2), nullable=False),
+            sa.Column("visits", sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(["car_wash_id"], ["carwashes.id"], name="fk_daily_stats_car_wash_id_carwashes"),
+            sa.PrimaryKeyConstraint("car_wash_id", "day", name="pk_daily_stats"),
+        )
+
+    # Заполняем сводку по уже выполненным записям (то же, что core.stats.rebuild_daily_stats)
+    op.execute(
+        "INSERT INTO daily_stats (car_wash_id, day, revenue, visits) "
+        "SELECT a.car_wash_id, CAST(a.completed_at AS DATE), sum(s.price), count(*) "
+        "FROM appointments a JOIN services s ON s.id = a.service_id "
+        "WHERE a.status = 'completed' AND a.completed_at IS NOT NULL "
+        "GROUP BY a.car_wash_id, CAST(a.completed_at AS DATE) "
+        "ON CONFLICT (car_wash_id, day) DO UPDATE "
+        "SET revenue = excluded.revenue, visits = excluded.visits"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("daily_stats")
@@ -0,0 +1,59 @@
+"""composite and partial indexes for handler queries
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 12:30:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+NEW_INDEXES = {
+    "ix_appointments_wash_time_active":
+        "ON appointments (car_wash_id, appointment_time) "
+        "WHERE status IN ('confirmed', 'pending')",
+    "ix_appointments_wash_status_completed":
+        "ON appointments (car_wash_id, status, completed_at)",
+    "ix_appointments_user_time":
+        "ON appointments (user_id, appointment_time DESC)",
+    "ix_appointments_service_id":
+        "ON appointments (service_id)",
+    "ix_transactions_pending":
+        "ON transactions (car_wash_id, created_at) WHERE status = 'pending'",
+    "ix_users_wash_role_created":
+        "ON users (car_wash_id, role, created_at)",
+    "ix_subscriptions_user_active":
+        "ON subscriptions (user_id) WHERE is_active",
+}
+
+# Дубль уникального ограничения и индексы, которые перекрыты новыми
+OBSOLETE_INDEXES = {
+    "ix_users_telegram_id": "ON users (telegram_id)",
+    "ix_appointments_status": "ON appointments (status)",
+    "ix_transactions_status": "ON transactions (status)",
+}
+
+
+def upgrade() -> None:
+    # CONCURRENTLY не блокирует запись, но не работает внутри транзакции
+    with op.get_context().autocommit_block():
+        for name, definition in NEW_INDEXES.items():
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} {definition}")
+        for name in OBSOLETE_INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, definition in OBSOLETE_INDEXES.items():
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} {definition}")
+        for name in NEW_INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
@@ -0,0 +1,53 @@
+"""keyset and trigram indexes for the owner client browser
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 16:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+NEW_INDEXES = {
+    # id в конце - листание по (created_at, id) без сортировки
+    "ix_users_wash_role_created_id":
+        "ON users (car_wash_id, role, created_at, id)",
+    "ix_users_full_name_trgm":
+        "ON users USING gin (full_name gin_trgm_ops)",
+    "ix_users_username_trgm":
+        "ON users USING gin (username gin_trgm_ops)",
+    "ix_users_phone_trgm":
+        "ON users USING gin (phone gin_trgm_ops)",
+}
+
+# Перекрыт новым индексом с id
+OBSOLETE_INDEXES = {
+    "ix_users_wash_role_created": "ON users (car_wash_id, role, created_at)",
+}
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # CONCURRENTLY не блокирует запись, но не работает внутри транзакции
+    with op.get_context().autocommit_block():
+        for name, definition in NEW_INDEXES.items():
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} {definition}")
+        for name in OBSOLETE_INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+def downgrade() -> None:
+    # Расширение оставляем: его могут использовать и другие объекты
+    with op.get_context().autocommit_block():
+        for name, definition in OBSOLETE_INDEXES.items():
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} {definition}")
+        for name in NEW_INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
@@ -0,0 +1,29 @@
+"""subscription plan and idempotency key on transactions
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 17:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Nullable без default - меняется только каталог, таблица не переписывается
+    op.add_column("transactions", sa.Column("plan_id", sa.Integer(), nullable=True))
+    op.add_column("transactions", sa.Column("decision_key", sa.String(16), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("transactions", "decision_key")
+    op.drop_column("transactions", "plan_id")
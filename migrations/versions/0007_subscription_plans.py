@@ -0,0 +1,71 @@
+"""per-wash subscription plan catalog
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 18:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Бывшие SUBSCRIPTION_TEMPLATES из кода - стартовый каталог каждой мойки
+DEFAULT_PLANS = [
+    ("🌱 Эконом", 5, 2000, 30),
+    ("🌿 Стандарт", 10, 3500, 45),
+    ("🌳 Премиум", 20, 6000, 60),
+]
+
+
+def upgrade() -> None:
+    op.create_table(
+        "subscription_plans",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("car_wash_id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(255), nullable=False),
+        sa.Column("washes", sa.Integer(), nullable=False),
+        sa.Column("price", sa.Numeric(10, 2), nullable=False),
+        sa.Column("days", sa.Integer(), nullable=False),
+        sa.Column("is_active", sa.Boolean(), nullable=False, server_default=sa.true()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.ForeignKeyConstraint(["car_wash_id"], ["carwashes.id"], name="fk_subscription_plans_car_wash_id_carwashes"),
+        sa.PrimaryKeyConstraint("id", name="pk_subscription_plans"),
+    )
+    op.create_index("ix_subscription_plans_car_wash_id", "subscription_plans", ["car_wash_id"])
+
+    plans = ", ".join(
+        f"('{name}', {washes}, {price}, {days})" for name, washes, price, days in DEFAULT_PLANS
+    )
+    op.execute(
+        "INSERT INTO subscription_plans (car_wash_id, name, washes, price, days) "
+        f"SELECT c.id, p.name, p.washes, p.price, p.days FROM carwashes c "
+        f"CROSS JOIN (VALUES {plans}) AS p (name, washes, price, days) "
+        "ORDER BY c.id, p.price"
+    )
+
+    # plan_id ссылался на id шаблона из кода; цены шаблонов различались - сопоставляем по цене
+    op.execute("UPDATE transactions SET plan_id = NULL WHERE plan_id IS NOT NULL")
+    op.execute(
+        "UPDATE transactions t SET plan_id = p.id FROM subscription_plans p "
+        "WHERE t.type = 'subscription_purchase' AND t.status = 'pending' "
+        "AND p.car_wash_id = t.car_wash_id AND p.price = t.amount"
+    )
+    op.create_foreign_key(
+        "fk_transactions_plan_id_subscription_plans",
+        "transactions", "subscription_plans", ["plan_id"], ["id"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint("fk_transactions_plan_id_subscription_plans", "transactions", type_="foreignkey")
+    op.execute("UPDATE transactions SET plan_id = NULL")
+    op.drop_index("ix_subscription_plans_car_wash_id", table_name="subscription_plans")
+    op.drop_table("subscription_plans")
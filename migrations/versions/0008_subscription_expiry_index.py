@@ -0,0 +1,35 @@
+"""partial index for subscription expiry and one-off cleanup
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 19:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008"
+down_revision: Union[str, None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Накопившиеся истекшие абонементы - тем же UPDATE, что core.redemption.expire_subscriptions
+    op.execute(
+        "UPDATE subscriptions SET is_active = false "
+        "WHERE is_active AND (valid_until < CURRENT_DATE OR remaining_washes <= 0)"
+    )
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_subscriptions_active_valid_until "
+            "ON subscriptions (valid_until) WHERE is_active"
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_subscriptions_active_valid_until")
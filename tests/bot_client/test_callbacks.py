@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+from aiogram.types import CallbackQuery, User
+
+from bot_client.callbacks import (
+    Booking, CONFIRM, DATE, SERVICE, SIGNATURE_LENGTH, TIME, BACK_TO_DATES
+)
+
+
+def _booking(**changes) -> Booking:
+    values = dict(step=TIME, wash=12, service=345, duration=60, day=739907, minute=630)
+    values.update(changes)
+    return Booking(**values)
+
+
+def _callback(data: str) -> CallbackQuery:
+    return CallbackQuery(
+        id="1",
+        from_user=User(id=42, is_bot=False, first_name="Test"),
+        chat_instance="test",
+        data=data
+    )
+
+
+def test_pack_unpack_round_trip():
+    booking = _booking()
+    unpacked = Booking.unpack(booking.pack())
+    assert unpacked.model_dump(exclude={"sig"}) == booking.model_dump(exclude={"sig"})
+    assert len(unpacked.sig) == SIGNATURE_LENGTH
+
+
+def test_optional_fields_round_trip():
+    booking = Booking(step=SERVICE, wash=1)
+    unpacked = Booking.unpack(booking.pack())
+    assert unpacked.service is None and unpacked.day is None and unpacked.minute is None
+
+
+def test_packed_button_fits_telegram_limit():
+    booking = _booking(wash=2 ** 31 - 1, service=2 ** 31 - 1, duration=1440, minute=1439)
+    assert len(booking.pack().encode()) <= 64
+
+
+@pytest.mark.parametrize("field, value", [
+    ("wash", 13), ("service", 346), ("duration", 15), ("day", 739908), ("minute", 631)
+])
+def test_tampered_field_is_rejected(field, value):
+    packed = _booking().pack()
+    body, sig = packed.rsplit(":", 1)
+    forged = _booking(**{field: value})
+    forged_body = forged.pack().rsplit(":", 1)[0]
+    assert forged_body != body
+    with pytest.raises(ValueError):
+        Booking.unpack(f"{forged_body}:{sig}")
+
+
+def test_tampered_signature_is_rejected():
+    packed = _booking().pack()
+    body, sig = packed.rsplit(":", 1)
+    flipped = ("A" if sig[0] != "A" else "B") + sig[1:]
+    with pytest.raises(ValueError):
+        Booking.unpack(f"{body}:{flipped}")
+
+
+def test_missing_signature_is_rejected():
+    body = _booking().pack().rsplit(":", 1)[0]
+    with pytest.raises(ValueError):
+        Booking.unpack(f"{body}:")
+
+
+def test_step_change_is_signed():
+    booking = _booking()
+    confirm = booking.pack().replace(f"b:{TIME}:", f"b:{CONFIRM}:", 1)
+    with pytest.raises(ValueError):
+        Booking.unpack(confirm)
+
+
+def test_to_keeps_context_and_resigns():
+    booking = _booking(step=DATE, minute=None)
+    back = Booking.unpack(booking.to(BACK_TO_DATES, day=None).pack())
+    assert back.step == BACK_TO_DATES
+    assert (back.wash, back.service, back.duration, back.day) == (12, 345, 60, None)
+
+
+def test_filter_accepts_signed_and_drops_forged():
+    booking_filter = Booking.filter()
+    packed = _booking().pack()
+    body, sig = packed.rsplit(":", 1)
+    forged = f"{_booking(wash=13).pack().rsplit(':', 1)[0]}:{sig}"
+
+    accepted = asyncio.run(booking_filter(_callback(packed)))
+    assert accepted["callback_data"].wash == 12
+    assert asyncio.run(booking_filter(_callback(forged))) is False
@@ -0,0 +1,10 @@
+"""Общие настройки тестов.
+
+Настройки бота читаются при импорте core.config, поэтому тестовые токены
+выставляются до импорта модулей проекта.
+"""
+import os
+
+os.environ.setdefault("BOT_CLIENT_TOKEN", "1001:test-client")
+os.environ.setdefault("BOT_EMPLOYEE_TOKEN", "1002:test-employee")
+os.environ.setdefault("BOT_OWNER_TOKEN", "1003:test-owner")
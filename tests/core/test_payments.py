@@ -0,0 +1,132 @@
+"""Идемпотентность решений по платежам.
+
+Нужен одноразовый Postgres (FOR UPDATE SKIP LOCKED, RETURNING, расширения
+моделей): TEST_DATABASE_URL=postgresql+asyncpg://... Схема создается и
+удаляется в каждом тесте. Без переменной тесты пропускаются.
+"""
+import asyncio
+import os
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from core.database import Base
+from core.models import CarWash, Transaction, User
+from core.payments import approve_payments, new_decision_key, reject_payments
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(
+    not TEST_DATABASE_URL, reason="TEST_DATABASE_URL не задан (нужен одноразовый Postgres)"
+)
+
+AMOUNT = Decimal("500.00")
+
+
+def run(scenario):
+    """Выполнить сценарий на чистой схеме: scenario(session_factory, seed)"""
+
+    async def main():
+        engine = create_async_engine(TEST_DATABASE_URL, poolclass=NullPool)
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(text("CREATE EXTENSION IF NOT EXISTS btree_gist"))
+                await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+                await conn.run_sync(Base.metadata.drop_all)
+                await conn.run_sync(Base.metadata.create_all)
+            factory = async_sessionmaker(engine, expire_on_commit=False)
+            async with factory() as db:
+                seed = await _seed(db)
+            await scenario(factory, seed)
+        finally:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.drop_all)
+            await engine.dispose()
+
+    asyncio.run(main())
+
+
+async def _seed(db) -> dict:
+    wash, other_wash = CarWash(name="Мойка"), CarWash(name="Соседняя мойка")
+    db.add_all([wash, other_wash])
+    await db.flush()
+    client = User(telegram_id=101, car_wash_id=wash.id, role="client", balance=0)
+    admin = User(telegram_id=102, car_wash_id=wash.id, role="admin")
+    db.add_all([client, admin])
+    await db.flush()
+    txn = Transaction(
+        user_id=client.id, car_wash_id=wash.id, amount=AMOUNT,
+        type="replenishment", status="pending"
+    )
+    db.add(txn)
+    await db.commit()
+    return {
+        "wash": wash.id, "other_wash": other_wash.id,
+        "client": client.id, "admin": admin.id, "txn": txn.id
+    }
+
+
+async def _state(factory, seed):
+    async with factory() as db:
+        balance = await db.scalar(select(User.balance).where(User.id == seed["client"]))
+        status = await db.scalar(select(Transaction.status).where(Transaction.id == seed["txn"]))
+    return balance, status
+
+
+def test_repeated_approve_with_same_key_is_replayed():
+    async def scenario(factory, seed):
+        key = new_decision_key()
+        async with factory() as db:
+            first = await approve_payments(db, [seed["txn"]], seed["wash"], seed["admin"], key)
+        async with factory() as db:
+            second = await approve_payments(db, [seed["txn"]], seed["wash"], seed["admin"], key)
+
+        assert [p.id for p in first.processed] == [seed["txn"]]
+        assert (second.processed, second.replayed, second.skipped) == ([], [seed["txn"]], [])
+        assert await _state(factory, seed) == (AMOUNT, "approved")
+
+    run(scenario)
+
+
+def test_approve_with_other_key_is_skipped():
+    async def scenario(factory, seed):
+        async with factory() as db:
+            await approve_payments(db, [seed["txn"]], seed["wash"], seed["admin"], new_decision_key())
+        async with factory() as db:
+            other = await approve_payments(db, [seed["txn"]], seed["wash"], seed["admin"], new_decision_key())
+
+        assert (other.processed, other.replayed, other.skipped) == ([], [], [seed["txn"]])
+        assert await _state(factory, seed) == (AMOUNT, "approved")
+
+    run(scenario)
+
+
+def test_reject_with_approve_key_is_skipped():
+    async def scenario(factory, seed):
+        key = new_decision_key()
+        async with factory() as db:
+            await approve_payments(db, [seed["txn"]], seed["wash"], seed["admin"], key)
+        async with factory() as db:
+            rejected = await reject_payments(db, [seed["txn"]], seed["wash"], seed["admin"], key)
+
+        # Тот же ключ, но другой итог - это не повтор
+        assert (rejected.processed, rejected.replayed, rejected.skipped) == ([], [], [seed["txn"]])
+        assert await _state(factory, seed) == (AMOUNT, "approved")
+
+    run(scenario)
+
+
+def test_other_wash_payment_is_skipped():
+    async def scenario(factory, seed):
+        async with factory() as db:
+            decision = await approve_payments(
+                db, [seed["txn"]], seed["other_wash"], seed["admin"], new_decision_key()
+            )
+
+        assert (decision.processed, decision.replayed, decision.skipped) == ([], [], [seed["txn"]])
+        assert await _state(factory, seed) == (Decimal("0.00"), "pending")
+
+    run(scenario)
@@ -0,0 +1,38 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from core.logger import setup_logger
+from core.runtime import bootstrap, create_storage, shutdown
+from core.webhook import BotApp, run_webhook
+import bot_client.main as client
+import bot_employee.main as employee
+import bot_owner.main as owner
+
+logger = setup_logger("webhook")
+
+async def main():
+    """Все три бота в одном процессе: /client, /employee, /owner"""
+    logger.info("Starting webhook server")
+    
+    await bootstrap("webhook")
+    
+    # Одно хранилище на общем пуле Redis для всех трех ботов
+    storage = create_storage()
+    
+    bots = [
+        BotApp(module.WEBHOOK_PATH, module.create_bot(), module.create_dispatcher(storage))
+        for module in (client, employee, owner)
+    ]
+    
+    try:
+        await run_webhook(bots)
+    finally:
+        for item in bots:
+            await item.bot.session.close()
+        await shutdown()
+
+if __name__ == "__main__":
+    asyncio.run(main())